@@ -0,0 +1,7 @@
+# This file is part of Foshelter, see <https://github.com/MestreLion/foshelter>
+# Copyright (C) 2018 Rodrigo Silva (MestreLion) <linux@rodrigosilva.com>
+# License: GPLv3 or later, at your choice. See <http://www.gnu.org/licenses/gpl>
+
+"""
+    Benchmark suite for Foshelter, run with `python3 -m benchmarks`
+"""
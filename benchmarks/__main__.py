@@ -0,0 +1,13 @@
+# This file is part of Foshelter, see <https://github.com/MestreLion/foshelter>
+# Copyright (C) 2018 Rodrigo Silva (MestreLion) <linux@rodrigosilva.com>
+# License: GPLv3 or later, at your choice. See <http://www.gnu.org/licenses/gpl>
+
+import sys
+
+from . import pipeline
+
+if __name__ == '__main__':
+    try:
+        sys.exit(pipeline._main(sys.argv[1:]))
+    except (KeyboardInterrupt, BrokenPipeError):
+        pass
@@ -0,0 +1,119 @@
+# This file is part of Foshelter, see <https://github.com/MestreLion/foshelter>
+# Copyright (C) 2018 Rodrigo Silva (MestreLion) <linux@rodrigosilva.com>
+# License: GPLv3 or later, at your choice. See <http://www.gnu.org/licenses/gpl>
+
+"""
+Entity memory benchmarks
+
+Measures memory allocated by Python per Dweller instance, save data excluded,
+for each entity layout:
+    dict     - previous layout: attributes in a per-instance __dict__,
+               derived fields computed on creation
+    slots    - current Dweller, slotted, as created on first access
+    computed - current Dweller after its derived fields are computed
+
+Example:
+    python3 -m benchmarks.entities -n 1000 -n 100000
+"""
+
+import sys
+import gc
+import tracemalloc
+
+import foshelter as fs
+
+from . import vaultgen
+
+
+SIZES = (1000, 10000, 100000)
+
+LAYOUTS = ('dict', 'slots', 'computed')
+
+
+
+
+class DictDweller:
+    """Dweller layout before __slots__, keeping the same attributes"""
+    def __init__(self, data: dict, root=None):
+        self._data = data
+        self._root = root
+        self.ID    = data['serializeId']
+        self.level = data['experience']['currentLevel']
+        self.hp    = data['health']['maxHealth']
+        self.erating = fs.Dweller(data).erating
+
+
+
+
+def measure(data: list, layout: str) -> int:
+    """Return memory allocated by entities of `layout` for all `data` items"""
+    if layout == 'dict':
+        def create():
+            return [DictDweller(d) for d in data]
+    else:
+        def create():
+            return [fs.Dweller(d) for d in data]
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        entities = create()
+        if layout == 'computed':
+            for e in entities:
+                e.erating
+        size = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    del entities
+    return size
+
+
+def run(sizes=SIZES, seed: int = vaultgen.SEED, callback=None) -> list:
+    """
+    Measure all layouts for each number of dwellers in `sizes`.
+
+    Return a list of result dicts, also passed to `callback` as they are ready.
+    """
+    results = []
+    for size in sizes:
+        data = vaultgen.vault(size, 0, seed)['dwellers']['dwellers']
+        for layout in LAYOUTS:
+            nbytes = measure(data, layout)
+            result = dict(layout=layout, size=size, bytes=nbytes,
+                          per_entity=nbytes / size)
+            results.append(result)
+            if callback:
+                callback(result)
+    return results
+
+
+def _main(argv=None):
+    parser = fs.util.ArgumentParser(__doc__)
+    parser.add_argument("-n", "--size", type=int, action="append",
+                        dest="sizes", metavar="DWELLERS",
+                        help="Number of dwellers. Can be repeated."
+                             " [Default: %s]" % ", ".join(map(str, SIZES)))
+    parser.add_argument("-s", "--seed", type=int, default=vaultgen.SEED,
+                        help="Vault generator seed. [Default: %(default)s]")
+    args = parser.parse_args(argv)
+
+    print('{:10} {:>7} {:>10} {:>12} {:>7}'.format(
+        'layout', 'size', 'total KiB', 'bytes/entity', 'ratio'))
+
+    baseline = {}
+
+    def report(r):
+        base = baseline.setdefault(r['size'], r['per_entity'])
+        print('{layout:10} {size:7d} {0:10.1f} {per_entity:12.1f} {1:6.2f}x'.format(
+            r['bytes'] / 2**10, base / r['per_entity'], **r), flush=True)
+
+    run(args.sizes or SIZES, args.seed, report)
+
+
+
+
+if __name__ == '__main__':
+    try:
+        sys.exit(_main(sys.argv[1:]))
+    except (KeyboardInterrupt, BrokenPipeError):
+        pass
@@ -0,0 +1,277 @@
+# This file is part of Foshelter, see <https://github.com/MestreLion/foshelter>
+# Copyright (C) 2018 Rodrigo Silva (MestreLion) <linux@rodrigosilva.com>
+# License: GPLv3 or later, at your choice. See <http://www.gnu.org/licenses/gpl>
+
+"""
+Load and save pipeline benchmarks
+
+Times each pipeline stage on synthetic vaults of increasing size, reporting
+throughput in MB/s and entities (dwellers + lunchboxes) per second, and peak
+memory allocated by Python, measured on a separate untimed run.
+
+Results can be saved as JSON, and compared against previous results.
+
+Examples:
+    python3 -m benchmarks
+    python3 -m benchmarks -n 100 -n 100000 -b decrypt -b encode -o new.json
+    python3 -m benchmarks -c old.json
+"""
+
+import os
+import sys
+import time
+import json
+import datetime
+import platform
+import tempfile
+import tracemalloc
+import collections
+import statistics
+
+import foshelter as fs
+
+from . import vaultgen
+
+
+SIZES = (10, 100, 1000, 10000, 100000)
+
+SCENARIOS = collections.OrderedDict()
+
+
+
+
+class Fixture:
+    """Benchmark inputs for a vault size, generated on first use"""
+    def __init__(self, size: int, seed: int, tmpdir: str):
+        self.size = size
+        self.seed = seed
+        self.entities = 2 * size  # dwellers and lunchboxes
+        self.tmpdir = tmpdir
+        self._cache = {}
+
+    def _get(self, name, func):
+        if name not in self._cache:
+            self._cache[name] = func()
+        return self._cache[name]
+
+    @property
+    def data(self) -> dict:
+        return self._get('data', lambda: vaultgen.vault(self.size, seed=self.seed))
+
+    @property
+    def savedata(self) -> bytes:
+        return self._get('savedata', lambda: fs.encrypt(self.data))
+
+    @property
+    def plaintext(self) -> bytes:
+        return self._get('plaintext', lambda: fs.encode(self.data).encode('ascii'))
+
+    @property
+    def path(self) -> str:
+        def write():
+            path = os.path.join(self.tmpdir, 'Vault{0}.sav'.format(self.size))
+            with open(path, 'wb') as fd:
+                fd.write(self.savedata)
+            return path
+        return self._get('path', write)
+
+
+
+
+def scenario(func):
+    """
+    Register a benchmark scenario.
+
+    Scenario functions take a Fixture and return a (size, callable) tuple,
+    `size` being the bytes processed by each call of the callable.
+    """
+    SCENARIOS[func.__name__] = func
+    return func
+
+
+@scenario
+def decrypt(fx):
+    """savefile.decrypt(): base64, AES and JSON decoding"""
+    return len(fx.savedata), lambda: fs.decrypt(fx.savedata)
+
+
+@scenario
+def decode(fx):
+    """savefile.decode(): JSON decoding"""
+    text = fx.plaintext.decode('ascii')
+    return len(text), lambda: fs.decode(text)
+
+
+@scenario
+def from_save(fx):
+    """Game.from_save(): file reading, decryption and ORM wrapping"""
+    return len(fx.savedata), lambda: fs.Game.from_save(fx.path)
+
+
+@scenario
+def dwellers(fx):
+    """Dwellers(): ORM wrapping of dwellers, creating each one and its name"""
+    data = fx.data['dwellers']['dwellers']
+    return len(fx.plaintext), lambda: [_.name for _ in fs.Dwellers(data)]
+
+
+@scenario
+def encode(fx):
+    """savefile.encode(): JSON encoding"""
+    return len(fx.plaintext), lambda: fs.encode(fx.data)
+
+
+@scenario
+def encrypt(fx):
+    """savefile.encrypt(): JSON encoding, AES and base64"""
+    return len(fx.savedata), lambda: fs.encrypt(fx.data)
+
+
+@scenario
+def to_save(fx):
+    """Game.to_save(stream=True): full encoding, encryption and file writing"""
+    path = os.path.join(fx.tmpdir, 'out.sav')
+    game = fs.Game.from_save(fx.path)
+    return len(fx.savedata), lambda: game.to_save(path, stream=True)
+
+
+@scenario
+def reencrypt(fx):
+    """Game.to_save(): incremental re-encryption after a dweller name change"""
+    path = os.path.join(fx.tmpdir, 'out.sav')
+    game = fs.Game.from_save(fx.path)
+    dweller = game.dwellers[len(game.dwellers) // 2]
+    names = [dweller.name, dweller.name + ' Jr']
+
+    def save():
+        names.reverse()
+        dweller.name = names[0]
+        game.to_save(path)
+    return len(fx.savedata), save
+
+
+
+
+def measure(func, repeat: int = 5) -> dict:
+    """Time `repeat` calls of `func`, then trace peak memory of another one"""
+    times = []
+    for __ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        func()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    return dict(best=min(times), median=statistics.median(times), peak=peak)
+
+
+def run(sizes=SIZES, scenarios=None, repeat: int = 5, seed: int = vaultgen.SEED,
+        callback=None) -> list:
+    """
+    Run `scenarios` names, or all, for each vault size in `sizes`.
+
+    Return a list of result dicts, also passed to `callback` as they are ready.
+    """
+    fs.cache.disable()
+    results = []
+    with tempfile.TemporaryDirectory(prefix='foshelter-bench-') as tmpdir:
+        for size in sizes:
+            fx = Fixture(size, seed, tmpdir)
+            for name in scenarios or SCENARIOS:
+                nbytes, func = SCENARIOS[name](fx)
+                result = dict(scenario=name, size=size, bytes=nbytes,
+                              entities=fx.entities, repeat=repeat)
+                result.update(measure(func, repeat))
+                result['mb_s'] = nbytes / result['best'] / 10**6
+                result['entities_s'] = fx.entities / result['best']
+                results.append(result)
+                if callback:
+                    callback(result)
+    return results
+
+
+def metadata() -> dict:
+    return dict(
+        date=datetime.datetime.now().isoformat(timespec='seconds'),
+        python=platform.python_version(),
+        implementation=platform.python_implementation(),
+        machine=platform.machine(),
+        cpus=os.cpu_count(),
+        codec=fs.savefile.get_codec().name,
+        crypto=fs.savefile.get_crypto().name,
+    )
+
+
+def _main(argv=None):
+    parser = fs.util.ArgumentParser(__doc__)
+    parser.add_argument("-n", "--size", type=int, action="append",
+                        dest="sizes", metavar="DWELLERS",
+                        help="Vault size, in dwellers and lunchboxes each."
+                             " Can be repeated. [Default: %s]" %
+                             ", ".join(map(str, SIZES)))
+    parser.add_argument("-b", "--benchmark", action="append",
+                        dest="scenarios", choices=list(SCENARIOS),
+                        help="Scenario to run, can be repeated. [Default: all]")
+    parser.add_argument("-r", "--repeat", type=int, default=5,
+                        help="Timed runs per scenario, best is reported."
+                             " [Default: %(default)s]")
+    parser.add_argument("-s", "--seed", type=int, default=vaultgen.SEED,
+                        help="Vault generator seed. [Default: %(default)s]")
+    parser.add_argument("--codec", choices=[_.name for _ in fs.savefile.CODECS],
+                        help="JSON codec. [Default: best available]")
+    parser.add_argument("--crypto", choices=[_.name for _ in fs.savefile.CRYPTOS],
+                        help="AES backend. [Default: fastest available]")
+    parser.add_argument("-o", "--output", metavar="FILE",
+                        help="Save results as JSON to FILE, '-' for stdout.")
+    parser.add_argument("-c", "--compare", metavar="FILE",
+                        help="Compare against results from a previous run.")
+    args = parser.parse_args(argv)
+
+    fs.savefile.set_codec(args.codec)
+    fs.savefile.set_crypto(args.crypto)
+
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as fd:
+            baseline = {(r['scenario'], r['size']): r
+                        for r in json.load(fd)['results']}
+
+    out = sys.stderr if args.output == '-' else sys.stdout
+    header = ('{:10} {:>7} {:>10} {:>10} {:>9} {:>12} {:>10}' +
+              (' {:>7}' if baseline else ''))
+    print(header.format('scenario', 'size', 'best ms', 'median ms', 'MB/s',
+                        'entities/s', 'peak MiB', 'speedup'), file=out)
+
+    def report(r):
+        line = ('{scenario:10} {size:7d} {0:10.2f} {1:10.2f} {mb_s:9.2f}'
+                ' {entities_s:12.0f} {2:10.2f}').format(
+                    1000 * r['best'], 1000 * r['median'], r['peak'] / 2**20, **r)
+        old = baseline.get((r['scenario'], r['size']))
+        if old:
+            line += ' {0:6.2f}x'.format(old['best'] / r['best'])
+        print(line, file=out, flush=True)
+
+    results = run(args.sizes or SIZES, args.scenarios, args.repeat, args.seed,
+                  report)
+
+    if args.output:
+        data = dict(meta=metadata(), results=results)
+        if args.output == '-':
+            json.dump(data, sys.stdout, indent=2)
+        else:
+            with open(args.output, 'w') as fd:
+                json.dump(data, fd, indent=2)
+
+
+
+
+if __name__ == '__main__':
+    try:
+        sys.exit(_main(sys.argv[1:]))
+    except (KeyboardInterrupt, BrokenPipeError):
+        pass
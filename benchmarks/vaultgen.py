@@ -0,0 +1,201 @@
+# This file is part of Foshelter, see <https://github.com/MestreLion/foshelter>
+# Copyright (C) 2018 Rodrigo Silva (MestreLion) <linux@rodrigosilva.com>
+# License: GPLv3 or later, at your choice. See <http://www.gnu.org/licenses/gpl>
+
+"""
+Deterministic synthetic vault generator
+
+Generates valid game dictionaries and save files, with any number of dwellers
+and lunchboxes. Dwellers have consistent level, endurance and HP, so they
+pass Dweller validation. Same arguments and seed always generate the same data
+
+Example:
+    python3 -m benchmarks.vaultgen -n 1000 > Vault1.sav
+"""
+
+import sys
+import random
+import collections
+
+import foshelter as fs
+
+
+SEED = 42
+
+OD = collections.OrderedDict
+
+NAMES = ('Amata', 'Butch', 'Moira', 'Nick', 'Piper', 'Preston', 'Sarah',
+         'Trudy', 'Wally', 'Codsworth', 'Lucy', 'Maxson', 'Cait', 'Deacon')
+LASTNAMES = ('Almodovar', 'DeLoria', 'Brown', 'Valentine', 'Wright', 'Garvey',
+             'Lyons', 'Mack', 'Hudson', 'MacLean', 'Danse', 'Hancock')
+JOBS = ('S01', 'S02', 'P03', 'PWA', 'WAS', 'M??', '')
+OUTFITS = ('jumpsuit', 'LabCoat', 'CombatArmor_Lvl1', 'Jumpsuit_PowerArmor')
+WEAPONS = ('Fist', 'Pistol_BB', 'Rifle_Hunting', 'Shotgun_Sawedoff')
+STATS = 7  # S.P.E.C.I.A.L., Endurance is index 2
+ROOMS = ('Living', 'Energy', 'Food', 'Water', 'Storage', 'Medbay')
+
+
+
+
+def dweller(rnd: random.Random, serial: int) -> dict:
+    level = rnd.randint(1, fs.dwellers.MAX_LEVEL)
+    end = rnd.randint(1, fs.dwellers.MAX_END)
+    hp = fs.dwellers.total_hp(end * (level - 1), level)
+    name = ' '.join(_ for _ in (rnd.choice(JOBS), rnd.choice(NAMES)) if _)
+    return OD((
+        ('name', name),
+        ('lastName', rnd.choice(LASTNAMES)),
+        ('serializeId', serial),
+        ('gender', rnd.choice((1, 2))),
+        ('happiness', OD((('happinessValue', float(rnd.randint(10, 100))),))),
+        ('health', OD((
+            ('healthValue', hp),
+            ('radiationValue', float(rnd.randint(0, 50))),
+            ('maxHealth', hp),
+            ('lastLevelUpdated', level),
+        ))),
+        ('experience', OD((
+            ('experienceValue', rnd.randint(0, 100000)),
+            ('currentLevel', level),
+            ('storage', 0),
+            ('accum', 0),
+            ('needLvUp', False),
+        ))),
+        ('relations', OD((
+            ('relations', [OD((('id', rnd.randint(1, serial)),
+                               ('affinity', rnd.randint(0, 3))))
+                           for __ in range(rnd.randint(0, 3))]),
+            ('partner', -1),
+            ('lastPartner', -1),
+        ))),
+        ('stats', OD((('stats', [
+            OD((('value', end if i == 2 else rnd.randint(1, 10)),
+                ('mod', 0), ('exp', rnd.randint(0, 1000))))
+            for i in range(STATS)
+        ]),))),
+        ('equipedOutfit', OD((
+            ('id', rnd.choice(OUTFITS)), ('type', 'Outfit'),
+            ('hasBeenAssigned', False), ('hasRandonWeaponBeenAssigned', False),
+        ))),
+        ('equipedWeapon', OD((
+            ('id', rnd.choice(WEAPONS)), ('type', 'Weapon'),
+            ('hasBeenAssigned', False), ('hasRandonWeaponBeenAssigned', False),
+        ))),
+        ('savedRoom', rnd.randint(-1, 100)),
+        ('lastChildBorn', -1.0),
+        ('rarity', rnd.choice(('Normal', 'Rare', 'Legendary'))),
+        ('deathTime', -1.0),
+        ('skinColor', rnd.randint(0, 2**32 - 1)),
+        ('hairColor', rnd.randint(0, 2**32 - 1)),
+        ('outfitColor', rnd.randint(0, 2**32 - 1)),
+        ('pendingExperienceReward', 0),
+        ('hair', '{0}{1:02d}'.format(rnd.choice('mf'), rnd.randint(1, 20))),
+        ('faceMask', ''),
+        ('pregnant', False),
+        ('babyReady', False),
+        ('assigned', True),
+        ('sawIncident', False),
+        ('WillGoToWasteland', False),
+        ('WillBeEvicted', False),
+        ('IsEvictedWaitingForFollowers', False),
+    ))
+
+
+def room(rnd: random.Random, serial: int, dwellers: int) -> dict:
+    return OD((
+        ('type', rnd.choice(ROOMS)),
+        ('class', 'Production'),
+        ('deserializeID', serial),
+        ('row', serial // 8),
+        ('col', serial % 8 * 3),
+        ('power', True),
+        ('roomHealth', OD((('damageValue', 0.0), ('initialValue', 100.0)))),
+        ('mergeLevel', rnd.randint(1, 3)),
+        ('level', rnd.randint(1, 3)),
+        ('dwellers', [rnd.randint(1, dwellers) for __ in range(rnd.randint(0, 6))]),
+        ('currentStateName', 'Idle'),
+        ('currentState', OD((('elapsedTime', round(rnd.uniform(0, 500), 2)),))),
+    ))
+
+
+def vault(dwellers: int = 100, lunchboxes: int = None, seed: int = SEED) -> dict:
+    """
+    Generate a game dictionary with `dwellers` and `lunchboxes`.
+
+    If None, `lunchboxes` is the same as `dwellers`. Rooms are added in
+    proportion to dwellers, to keep a realistic share of non-dweller data.
+    """
+    rnd = random.Random(seed)
+    if lunchboxes is None:
+        lunchboxes = dwellers
+    boxes = [rnd.choice(list(fs.LunchBox)).value for __ in range(lunchboxes)]
+    return OD((
+        ('timeMgr', OD((
+            ('time', round(rnd.uniform(0, 10**6), 2)),
+            ('timeSaveDate', 636000000000000000 + seed),
+            ('timeGameBegin', 635000000000000000 + seed),
+        ))),
+        ('dwellers', OD((
+            ('dwellers', [dweller(rnd, _ + 1) for _ in range(dwellers)]),
+            ('actors', []),
+            ('id', dwellers + 1),
+        ))),
+        ('vault', OD((
+            ('VaultName', '{0:03d}'.format(seed % 1000)),
+            ('rooms', [room(rnd, _, max(dwellers, 1))
+                       for _ in range(dwellers // 6 + 1)]),
+            ('storage', OD((('resources', OD((
+                ('Nuka', float(rnd.randint(0, 10**6))),
+                ('Food', round(rnd.uniform(0, 5000), 2)),
+                ('Energy', round(rnd.uniform(0, 5000), 2)),
+                ('Water', round(rnd.uniform(0, 5000), 2)),
+                ('StimPack', float(rnd.randint(0, 50))),
+                ('RadAway', float(rnd.randint(0, 50))),
+            ))),))),
+            ('VaultMode', 'Normal'),
+            ('LunchBoxesCount', lunchboxes),
+            ('LunchBoxesByType', boxes),
+        ))),
+    ))
+
+
+def savedata(dwellers: int = 100, lunchboxes: int = None,
+             seed: int = SEED) -> bytes:
+    """Generate encrypted save data. See vault()"""
+    return fs.encrypt(vault(dwellers, lunchboxes, seed))
+
+
+def write_save(path: str, dwellers: int = 100, lunchboxes: int = None,
+               seed: int = SEED) -> str:
+    """Generate a save file at `path`. See vault(). Return path"""
+    with open(path, 'wb') as fd:
+        fd.write(savedata(dwellers, lunchboxes, seed))
+    return path
+
+
+def _main(argv=None):
+    parser = fs.util.ArgumentParser(__doc__)
+    parser.add_argument("-n", "--dwellers", type=int, default=100,
+                        help="Number of dwellers. [Default: %(default)s]")
+    parser.add_argument("-l", "--lunchboxes", type=int,
+                        help="Number of lunchboxes. [Default: same as dwellers]")
+    parser.add_argument("-s", "--seed", type=int, default=SEED,
+                        help="Random seed. [Default: %(default)s]")
+    parser.add_argument("-d", "--decrypted", action="store_true",
+                        help="Output decrypted JSON instead of save data.")
+    args = parser.parse_args(argv)
+
+    data = vault(args.dwellers, args.lunchboxes, args.seed)
+    if args.decrypted:
+        sys.stdout.write(fs.encode(data))
+    else:
+        sys.stdout.buffer.write(fs.encrypt(data))
+
+
+
+
+if __name__ == '__main__':
+    try:
+        sys.exit(_main(sys.argv[1:]))
+    except (KeyboardInterrupt, BrokenPipeError):
+        pass
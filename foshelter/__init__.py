@@ -7,7 +7,17 @@
 """
 from .util     import FSException
 from .settings import get_options
-from .savefile import decrypt, encrypt, decode, encode
+from .savefile import decrypt, encrypt, decode, encode, load
+from .savefile import decrypt_stream, encrypt_stream
 from .android  import ftp_get, ftp_put, adb_pull, adb_push
+from .android  import adb_pull_all, adb_push_all
+from .batch    import convert_files
+from .backup   import backup_all
+from .fleet    import backup_fleet
+from .cache    import SaveCache
+from .snapshot import SnapshotStore
+from .history  import HistoryIndex
+from .instrument import STATS
 from .dwellers import Dweller, Dwellers
+from .columns  import DwellerColumns
 from .game     import Game, LunchBox, LunchBoxes
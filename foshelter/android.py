@@ -8,24 +8,38 @@ Android-related functions
 
 import sys
 import os.path
+import re
+import stat
+import time
 import posixpath
 import logging
 import ftplib
 import io
+import zlib
+import atexit
+import hashlib
+import contextlib
 
 import progressbar  # PyPI: pip install progressbar
 try:
     # PyPI: pip install adb  # Require libusb1>=1.0.16 (Ubuntu 16.06+)
-    import adb.adb_commands, adb.sign_pycryptodome  # @UnresolvedImport
+    import adb.adb_commands, adb.sign_pycryptodome, adb.usb_exceptions  # @UnresolvedImport
 except ImportError:
     adb = None
 
 from . import util as u
 from . import settings
+from . import instrument
 
 
 GAMEDIR = '/Android/data/com.bethsoft.falloutshelter/files'
 
+# Save directory on device storage, as seen by ADB
+ADB_SAVEPATH = '/mnt/sdcard' + GAMEDIR
+
+# FTP download block size
+BLOCKSIZE = 2**16  # 64KiB
+
 # https://tools.ietf.org/html/rfc3659.html#section-7.5
 FTP_MLSD_FACTS = ('size', 'modify', 'create', 'type', 'unique', 'perm', 'lang',
                   'media-type', 'charset')
@@ -35,15 +49,18 @@ log = logging.getLogger(__name__)
 
 
 
-def backup(slot: int, target=None, **options):
-    """Backup a save file from an Android device, configurable by options."""
+def backup(slot: int, target=None, bkp: bool = False, **options):
+    """
+    Backup a save file from an Android device, configurable by options.
+    If `bkp`, backup the game-made backup of the save file instead.
+    """
     opts = settings.get_options()
     opts.update(options.copy())
     method = opts['android'].get('method', '').lower()
 
     if method == 'ftp':
         try:
-            return ftp_get(slot, target, **opts['ftp'])
+            return ftp_get(slot, target, bkp, **opts['ftp'])
         except OSError as e:
             if e.errno not in (101,  # Network is unreachable
                                111,  # No route to host
@@ -57,16 +74,20 @@ def backup(slot: int, target=None, **options):
             )
 
     elif method == 'adb':
+        if not adb:
+            raise u.FSException("adb package is not available")
         try:
-            return adb_pull(slot, target, **opts['ftp'])
-        #TODO: check for expected Exceptions and re-raise as FSException
-        except Exception:
-            raise
+            return adb_pull(slot, target, bkp)
+        except (adb.usb_exceptions.CommonUsbError,
+                adb.usb_exceptions.AdbCommandFailureException) as e:
+            raise u.FSException(
+                "%s: is Android device connected, with USB debugging enabled?",
+                e)
 
     elif method == 'local':
         opts.update({'main': {'platform': 'android'}})  # force platform
-        source = os.path.join(settings.savepath(**opts), u.savename(slot))
-        target = u.localpath(slot, target)
+        source = os.path.join(settings.savepath(**opts), u.savename(slot, bkp))
+        target = u.localpath(slot, target, bkp)
         return u.copy_file(source, target)
 
     raise u.FSException("Invalid or blank Android method: %r", method)
@@ -74,84 +95,280 @@ def backup(slot: int, target=None, **options):
 
 
 
-def adb_pull(slot: int, target: str = None) -> str:
-    target = u.localpath(slot, target)
-    data = adb_read(slot)
+def adb_pull(slot: int, target: str = None, bkp: bool = False) -> str:
+    """
+    Download a game save file from an Android device via ADB to a local file.
+
+    See ftp_get() for `target` and `bkp`. Return the saved local file path.
+    """
+    target = u.localpath(slot, target, bkp)
+    log.info("Saving game slot %s from Android ADB to %s", slot, target)
+    data = adb_read(slot, bkp)
     with open(target, 'wb') as fd:
         fd.write(data)
     return target
 
 
-def adb_push(slot: int, source: str = None) -> str:
-    source = u.localpath(slot, source)
+def adb_push(slot: int, source: str = None, bkp: bool = False) -> str:
+    """
+    Upload a local file to an Android device via ADB as a game save file.
+
+    See ftp_put() for `source`. Return the full remote file path written.
+    """
+    source = u.localpath(slot, source, bkp)
     with open(source, 'rb') as fd:
         data = fd.read()
-    return adb_write(slot, data)
+    return adb_write(slot, data, bkp, mtime=int(os.stat(source).st_mtime))
+
+
+def adb_pull_all(target: str = None, slots=(1, 2, 3), bkp: bool = True) -> list:
+    """
+    Download all game `slots` files, and their game-made backups if `bkp`,
+    to `target` directory, in a single ADB session. Files missing on device
+    are skipped. Return the saved local file paths.
+    """
+    session = adb_session()
+    facts = session.facts()
+    paths = []
+    for slot in slots:
+        for isbkp in ((False, True) if bkp else (False,)):
+            if u.savename(slot, isbkp) in facts:
+                paths.append(adb_pull(slot, target, isbkp))
+    return paths
+
+
+def adb_push_all(*sources) -> list:
+    """
+    Upload local save files to an Android device, in a single ADB session.
+
+    Each source must be named as a game save file, such as 'Vault1.sav' or
+    'Vault1.sav.bkp', which is also its remote name. Return the remote paths.
+    """
+    slots = []
+    for source in sources:
+        name = os.path.basename(source)
+        match = re.fullmatch(r'Vault(\d+)\.sav(\.bkp)?', name)
+        if not match:
+            raise u.FSException("Not a game save file name: %s", source)
+        slots.append((int(match.group(1)), bool(match.group(2))))
+    return [adb_push(slot, source, bkp)
+            for source, (slot, bkp) in zip(sources, slots)]
+
+
+def adb_read(slot: int, bkp: bool = False) -> bytes:
+    """
+    Read and return a game save file data from an Android device via ADB.
+
+    See ftp_read() for `slot` and `bkp`. The connection is shared with other
+    ADB calls, see adb_session().
+    """
+    return adb_session().read(slot, bkp)
+
+
+def adb_write(slot: int, data: bytes, bkp: bool = False, mtime: int = 0) -> str:
+    """
+    Write data to game save file on an Android device via ADB.
+
+    Create (or replace) the selected file with `data` content and `mtime`
+    modification time, current time if 0, and check its size on device.
+    Return the full remote file path written, as a convenience.
+    """
+    return adb_session().write(slot, data, bkp, mtime)
+
+
+def adb_facts() -> dict:
+    """
+    List save game files in the Android device save directory via ADB.
+
+    Return a {filename: facts} dict of files, see ftp_facts(). 'modify' is the
+    file modification time in seconds since epoch, as a string.
+    """
+    return adb_session().facts()
+
+
+def adb_session() -> 'ADBSession':
+    """
+    Return the shared ADB session, creating it if needed.
+
+    The session is kept open, so consecutive transfers only load the key and
+    authenticate once. It is closed by adb_close(), or on exit.
+    """
+    global _adb_session
+    if _adb_session is None:
+        _adb_session = ADBSession()
+    return _adb_session
+
+
+def adb_close() -> None:
+    """Close the shared ADB session"""
+    global _adb_session
+    session, _adb_session = _adb_session, None
+    if session is not None:
+        session.close()
 
 
-def adb_read(slot: int) -> bytes:
-    # https://github.com/google/python-adb
-    if not adb:
-        raise u.FSException("adb package is not available")
+_adb_session = None
+atexit.register(adb_close)
 
-    # KitKat+ devices require authentication
-    path = os.path.join(os.path.expanduser('~'), '.android', 'adbkey')
-    signer = adb.sign_pycryptodome.PycryptodomeAuthSigner(path)
 
-    # Connect to the device
-    device = adb.adb_commands.AdbCommands()
-    device.ConnectDevice(rsa_keys=[signer])
+class ADBSession:
+    """
+    Authenticated connection to an Android device via ADB, reusable by many
+    transfers.
+
+    Connect to the first available USB device on first use, or the one with
+    `serial`, which can also be a 'host:port' TCP address, authenticating with
+    the key at `keypath`, by default the one created by adb tools. If the
+    connection was dropped since last use, reconnect and retry once. Directory
+    listing is cached until a file is written. Can be used as a context
+    manager, closing on exit.
+    """
+    def __init__(self, serial: str = None, keypath: str = None):
+        # https://github.com/google/python-adb
+        if not adb:
+            raise u.FSException("adb package is not available")
+        self.serial = serial
+        self.keypath = keypath or os.path.join(os.path.expanduser('~'),
+                                               '.android', 'adbkey')
+        self._device = None
+        self._facts = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+    def close(self) -> None:
+        device, self._device, self._facts = self._device, None, None
+        if device is not None:
+            device.Close()
+
+
+    def facts(self, refresh: bool = False) -> dict:
+        """Return the, possibly cached, save directory listing. See adb_facts()"""
+        if self._facts is None or refresh:
+            def listing(device):
+                return {f.filename.decode('utf-8'): dict(size=f.size,
+                                                         modify=str(f.mtime))
+                        for f in device.List(ADB_SAVEPATH)
+                        if stat.S_ISREG(f.mode)}
+            self._facts = self._call(listing)
+        return self._facts
+
+
+    def read(self, slot: int, bkp: bool = False) -> bytes:
+        """Read a game save file. See adb_read()"""
+        path = posixpath.join(ADB_SAVEPATH, u.savename(slot, bkp))
+
+        def pull(device):
+            with instrument.stage('android.adb_pull') as record:
+                data = device.Pull(path)
+                if record:
+                    record.bytes = len(data)
+            return data
+
+        return self._call(pull)
+
+
+    def write(self, slot: int, data: bytes, bkp: bool = False,
+              mtime: int = 0) -> str:
+        """Write a game save file. See adb_write()"""
+        path = posixpath.join(ADB_SAVEPATH, u.savename(slot, bkp))
+
+        def push(device):
+            with instrument.stage('android.adb_push', len(data)):
+                device.Push(io.BytesIO(data), path,
+                            mtime=mtime or int(time.time()))
+            size = device.Stat(path)[1]
+            if size != len(data):
+                raise u.FSException("Pushed %s has %d bytes on device,"
+                                    " expected %d", path, size, len(data))
+            return path
+
+        try:
+            return self._call(push)
+        finally:
+            self._facts = None
+
+
+    def _connect(self):
+        signer = adb.sign_pycryptodome.PycryptodomeAuthSigner(self.keypath)
+        log.info("Connecting to Android device %s", self.serial or "via USB")
+        with instrument.stage('android.adb_connect'):
+            device = adb.adb_commands.AdbCommands()
+            device.ConnectDevice(serial=self.serial, rsa_keys=[signer])
+        return device
 
-    return device.Pull(os.path.join('/mnt/sdcard', GAMEDIR, u.savename(slot)))
+
+    def _call(self, func):
+        """Return func(device), reconnecting and retrying once if dropped"""
+        if self._device is None:
+            self._device = self._connect()
+            return func(self._device)
+        try:
+            return func(self._device)
+        except adb.usb_exceptions.CommonUsbError as e:
+            log.debug("ADB connection lost, reconnecting: %s", e)
+            self.close()
+            self._device = self._connect()
+            return func(self._device)
 
 
-def adb_write(slot: int, data: bytes) -> str:  # @UnusedVariable
-    # because raise NotImplementedError is too blunt...
-    log.warning("adb_write() is currently a stub dummy!")
-    return ""
+    def __repr__(self):
+        return '<{0}({1})>'.format(self.__class__.__name__, self.serial or 'USB')
 
 
 
 
-def ftp_get(slot: int, target: str = None, **ftp_options) -> str:
+def ftp_get(slot: int, target: str = None, bkp: bool = False,
+            **ftp_options) -> str:
     """
     Download a game save file from an Android FTP server to a local file.
 
     If `path` is a directory, save to that directory using game save file name.
     If blank save to current directory, else use it as full file and path name.
+    If `bkp`, download the game-made backup of the save file instead.
+
+    Data is streamed to a temporary file beside the target, which replaces it
+    only when the download is complete, see FTPSession.retrieve().
 
     See ftp_read() for documentation on other parameters.
 
     Return the saved local file full path, as a convenience.
     """
-    target = u.localpath(slot, target)
+    target = u.localpath(slot, target, bkp)
     log.info("Saving game slot %s from Android FTP to %s", slot, target)
-    data = ftp_read(slot, **ftp_options)
-    with open(target, 'wb') as fd:
-        fd.write(data)
+    ftp_session(**ftp_options).retrieve(slot, target, bkp)
     return target
 
 
-def ftp_put(slot: int, source: str = None, **ftp_options) -> str:
+def ftp_put(slot: int, source: str = None, bkp: bool = False,
+            force: bool = False, **ftp_options) -> str:
     """
     Upload a local file to an Android FTP server as a game save file
 
-    Use `source` file or 'VaultX.sav' in current directory. See ftp_write() for
-    documentation on return value and other parameters.
+    Use `source` file or 'VaultX.sav' in current directory. Unless `force`,
+    skip the upload if the remote file is the same, see FTPSession.identical().
+    See ftp_write() for documentation on return value and other parameters.
     """
-    source = u.localpath(slot, source)
+    source = u.localpath(slot, source, bkp)
     with open(source, 'rb') as fd:
         data = fd.read()
-    return ftp_write(slot, data, **ftp_options)
+        mtime = os.fstat(fd.fileno()).st_mtime
+    return ftp_write(slot, data, bkp, mtime, force, **ftp_options)
 
 
-def ftp_read(slot: int, **ftp_options) -> bytes:
+def ftp_read(slot: int, bkp: bool = False, progress: bool = True,
+             **ftp_options) -> bytes:
     """
     Read and return a game save file data from an Android Device FTP server.
 
     Source FTP file is determined by `slot` number, which is translated
-    to a filename such as 'Vault1.sav'. Currently Fallout Shelter only supports
-    3 save slots, but this is not enforced here.
+    to a filename such as 'Vault1.sav', or 'Vault1.sav.bkp' if `bkp`. Currently
+    Fallout Shelter only supports 3 save slots, but this is not enforced here.
+    If `progress`, display a progress bar.
 
     `ftp_options` is a dict for FTP access and credentials. Expected keys are:
     'hostname', 'username', 'password', 'savepath', 'port' and 'debug'.
@@ -164,117 +381,400 @@ def ftp_read(slot: int, **ftp_options) -> bytes:
     - 'port', if 0 or otherwise falsy, uses the default FTP port, 21.
     - if 'username' is blank, use anonymous FTP access and ignore 'password'
     - 'debug', if truthy, print FTP messages to stderr.
+
+    The connection is shared with other calls using the same `ftp_options`,
+    see ftp_session(). If the connection drops during the transfer, reconnect
+    and resume from the data already received, see FTPSession.read().
     """
-    return _ftp_readwrite(slot, True, None, **ftp_options)
+    return ftp_session(**ftp_options).read(slot, bkp, progress)
 
 
-def ftp_write(slot: int, data: bytes, **ftp_options) -> str:
+def ftp_write(slot: int, data: bytes, bkp: bool = False, mtime: float = None,
+              force: bool = False, **ftp_options) -> str:
     """
     Write data to game save file via FTP server on an Android device.
 
-    'slot' and 'ftp_options' are as documented in ftp_read().
+    'slot', 'bkp' and 'ftp_options' are as documented in ftp_read().
 
-    Create (or replace) the selected FTP file with `data` content.
+    Create (or replace) the selected FTP file with `data` content, setting its
+    modification time to `mtime`, if any and supported by server. Unless
+    `force`, skip the upload if the remote file is the same.
     Return the full remote file path written, as a convenience.
     """
-    return _ftp_readwrite(slot, False, data, **ftp_options)
+    return ftp_session(**ftp_options).write(slot, data, bkp, mtime=mtime,
+                                            force=force)
+
+
+def ftp_facts(**ftp_options) -> dict:
+    """
+    List save game files in an Android device FTP server savepath.
+
+    Return a {filename: facts} dict of files, facts being a dict with at least
+    'size' (int) and 'modify' (str, a YYYYMMDDHHMMSS[.sss] UTC time). Use MLSD
+    facts if supported by the server, else SIZE and MDTM for each file.
+    See ftp_read() for `ftp_options`.
+    """
+    return ftp_session(**ftp_options).facts()
 
 
-def _ftp_readwrite(slot:int, read:bool, data:bytes, info=None, progress=True,
-                   **ftp_options):
+def ftp_session(**ftp_options) -> 'FTPSession':
     """
-    Read or write save game data to an Android device FTP server.
+    Return the shared FTP session for `ftp_options`, creating it if needed.
+
+    Sessions are kept open, so consecutive transfers to the same server, such as
+    all slots on a backup, only connect and list the directory once. They are
+    closed by ftp_close(), or on exit. See ftp_read() for `ftp_options`.
+    """
+    options = dict(settings.get_options()['ftp'], **ftp_options)
+    key = tuple(options[_] for _ in sorted(settings.FACTORY['ftp']))
+    session = _ftp_sessions.get(key)
+    if session is None:
+        session = _ftp_sessions[key] = FTPSession(**options)
+    return session
+
 
-    `read` indicates mode of operation, truthy for Read, otherwise Write.
+def ftp_close() -> None:
+    """Close all shared FTP sessions"""
+    while _ftp_sessions:
+        _ftp_sessions.popitem()[1].close()
 
-    This is not meant to be called directly. Use ftp_read()/ftp_write() instead
-    See their respective documentation for parameters and return value
+
+_ftp_sessions = {}
+atexit.register(ftp_close)
+
+
+class FTPSession:
     """
-    options = settings.get_options()['ftp']
-    options.update(ftp_options)
-    debug = options['debug']
+    Connection to an Android device FTP server, reusable by many transfers.
 
-    if not options['hostname']:
-        raise u.FSException("FTP hostname is blank, check your settings?")
+    Connect and log in on first use, and if the connection was dropped since
+    last use, such as by a server idle timeout, reconnect and retry once.
+    Directory listing is cached until a file is written, and server features
+    while connected. See ftp_read() for `ftp_options`. Can be used as a
+    context manager, closing on exit.
+    """
+    # Times to reconnect and resume an interrupted download, as long as
+    # each attempt receives some data
+    RESUME_ATTEMPTS = 5
 
-    savename = u.savename(slot)
+    # FEAT hash algorithm names to hashlib's
+    HASHES = {'SHA-512': 'sha512', 'SHA-256': 'sha256', 'SHA-1': 'sha1',
+              'MD5': 'md5', 'CRC32': 'crc32'}
 
-    ftp = ftplib.FTP()
+    def __init__(self, **ftp_options):
+        self.options = dict(settings.get_options()['ftp'], **ftp_options)
+        if not self.options['hostname']:
+            raise u.FSException("FTP hostname is blank, check your settings?")
+        self._ftp = None
+        self._facts = None
+        self._features = None
 
-    if debug:
-        ftp.set_debuglevel(1 if debug else 0)
-        # Redirect print() to stderr so ftplib debugging does not mix with
-        # potentially print()-ed output
-        stdout = sys.stdout  # save current stdout
-        sys.stdout = sys.stderr
+    def __enter__(self):
+        return self
 
-    try:
-        log.info("Connecting to %s:%s", options['hostname'], options['port'] or 21)
-        ftp.connect(options['hostname'], options['port'])
-        ftp.login(options['username'], options['password'])
-        ftp.cwd(options['savepath'])
-
-        # read
-        if read:
-            def update_data(databytes):
-                if progress and not pbar.start_time:
-                    pbar.start()
-                data.extend(databytes)
-                totalbytes = len(data)
-                if progress:
-                    pbar.update(totalbytes)
-                    return
-                if totalbytes % 128*2*10 == 0:  # every 128KiB
-                    log.info("%s/%s bytes transfered", totalbytes, filesize)
-
-            filesize = 2**21  # 2MiB, an upper bound for save file
+    def __exit__(self, *exc):
+        self.close()
+
+
+    def close(self) -> None:
+        ftp, self._ftp, self._facts, self._features = self._ftp, None, None, None
+        if ftp is None:
+            return
+        try:
+            ftp.quit()
+        except (OSError, EOFError, ftplib.Error):
+            ftp.close()
+
+
+    def facts(self, refresh: bool = False) -> dict:
+        """Return the, possibly cached, savepath listing. See ftp_facts()"""
+        if self._facts is None or refresh:
+            self._facts = self._call(_ftp_facts)
+        return self._facts
+
+
+    def features(self) -> dict:
+        """Return server features from FEAT, as a {FEATURE: params} dict"""
+        if self._features is None:
+            def feat(ftp):
+                try:
+                    lines = ftp.sendcmd('FEAT').splitlines()[1:-1]
+                except ftplib.error_perm:
+                    return {}
+                return {name.upper(): params.strip() for name, __, params in
+                        (_.strip().partition(' ') for _ in lines)}
+            self._features = self._call(feat)
+        return self._features
+
+
+    def read(self, slot: int, bkp: bool = False, progress: bool = True) -> bytes:
+        """Read a game save file. See ftp_read() and retrieve()"""
+        with io.BytesIO() as fp:
+            self._retrieve(u.savename(slot, bkp), fp, progress)
+            return fp.getvalue()
+
+
+    def retrieve(self, slot: int, path: str, bkp: bool = False,
+                 progress: bool = True) -> int:
+        """
+        Download a game save file to local `path`. Return its size
+
+        Data is written to disk as it arrives, so memory usage does not depend
+        on file size, and `path` is atomically replaced only on success.
+
+        If the transfer is interrupted, reconnect and resume it with REST, up to
+        RESUME_ATTEMPTS times. If the server does not support REST, or the file
+        has changed since, restart the transfer instead.
+        """
+        with u.atomic_write(path) as fp:
+            return self._retrieve(u.savename(slot, bkp), fp, progress)
+
+
+    def _retrieve(self, savename: str, fp, progress: bool = True) -> int:
+        """Download to a binary file object, resuming. See retrieve()"""
+        facts = self.facts().get(savename)
+        filesize = (facts or {}).get('size', 2**21)  # 2MiB
+        log.debug("%s: %s bytes", savename, filesize)
+        received = 0
+        logged = [0]
+
+        def update_data(databytes):
+            nonlocal received
+            if progress and not pbar.start_time:
+                pbar.start()
+            fp.write(databytes)
+            received += len(databytes)
+            if progress:
+                pbar.update(received)
+            elif received - logged[0] >= 128 * 2**10:  # every 128KiB
+                logged[0] = received
+                log.info("%s/%s bytes transfered", received, filesize)
+
+        def restart():
+            nonlocal received
+            fp.seek(0)
+            fp.truncate()
+            received = logged[0] = 0
+
+        def retr(ftp):
+            rest = received
+            if rest and _ftp_facts(ftp).get(savename) != facts:
+                log.warning("%s changed on server, restarting transfer",
+                            savename)
+                restart()
+                rest = 0
+            with instrument.stage('android.ftp_retr') as record:
+                try:
+                    ftp.retrbinary('RETR {0}'.format(savename), update_data,
+                                   BLOCKSIZE, rest=rest or None)
+                except ftplib.error_perm as e:
+                    if not rest or str(e)[:3] not in ('500', '501', '502', '504'):
+                        raise
+                    log.warning("Server does not support resuming, restarting"
+                                " transfer: %s", e)
+                    restart()
+                    ftp.retrbinary('RETR {0}'.format(savename), update_data,
+                                   BLOCKSIZE)
+                if record:
+                    record.bytes = received - rest
+
+        pbar = progressbar.ProgressBar(widgets=[
+            savename, ':',
+            ' ', progressbar.Percentage(),
+            ' ', progressbar.SimpleProgress(), ' bytes',
+            ' ', progressbar.Bar('.'),
+            ' ', progressbar.FileTransferSpeed(),
+            ' ', progressbar.ETA(),
+            ' '], maxval=filesize)
+
+        for attempt in range(self.RESUME_ATTEMPTS + 1):
+            before = received
             try:
-                for filename, facts in ftp.mlsd(facts=FTP_MLSD_FACTS):
-                    if filename == savename:
-                        filesize = facts['size']
-                        log.debug("%s: %s", savename, facts)
-                        break
-            except ftplib.error_perm as e:
-                if not str(e).startswith('502'):
+                self._call(retr)
+                break
+            except (OSError, EOFError, ftplib.error_temp) as e:
+                if attempt == self.RESUME_ATTEMPTS or received == before:
                     raise
-                # MLSD not supported, try SIZE
-                filesize = ftp.size(savename)
+                log.warning("%s: transfer interrupted at %d bytes, resuming: %s",
+                            savename, received, e)
+                self.close()
+
+        if progress:
+            pbar.finish()
 
+        return received
 
 
-            log.debug("%s: %s bytes", savename, filesize)
+    def write(self, slot: int, data: bytes, bkp: bool = False, info=None,
+              mtime: float = None, force: bool = False) -> str:
+        """
+        Write a game save file. See ftp_write()
 
-            pbar = progressbar.ProgressBar(widgets=[
-                savename, ':',
-                ' ', progressbar.Percentage(),
-                ' ', progressbar.SimpleProgress(), ' bytes',
-                ' ', progressbar.Bar('.'),
-                ' ', progressbar.FileTransferSpeed(),
-                ' ', progressbar.ETA(),
-                ' '], maxval=filesize)
+        After upload, set the remote modification time to `mtime` with MFMT, if
+        supported, so a later identical() can tell the file is the same.
+        """
+        savename = u.savename(slot, bkp)
+        log.debug("%s: %s", savename, info)
 
-            data = bytearray()
-            ftp.retrbinary('RETR {0}'.format(savename), update_data)
+        def pwd(ftp):
+            # FTP always use Unix '/' as path separator, hence posixpath
+            return posixpath.join(ftp.pwd(), savename)
 
-            if progress:
-                pbar.finish()
+        if not force and self.identical(savename, data, mtime):
+            log.info("%s is the same on server, skipping upload", savename)
+            return self._call(pwd)
 
-            return bytes(data)
+        mfmt = mtime and 'MFMT' in self.features()
 
-        # write
-        log.debug("%s: %s", savename, info)
-        ftp.storbinary('STOR {0}'.format(savename), io.BytesIO(data))
-        return posixpath.join(options['savepath'], savename)
-        # FTP always use Unix '/' as path separator, hence posixpath
+        def stor(ftp):
+            with instrument.stage('android.ftp_stor', len(data)):
+                ftp.storbinary('STOR {0}'.format(savename), io.BytesIO(data))
+            if mfmt:
+                ftp.sendcmd('MFMT {0} {1}'.format(_ftp_time(mtime), savename))
+            return pwd(ftp)
 
-    finally:
         try:
-            ftp.quit()
-        except AttributeError:  # Exception before or at ftp.connect()
-            pass
+            return self._call(stor)
+        finally:
+            self._facts = None
+
+
+    def identical(self, savename: str, data: bytes, mtime: float = None) -> bool:
+        """
+        Return True if remote `savename` file has the same content as `data`.
+
+        Sizes must match, and then either a remote hash, if the server supports
+        HASH, XSHA256, XSHA1, XMD5 or XCRC commands, or the modification time
+        against `mtime`, if any. Otherwise assume it is not the same.
+        """
+        facts = self.facts().get(savename)
+        if not facts or facts['size'] != len(data):
+            return False
+
+        features = self.features()
+        remote = self._call(lambda ftp: _ftp_hash(ftp, savename, features))
+        if remote:
+            algorithm, digest = remote
+            if algorithm == 'crc32':
+                local = '{0:08x}'.format(zlib.crc32(data))
+            else:
+                local = hashlib.new(algorithm, data).hexdigest()
+            log.debug("%s %s: remote %s, local %s", savename, algorithm,
+                      digest, local)
+            return local == digest.lower()
+
+        return bool(mtime and facts.get('modify', '')[:14] == _ftp_time(mtime))
+
+
+    def _connect(self) -> ftplib.FTP:
+        options = self.options
+        ftp = ftplib.FTP()
+        ftp.set_debuglevel(1 if options['debug'] else 0)
+        log.info("Connecting to %s:%s", options['hostname'], options['port'] or 21)
+        with instrument.stage('android.ftp_connect'):
+            ftp.connect(options['hostname'], options['port'])
+            try:
+                ftp.login(options['username'], options['password'])
+                ftp.cwd(options['savepath'])
+            except BaseException:
+                ftp.close()
+                raise
+        return ftp
+
+
+    def _call(self, func):
+        """Return func(ftp), reconnecting and retrying once if dropped"""
+        with self._debug():
+            if self._ftp is None:
+                self._ftp = self._connect()
+                return func(self._ftp)
+            try:
+                return func(self._ftp)
+            except (EOFError, ConnectionError, ftplib.error_temp) as e:
+                if isinstance(e, ftplib.error_temp) and not str(e).startswith('421'):
+                    raise
+                log.debug("FTP connection lost, reconnecting: %s", e)
+                self.close()
+                self._ftp = self._connect()
+                return func(self._ftp)
+
+
+    @contextlib.contextmanager
+    def _debug(self):
+        if not self.options['debug']:
+            yield
+            return
+        # Redirect print() to stderr so ftplib debugging does not mix with
+        # potentially print()-ed output
+        stdout, sys.stdout = sys.stdout, sys.stderr
+        try:
+            yield
         finally:
-            if debug:
-                sys.stdout = stdout  # restore original stdout
+            sys.stdout = stdout
+
+
+    def __repr__(self):
+        return '<{0}({1}:{2})>'.format(self.__class__.__name__,
+                                       self.options['hostname'],
+                                       self.options['port'] or 21)
+
+
+def _ftp_facts(ftp: ftplib.FTP) -> dict:
+    try:
+        return {filename: dict(facts, size=int(facts['size']))
+                for filename, facts in ftp.mlsd(facts=FTP_MLSD_FACTS)
+                if facts.get('type', 'file') == 'file' and 'size' in facts}
+    except ftplib.error_perm as e:
+        if not str(e).startswith('502'):
+            raise
+
+    # MLSD not supported, try NLST, SIZE and MDTM
+    files = {}
+    for filename in ftp.nlst():
+        filename = posixpath.basename(filename)
+        try:
+            size = ftp.size(filename)
+            modify = ftp.voidcmd('MDTM {0}'.format(filename)).split()[-1]
+        except ftplib.error_perm:
+            continue  # most likely a directory
+        files[filename] = dict(size=size, modify=modify)
+    return files
+
+
+def _ftp_hash(ftp: ftplib.FTP, filename: str, features: dict) -> tuple:
+    """
+    Return the (hashlib algorithm, hexdigest) of a remote file, using the best
+    hash command in server `features`, or None if none is supported.
+    """
+    if 'HASH' in features:
+        # draft-bryan-ftpext-hash: 'HASH SHA-1;SHA-256*;MD5', * is selected
+        algorithms = features['HASH'].split(';')
+        selected = [_.rstrip('*') for _ in algorithms if _.endswith('*')]
+        if selected and selected[0].upper() in FTPSession.HASHES:
+            try:
+                # '213 SHA-256 0-1234 <hexdigest> <filename>'
+                reply = ftp.sendcmd('HASH {0}'.format(filename)).split()
+                return FTPSession.HASHES[reply[1].upper()], reply[3]
+            except (ftplib.error_perm, IndexError, KeyError) as e:
+                log.debug("HASH failed: %s", e)
+
+    for command, algorithm in (('XSHA256', 'sha256'), ('XSHA1', 'sha1'),
+                               ('XMD5', 'md5'), ('XCRC', 'crc32')):
+        if command in features:
+            try:
+                # '250 <hexdigest>', some servers also add the file name
+                reply = ftp.sendcmd('{0} {1}'.format(command, filename))
+                return algorithm, reply.split()[1]
+            except (ftplib.error_perm, IndexError) as e:
+                log.debug("%s failed: %s", command, e)
+    return None
+
+
+def _ftp_time(timestamp: float) -> str:
+    """Return a YYYYMMDDHHMMSS UTC time, as in MDTM and MLSD 'modify' fact"""
+    return time.strftime('%Y%m%d%H%M%S', time.gmtime(timestamp))
+
+
 
 
 def _main(argv=None):  # @UnusedVariable
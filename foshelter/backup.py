@@ -0,0 +1,188 @@
+# This file is part of Foshelter, see <https://github.com/MestreLion/foshelter>
+# Copyright (C) 2018 Rodrigo Silva (MestreLion) <linux@rodrigosilva.com>
+# License: GPLv3 or later, at your choice. See <http://www.gnu.org/licenses/gpl>
+
+"""
+    Incremental backup of save game files
+
+Files are backed up from the device of the configured platform: the Android
+device, using its configured method, or the local save directory of other
+platforms. Before any transfer, the size and modification time of device files
+are listed, from MLSD facts (or SIZE and MDTM) on Android FTP, the sync LIST on
+Android ADB and stat() on local directories. A manifest in the backup directory
+records, for each device and file, the facts seen on its last transfer and the
+hash of the local copy, so files with the same facts and an intact local copy
+are not transferred again
+"""
+
+import os.path
+import json
+import hashlib
+import logging
+
+from . import android
+from . import settings
+from . import util as u
+
+
+SLOTS = (1, 2, 3)
+
+# Manifest file name, in backup directory
+MANIFEST = '.foshelter-backup.json'
+
+log = logging.getLogger(__name__)
+
+
+
+
+class Manifest:
+    """Last seen facts and local copy hash of each device file"""
+    def __init__(self, path: str):
+        self.path = path
+        self.devices = {}
+        try:
+            with open(path, 'rb') as fd:
+                self.devices = json.loads(fd.read().decode('utf-8'))
+        except FileNotFoundError:
+            pass
+        except ValueError as e:
+            log.warning("Ignoring invalid backup manifest %s: %s", path, e)
+
+
+    def unchanged(self, device: str, name: str, facts: dict, path: str) -> bool:
+        """
+        Return True if `name` file `facts` from `device` are the same as on its
+        last transfer, and its local copy at `path` is still the same.
+        """
+        entry = self.devices.get(device, {}).get(name)
+        return bool(entry and facts and
+                    (entry['size'], entry['modify']) ==
+                    (facts['size'], facts['modify']) and
+                    os.path.isfile(path) and
+                    _sha256(path) == entry['sha256'])
+
+
+    def update(self, device: str, name: str, facts: dict, path: str) -> None:
+        """Record `name` file `facts` from `device` and its local copy hash"""
+        self.devices.setdefault(device, {})[name] = dict(
+            size=facts['size'], modify=facts['modify'], sha256=_sha256(path))
+
+
+    def save(self) -> None:
+        with u.atomic_write(self.path, sync=False) as fp:
+            fp.write(json.dumps(self.devices, indent=1,
+                                sort_keys=True).encode('utf-8'))
+
+
+
+
+def backup(slot: int, target=None, bkp: bool = False, **options) -> str:
+    """
+    Backup a game slot file to target, using `options` from config file.
+    `target` path can be a directory, file, or blank. Current directory
+    and save file basename, such as 'Vault1.sav', will be used if needed.
+    If `bkp`, backup the game-made backup of the save file instead.
+    Return saved local file path
+    """
+    opts = settings.get_options()
+    opts.update(options.copy())
+
+    platform = opts['main'].get('platform', '').lower()
+
+    if platform == 'android':
+        return android.backup(slot, target, bkp, **opts)
+
+    source = os.path.join(settings.savepath(**opts), u.savename(slot, bkp))
+    target = u.localpath(slot, target, bkp)
+    return u.copy_file(source, target)
+
+
+def backup_all(target: str = None, slots=SLOTS, bkp: bool = True,
+               incremental: bool = True, **options) -> tuple:
+    """
+    Backup game `slots` files, and their game-made backups if `bkp`, to
+    `target` directory.
+
+    If `incremental`, skip files unchanged since their last backup to `target`,
+    see module documentation. Files missing on device are skipped.
+
+    Return a (files, changed) tuple of lists of local file paths, `files` for
+    all files backed up, `changed` for the ones actually transferred.
+    """
+    opts = settings.get_options()
+    opts.update(options.copy())
+
+    device = device_id(**opts)
+    facts = device_facts(**opts)
+    manifest = Manifest(os.path.join(target or "", MANIFEST))
+
+    files, changed = [], []
+    for slot in slots:
+        for isbkp in ((False, True) if bkp else (False,)):
+            name = u.savename(slot, isbkp)
+            path = u.localpath(slot, target, isbkp)
+
+            if name not in facts:
+                log.debug("%s not found in %s", name, device)
+                continue
+            elif incremental and manifest.unchanged(device, name, facts[name],
+                                                    path):
+                log.info("%s is unchanged, skipping", name)
+                files.append(path)
+                continue
+
+            path = backup(slot, path, isbkp, **opts)
+            manifest.update(device, name, facts[name], path)
+            files.append(path)
+            changed.append(path)
+
+    manifest.save()
+    return files, changed
+
+
+def device_id(**options) -> str:
+    """Return a string identifying the device of configured platform"""
+    opts = settings.get_options()
+    opts.update(options.copy())
+
+    if opts['main'].get('platform', '').lower() == 'android':
+        method = opts['android'].get('method', '').lower()
+        if method == 'ftp':
+            ftp = opts['ftp']
+            return 'ftp://{0}:{1}{2}'.format(ftp['hostname'], ftp['port'] or 21,
+                                            ftp['savepath'])
+        if method == 'adb':
+            return 'adb:'
+
+    return 'file://' + os.path.abspath(settings.savepath(**opts))
+
+
+def device_facts(**options) -> dict:
+    """
+    Return size and modification time facts of device files.
+
+    Return a {filename: facts} dict, see android.ftp_facts().
+    """
+    opts = settings.get_options()
+    opts.update(options.copy())
+
+    if opts['main'].get('platform', '').lower() == 'android':
+        method = opts['android'].get('method', '').lower()
+        if method == 'ftp':
+            return android.ftp_facts(**opts['ftp'])
+        if method == 'adb':
+            return android.adb_facts()
+        opts.update({'main': {'platform': 'android'}})  # local method
+
+    path = settings.savepath(**opts)
+    try:
+        return {entry.name: dict(size=entry.stat().st_size,
+                                 modify=str(entry.stat().st_mtime_ns))
+                for entry in os.scandir(path) if entry.is_file()}
+    except OSError as e:
+        raise u.FSException("Could not list save files in %s: %s", path, e)
+
+
+def _sha256(path: str) -> str:
+    with open(path, 'rb') as fd:
+        return hashlib.sha256(fd.read()).hexdigest()
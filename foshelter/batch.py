@@ -0,0 +1,183 @@
+# This file is part of Foshelter, see <https://github.com/MestreLion/foshelter>
+# Copyright (C) 2018 Rodrigo Silva (MestreLion) <linux@rodrigosilva.com>
+# License: GPLv3 or later, at your choice. See <http://www.gnu.org/licenses/gpl>
+
+"""
+    Batch conversion of save files, in parallel worker processes
+"""
+
+import os.path
+import glob
+import logging
+import collections
+import concurrent.futures
+
+from . import savefile
+from . import util as u
+
+
+log = logging.getLogger(__name__)
+
+
+
+
+def expand_paths(paths, pattern: str = '*') -> list:
+    """
+    Expand an iterable of file paths, globs and directories to a file list.
+
+    Directories are expanded, non-recursively, to their files matching `pattern`
+    Paths that are neither files, globs nor directories are kept as they are,
+    so they are reported as errors on conversion.
+    """
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted(_ for _ in glob.glob(os.path.join(path, pattern))
+                                if os.path.isfile(_)))
+        elif glob.has_magic(path):
+            files.extend(sorted(glob.glob(path)))
+        else:
+            files.append(path)
+    return files
+
+
+def target_path(source: str, decrypt: bool = True, outdir: str = None) -> str:
+    """
+    Return the converted file path for `source`, in `outdir` or its directory.
+
+    Extension is replaced by '.json' on decryption, '.sav' on encryption
+    """
+    name = os.path.splitext(os.path.basename(source))[0]
+    ext = '.json' if decrypt else '.sav'
+    return os.path.join(outdir or os.path.dirname(source), name + ext)
+
+
+def convert(source: str, decrypt: bool = True, pretty: bool = False,
+            sort: bool = False, codec: str = None,
+            crypto: str = None) -> bytes:
+    """
+    Read `source` file, decrypting it to JSON or encrypting to save data.
+
+    Return converted data, ready to be written to a file. Being a top-level
+    function, it is suitable for worker processes. See savefile.set_codec()
+    for `codec` and savefile.set_crypto() for `crypto`.
+    """
+    if codec:
+        savefile.set_codec(codec)
+    if crypto:
+        savefile.set_crypto(crypto)
+
+    if decrypt:
+        try:
+            return savefile.encode(savefile.load(source), pretty, sort
+                                   ).encode('ascii')
+        except ValueError as e:
+            raise u.FSException(
+                'Could not decrypt data, is it an encrypted SAV file? %s: %s',
+                source, e
+            )
+
+    with open(source, 'rb') as fd:
+        data = fd.read()
+
+    try:
+        return savefile.encrypt(savefile.decode(data))
+    except ValueError as e:
+        raise u.FSException(
+            'Could not encrypt data, is it a decrypted JSON file? %s: %s',
+            source, e
+        )
+
+
+def decrypt_file(source: str, target: str, pretty=False, sort=False) -> str:
+    """Decrypt `source` SAV file to `target` JSON. Return target"""
+    return _write(target, convert(source, True, pretty, sort))
+
+
+def encrypt_file(source: str, target: str) -> str:
+    """Encrypt `source` JSON file to `target` save game file. Return target"""
+    return _write(target, convert(source, False))
+
+
+def _write(path: str, data: bytes) -> str:
+    with open(path, 'wb') as fd:
+        fd.write(data)
+    return path
+
+
+def imap(func, argslist, jobs: int = 0):
+    """
+    Ordered, bounded and fault-tolerant parallel map on worker processes.
+
+    Call `func(*args)` for each `args` in `argslist` using up to `jobs`
+    processes, or CPU count if 0. At most 2 calls per job are in flight, so
+    memory usage is bounded even on huge or lazy `argslist`. If `jobs` is 1,
+    run in current process, with no pool.
+
+    Yield (args, result, error) tuples in input order, with either `result`
+    or `error`, the exception raised by `func`, set to None.
+    """
+    def result(args, future):
+        try:
+            return args, future.result(), None
+        except Exception as e:
+            return args, None, e
+
+    if jobs == 1:
+        for args in argslist:
+            try:
+                yield args, func(*args), None
+            except Exception as e:
+                yield args, None, e
+        return
+
+    jobs = jobs or os.cpu_count() or 1
+    with concurrent.futures.ProcessPoolExecutor(jobs) as executor:
+        inflight = 2 * jobs
+        pending = collections.deque()
+        for args in argslist:
+            if len(pending) >= inflight:
+                yield result(*pending.popleft())
+            pending.append((args, executor.submit(func, *args)))
+        while pending:
+            yield result(*pending.popleft())
+
+
+def convert_files(paths, decrypt: bool = True, outdir: str = None,
+                  jobs: int = 0, pretty: bool = False, sort: bool = False,
+                  codec: str = None, crypto: str = None) -> list:
+    """
+    Decrypt or encrypt many files, expanded from `paths`, in worker processes.
+
+    Each file is converted to target_path() in `outdir`, and written in order
+    as results arrive. A failed file is logged and does not abort the batch.
+    See imap() for `jobs` and convert() for other arguments.
+
+    Return a list of (source, target, error) tuples, `error` being the
+    exception for failed files, or None.
+    """
+    if outdir and not os.path.isdir(outdir):
+        raise u.FSException("Target path is not a directory: %s", outdir)
+
+    sources = expand_paths(paths, '*.sav' if decrypt else '*.json')
+    argslist = ((source, decrypt, pretty, sort, codec, crypto)
+                for source in sources)
+
+    results = []
+    for args, data, error in imap(convert, argslist, jobs):
+        source = args[0]
+        target = target_path(source, decrypt, outdir)
+        if error is None:
+            try:
+                _write(target, data)
+            except OSError as e:
+                error = e
+        if error is None:
+            log.info("%s -> %s", source, target)
+        elif isinstance(error, u.FSException):
+            log.error(error)  # already mentions source
+        else:
+            log.error("%s: %s", source, error)
+        results.append((source, target, error))
+
+    return results
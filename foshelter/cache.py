@@ -0,0 +1,178 @@
+# This file is part of Foshelter, see <https://github.com/MestreLion/foshelter>
+# Copyright (C) 2018 Rodrigo Silva (MestreLion) <linux@rodrigosilva.com>
+# License: GPLv3 or later, at your choice. See <http://www.gnu.org/licenses/gpl>
+
+"""
+    Content-addressed on-disk cache of decrypted save game data
+
+When enabled, savefile.decrypt() and hence Game.from_save() look up save data
+by a hash of its ciphertext, loading the decoded dictionary from a pickle
+instead of decoding, decrypting and parsing it again. Cache size is bounded,
+evicting Least Recently Used entries, tracked by their file modification time.
+
+Pickles are only ever read from the cache directory, so keep it private.
+"""
+
+import os
+import hashlib
+import logging
+import pickle
+
+from . import savefile
+from . import settings
+from . import util as u
+
+
+# Bump on any change in cached data format, invalidating all previous entries
+VERSION = 1
+
+EXT = '.pickle'
+
+log = logging.getLogger(__name__)
+
+
+
+
+class SaveCache:
+    """Size-bounded LRU cache of decoded save data, keyed by ciphertext hash"""
+    def __init__(self, path: str = None, maxsize: int = 256 * 2**20):
+        self.path = path or default_path()
+        self.maxsize = maxsize
+        self.hits = self.misses = self.stores = self.evictions = 0
+        os.makedirs(self.path, mode=0o700, exist_ok=True)
+
+
+    @staticmethod
+    def key(savedata: bytes) -> str:
+        """
+        Cache key of `savedata`, by its hash, the cache format VERSION, the
+        pickle protocol and the active JSON codec, as decoded data types depend
+        on the codec
+        """
+        if isinstance(savedata, str):
+            savedata = savedata.encode('ascii')
+        return 'v{0}-p{1}-{2}-{3}'.format(VERSION, pickle.HIGHEST_PROTOCOL,
+                                          savefile.get_codec().name,
+                                          hashlib.sha256(savedata).hexdigest())
+
+
+    def get(self, key: str):
+        """Return cached data for `key`, or None, marking it as recently used"""
+        path = self._entry(key)
+        try:
+            with open(path, 'rb') as fd:
+                obj = pickle.load(fd)
+            os.utime(path)
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        except (OSError, pickle.UnpicklingError, EOFError) as e:
+            log.warning("Discarding invalid cache entry %s: %s", path, e)
+            self._remove(path)
+            self.misses += 1
+            return None
+        self.hits += 1
+        return obj
+
+
+    def put(self, key: str, obj) -> None:
+        """Store `obj` for `key` atomically, evicting old entries if needed"""
+        with u.atomic_write(self._entry(key), sync=False) as fp:
+            pickle.dump(obj, fp, protocol=pickle.HIGHEST_PROTOCOL)
+        self.stores += 1
+        self.evict()
+
+
+    def evict(self, maxsize: int = None) -> int:
+        """Remove least recently used entries until `maxsize`. Return count"""
+        if maxsize is None:
+            maxsize = self.maxsize
+        entries = []
+        for e in os.scandir(self.path):
+            if not e.name.endswith(EXT):
+                continue
+            # Other processes using the cache may remove entries meanwhile
+            try:
+                if e.is_file():
+                    st = e.stat()
+                    entries.append((st.st_mtime, st.st_size, e.path))
+            except FileNotFoundError:
+                continue
+        entries.sort()
+        total = sum(size for __, size, __ in entries)
+        count = 0
+        for __, size, path in entries:
+            if total <= maxsize:
+                break
+            self._remove(path)
+            total -= size
+            count += 1
+        self.evictions += count
+        return count
+
+
+    def clear(self) -> int:
+        """Remove all entries. Return count"""
+        return self.evict(0)
+
+
+    @property
+    def stats(self) -> dict:
+        return dict(hits=self.hits, misses=self.misses,
+                    stores=self.stores, evictions=self.evictions)
+
+
+    def _entry(self, key: str) -> str:
+        return os.path.join(self.path, key + EXT)
+
+
+    @staticmethod
+    def _remove(path: str):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+    def __repr__(self):
+        return '<{0}({1!r}, {2})>'.format(self.__class__.__name__, self.path,
+                                          self.stats)
+
+
+
+
+def default_path() -> str:
+    return os.path.join(
+        os.environ.get('XDG_CACHE_HOME') or
+        os.path.join(os.path.expanduser('~'), '.cache'),
+        __package__
+    )
+
+
+def enable(path: str = None, maxsize: int = None) -> SaveCache:
+    """Enable cache in `path`, `maxsize` bytes. Return the cache instance"""
+    kwargs = {} if maxsize is None else dict(maxsize=maxsize)
+    savefile.CACHE = SaveCache(path, **kwargs)
+    log.debug("Using save data cache at %s", savefile.CACHE.path)
+    return savefile.CACHE
+
+
+def disable() -> None:
+    savefile.CACHE = None
+
+
+def setup(**options) -> SaveCache:
+    """Enable or disable cache according to `options` from config file"""
+    opts = settings.get_options()
+    opts.update(options.copy())
+    cache = opts['cache']
+
+    if not cache.get('enabled'):
+        disable()
+        return None
+
+    try:
+        return enable(os.path.expanduser(os.path.expandvars(cache['path'])),
+                      int(cache['maxsize'] * 2**20))
+    except OSError as e:
+        raise u.FSException("Could not enable cache at %s: %s", cache['path'], e)
@@ -0,0 +1,218 @@
+# This file is part of Foshelter, see <https://github.com/MestreLion/foshelter>
+# Copyright (C) 2018 Rodrigo Silva (MestreLion) <linux@rodrigosilva.com>
+# License: GPLv3 or later, at your choice. See <http://www.gnu.org/licenses/gpl>
+
+"""
+    Columnar view of dwellers as NumPy arrays, for vectorized queries
+
+Each column is an array with one item per dweller, read from save data in a
+single pass, so filtering, sorting and aggregating thousands of dwellers needs
+no per-dweller Python code. See Dwellers.to_columns().
+
+Example:
+    cols = game.dwellers.to_columns()
+    strong = cols[(cols['strength'] >= 8) & (cols['level'] == 50)]
+    for dweller in strong.top('erating', 5).dwellers():
+        print(dweller)
+    strong.write(luck=10)
+"""
+
+import logging
+
+try:
+    import numpy as np  # PyPI: pip install numpy
+except ImportError:
+    np = None
+
+from . import dwellers as d
+from . import util
+
+
+SPECIAL = ('strength', 'perception', 'endurance', 'charisma',
+           'intelligence', 'agility', 'luck')
+
+# Column name: (data path, dtype, writable)
+# SPECIAL are the last 7 stats, as some saves have an unused leading one
+FIELDS = dict((
+    ('ID',      (('serializeId',),                'int64',   False)),
+    ('level',   (('experience', 'currentLevel'),  'int64',   True)),
+    ('hp',      (('health', 'maxHealth'),         'float64', True)),
+    ('gender',  (('gender',),                     'int8',    False)),
+    ('erating', (None,                            'float64', False)),
+), **{name: (('stats', 'stats', i - len(SPECIAL), 'value'), 'int64', True)
+      for i, name in enumerate(SPECIAL)})
+
+# Dweller attributes matching columns, whose EntityList indexes may change
+ATTRS = {'level': 'level', 'hp': 'hp'}
+
+# Dweller attributes derived from data, whose indexes may change on any write
+DERIVED = ('erating',)
+
+log = logging.getLogger(__name__)
+
+
+
+
+class DwellerColumns:
+    """
+    Columns of some or all dwellers in a Dwellers container, see FIELDS.
+
+    Use cols[name] for a column array, and cols[mask] or cols[indexes] for a
+    new DwellerColumns with only the selected rows. Columns are a snapshot:
+    after changing dwellers other than by write(), create new ones.
+    """
+    def __init__(self, dwellers: 'd.Dwellers', rows=None):
+        if np is None:
+            raise util.FSException("NumPy is required for dweller columns,"
+                                   " install it with: pip install numpy")
+        self._dwellers = dwellers
+        data = dwellers.to_data()
+        self.rows = (np.arange(len(data)) if rows is None else
+                     np.asarray(rows, dtype='intp'))
+
+        paths = [(name, path) for name, (path, __, __) in FIELDS.items() if path]
+        table = np.array([[_get(data[row], path, 0) for __, path in paths]
+                          for row in self.rows.tolist()],
+                         dtype='float64').reshape(len(self.rows), len(paths))
+
+        self.columns = {name: table[:, i].astype(FIELDS[name][1])
+                        for i, (name, __) in enumerate(paths)}
+        self._update_erating()
+
+
+    def _update_erating(self):
+        """Compute E17 rating column, vectorized Dweller._e17equiv()"""
+        level, hp = self.columns['level'], self.columns['hp']
+        endpts = (hp - 105 - 2.5 * (level - 1)) / 0.5
+        self.columns['erating'] = ((level * d.MAX_END - d.FULL_END - endpts) /
+                                   (d.MAX_END - d.FULL_END))
+
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __getitem__(self, key):
+        """Column array by name, or new columns of selected rows"""
+        if isinstance(key, str):
+            return self.columns[key]
+        return self._select(np.arange(len(self.rows))[key])
+
+    def _select(self, idx) -> 'DwellerColumns':
+        cols = self.__class__.__new__(self.__class__)
+        cols._dwellers = self._dwellers
+        cols.rows = self.rows[idx]
+        cols.columns = {k: v[idx] for k, v in self.columns.items()}
+        return cols
+
+
+    def dwellers(self) -> list:
+        """Return the Dweller of each row, in row order"""
+        return [self._dwellers[row] for row in self.rows.tolist()]
+
+
+    def sort(self, column: str, reverse: bool = False) -> 'DwellerColumns':
+        """Return rows sorted by `column`, stable"""
+        idx = np.argsort(self.columns[column], kind='stable')
+        return self._select(idx[::-1] if reverse else idx)
+
+
+    def top(self, column: str, k: int = 10,
+            reverse: bool = False) -> 'DwellerColumns':
+        """Return the `k` rows with highest `column`, or lowest if `reverse`"""
+        values = self.columns[column] if reverse else -self.columns[column]
+        k = min(k, len(values))
+        if k < len(values):
+            idx = np.argpartition(values, k - 1)[:k]
+            idx = idx[np.argsort(values[idx], kind='stable')]
+        else:
+            idx = np.argsort(values, kind='stable')
+        return self._select(idx)
+
+
+    def groupby(self, by: str, column: str = None, agg: str = 'count') -> dict:
+        """
+        Aggregate `column` of rows grouped by `by` column values.
+
+        `agg` is 'count', 'sum', 'mean', 'min' or 'max', and `column` is not
+        needed for 'count'. Return {value: aggregate} in ascending value order.
+        """
+        keys, inverse = np.unique(self.columns[by], return_inverse=True)
+        inverse = inverse.ravel()
+        if agg == 'count':
+            result = np.bincount(inverse, minlength=len(keys))
+        else:
+            values = self.columns[column]
+            if agg in ('sum', 'mean'):
+                result = np.bincount(inverse, weights=values, minlength=len(keys))
+                if agg == 'mean':
+                    result = result / np.bincount(inverse, minlength=len(keys))
+            elif agg in ('min', 'max'):
+                ufunc = np.minimum if agg == 'min' else np.maximum
+                result = np.full(len(keys), values[0] if len(values) else 0,
+                                 dtype=values.dtype)
+                ufunc.at(result, inverse, values)
+            else:
+                raise ValueError("Invalid aggregation: %r" % agg)
+        return dict(zip(keys.tolist(), result.tolist()))
+
+
+    def histogram(self, column: str, bins=10, range: tuple = None) -> tuple:
+        """Return (counts, bin edges) arrays of `column`, see numpy.histogram"""
+        return np.histogram(self.columns[column], bins=bins, range=range)
+
+
+    def write(self, **values) -> None:
+        """
+        Write columns back to dwellers save data, in a single pass.
+
+        Each keyword is a writable column name, see FIELDS, and its value is
+        an array with one item per row, or a scalar for all rows. Columns and
+        changed dwellers are updated, including their cached JSON.
+        """
+        for name in values:
+            if name not in FIELDS:
+                raise util.FSException("Invalid dweller column: %r", name)
+            if not FIELDS[name][2]:
+                raise util.FSException("Dweller column is read-only: %r", name)
+
+        # Save data types must be kept, as JSON format depends on them
+        columns = {name: np.broadcast_to(np.asarray(value).astype(FIELDS[name][1]),
+                                         self.rows.shape).copy()
+                   for name, value in values.items()}
+        lists = [(FIELDS[name][0], column.tolist())
+                 for name, column in columns.items()]
+
+        data = self._dwellers.to_data()
+        for i, row in enumerate(self.rows.tolist()):
+            for path, items in lists:
+                _set(data[row], path, items[i])
+            self._dwellers.touch(row)
+
+        self.columns.update(columns)
+        if 'level' in columns or 'hp' in columns:
+            self._update_erating()
+        for attr in set(ATTRS[_] for _ in columns if _ in ATTRS) | set(DERIVED):
+            self._dwellers.reindex(attr)
+        log.debug("Wrote %s of %d dwellers", ', '.join(columns), len(self.rows))
+
+
+    def __repr__(self):
+        return '<{0}({1} dwellers)>'.format(self.__class__.__name__, len(self))
+
+
+
+
+def _get(data, path: tuple, default=None):
+    """Value at `path` in data, or `default` if missing, as in some dwellers"""
+    try:
+        for key in path:
+            data = data[key]
+    except (KeyError, IndexError, TypeError):
+        return default
+    return data
+
+
+def _set(data, path: tuple, value) -> None:
+    for key in path[:-1]:
+        data = data[key]
+    data[path[-1]] = value
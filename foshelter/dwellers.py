@@ -8,10 +8,14 @@
 
 import logging
 import re
+import typing
 
 from . import orm
 from . import util
 
+if typing.TYPE_CHECKING:
+    from . import columns  # imported on use, as it imports this module
+
 
 MAX_LEVEL = 50
 
@@ -134,6 +138,11 @@ class Gender(util.FSEnum):
 
 
 class Dweller(orm.Entity):
+    """
+    A vault dweller. ID, level and HP are read from save data, and E17 rating
+    is computed on first use, so instances only hold data and that rating.
+    """
+    __slots__ = ('_erating',)
 
     re_einfo = re.compile(
         r'\b(?P<einfo>'
@@ -147,12 +156,26 @@ class Dweller(orm.Entity):
 
     def __init__(self, data: dict, root=None):
         super().__init__(data, root)
+        self._erating = None
 
-        self.ID    = data['serializeId']
-        self.level = data['experience']['currentLevel']
-        self.hp    = data['health']['maxHealth']
 
-        self.erating  = self._e17equiv()
+    @property
+    def ID(self) -> int:
+        return self._data['serializeId']
+
+    @property
+    def level(self) -> int:
+        return self._data['experience']['currentLevel']
+
+    @property
+    def hp(self) -> float:
+        return self._data['health']['maxHealth']
+
+    @property
+    def erating(self) -> float:
+        if self._erating is None:
+            self._erating = self._e17equiv()
+        return self._erating
 
 
     @property
@@ -164,6 +187,7 @@ class Dweller(orm.Entity):
         assert isinstance(v, str)
         if not v: return  # silently ignore, by design
         self._data['name'], __, self._data['lastName'] = v.strip().partition(' ')
+        self.touch()
 
 
     @property
@@ -276,9 +300,14 @@ class Dweller(orm.Entity):
         return e17_equiv(lvl, FULL_END)[0]
 
 
+    def touch(self) -> None:
+        super().touch()
+        self._erating = None
+
+
     def __repr__(self):
-        return ('<Dweller({ID:3d}, {level:2d}, {hp}, {0.gender.name}, {0.name})>'.
-                format(self, **vars(self)))
+        return ('<Dweller({0.ID:3d}, {0.level:2d}, {0.hp}, {0.gender.name},'
+                ' {0.name})>'.format(self))
 
 
     def __str__(self):
@@ -289,3 +318,8 @@ class Dweller(orm.Entity):
 
 class Dwellers(orm.EntityList):
     EntityClass = Dweller
+
+    def to_columns(self) -> 'columns.DwellerColumns':
+        """Return NumPy columns of all dwellers, see columns module"""
+        from . import columns
+        return columns.DwellerColumns(self)
@@ -0,0 +1,351 @@
+# This file is part of Foshelter, see <https://github.com/MestreLion/foshelter>
+# Copyright (C) 2018 Rodrigo Silva (MestreLion) <linux@rodrigosilva.com>
+# License: GPLv3 or later, at your choice. See <http://www.gnu.org/licenses/gpl>
+
+"""
+    Concurrent backup of many Android devices over FTP, using asyncio
+
+Devices are the [ftp:NAME] config sections, see settings.get_devices(). All
+devices are backed up at once by a single thread, each to a NAME directory in
+the backup directory, as an incremental backup_all() would: only files with
+changed facts are transferred, see backup module documentation.
+
+Each device uses up to `connections` FTP connections, counted per hostname, so
+slot files are downloaded in parallel while not overloading any phone FTP
+server. Each device backup is limited to `timeout` seconds, and a failed
+device does not affect the others.
+"""
+
+import os
+import time
+import asyncio
+import ftplib
+import logging
+import collections
+import concurrent.futures
+
+from . import backup
+from . import settings
+from . import util as u
+
+
+# Per-device backup result. `files` and `changed` are as in backup.backup_all()
+# `error` is the exception that aborted the backup, if any
+Result = collections.namedtuple('Result', 'device files changed error seconds')
+
+log = logging.getLogger(__name__)
+
+
+
+
+class AsyncFTP:
+    """
+    Minimal asyncio FTP client, with passive mode binary transfers.
+
+    Replies are checked as ftplib does, raising its exceptions. See
+    android.ftp_read() for `ftp_options`.
+    """
+    def __init__(self, **ftp_options):
+        # Settings are only read for missing options, as reading them may block
+        if set(settings.FACTORY['ftp']) - set(ftp_options):
+            ftp_options = dict(settings.get_options()['ftp'], **ftp_options)
+        self.options = dict(ftp_options)
+        self._reader = self._writer = None
+
+
+    async def connect(self) -> None:
+        """Connect, log in, set binary mode and change to savepath"""
+        options = self.options
+        self._reader, self._writer = await asyncio.open_connection(
+            options['hostname'], options['port'] or 21)
+        await self._reply()
+
+        user = options['username'] or 'anonymous'
+        passwd = options['password'] if options['username'] else 'anonymous@'
+        if (await self.command('USER ' + user)).startswith('3'):
+            await self.command('PASS ' + passwd)
+        await self.command('TYPE I')
+        if options['savepath']:
+            await self.command('CWD ' + options['savepath'])
+
+
+    async def close(self) -> None:
+        """Quit and close connection, ignoring errors"""
+        if self._writer is None:
+            return
+        try:
+            await asyncio.wait_for(self.command('QUIT'), 5)
+        except (OSError, EOFError, asyncio.TimeoutError, ftplib.Error):
+            pass
+        finally:
+            self._writer.close()
+            self._writer = self._reader = None
+
+
+    async def command(self, cmd: str) -> str:
+        """Send a command, return its reply. Raise ftplib errors on failure"""
+        self._writer.write(cmd.encode('utf-8') + b'\r\n')
+        await self._writer.drain()
+        return await self._reply()
+
+
+    async def facts(self) -> dict:
+        """List savepath files. See android.ftp_facts()"""
+        try:
+            lines = (await self._transfer('MLSD')).decode('utf-8').splitlines()
+        except ftplib.error_perm as e:
+            if not str(e).startswith('50'):
+                raise
+            return await self._facts_nlst()
+
+        files = {}
+        for line in lines:
+            factstr, __, name = line.partition(' ')
+            facts = dict(_.partition('=')[::2] for _ in factstr.split(';') if _)
+            facts = {k.lower(): v for k, v in facts.items()}
+            if facts.get('type', 'file') == 'file' and 'size' in facts:
+                files[name] = dict(facts, size=int(facts['size']))
+        return files
+
+
+    async def _facts_nlst(self) -> dict:
+        # MLSD not supported, try NLST, SIZE and MDTM
+        files = {}
+        for name in (await self._transfer('NLST')).decode('utf-8').splitlines():
+            name = name.rpartition('/')[2]
+            try:
+                size = int((await self.command('SIZE ' + name)).split()[-1])
+                modify = (await self.command('MDTM ' + name)).split()[-1]
+            except ftplib.error_perm:
+                continue  # most likely a directory
+            files[name] = dict(size=size, modify=modify)
+        return files
+
+
+    async def retrieve(self, name: str, path: str) -> int:
+        """
+        Download `name` to local `path`, atomically replacing it. Return size
+
+        Data is written to a temporary file as it arrives, then flushed to disk
+        in a thread, not to block the event loop, and renamed.
+        """
+        with u.atomic_write(path, sync=False) as fp:
+            size = await self._transfer('RETR ' + name, fp.write)
+            fp.flush()
+            await asyncio.get_running_loop().run_in_executor(
+                None, os.fsync, fp.fileno())
+        return size
+
+
+    async def _transfer(self, cmd: str, callback=None):
+        """
+        Run a passive mode transfer command, passing data to `callback`.
+        Return total size, or all data if no callback.
+        """
+        # Like ftplib, ignore PASV host and use the control connection one
+        __, port = ftplib.parse227(await self.command('PASV'))
+        host = self._writer.get_extra_info('peername')[0]
+        reader, writer = await asyncio.open_connection(host, port)
+        try:
+            await self.command(cmd)
+            data = bytearray()
+            size = 0
+            while True:
+                block = await reader.read(2**16)
+                if not block:
+                    break
+                size += len(block)
+                if callback:
+                    callback(block)
+                else:
+                    data.extend(block)
+        finally:
+            writer.close()
+        await self._reply()
+        return size if callback else bytes(data)
+
+
+    async def _reply(self) -> str:
+        line = await self._readline()
+        reply = line
+        if line[3:4] == '-':
+            code = line[:3]
+            while not (line[:3] == code and line[3:4] != '-'):
+                line = await self._readline()
+                reply += '\n' + line
+
+        if reply[:1] in '123':
+            return reply
+        if reply[:1] == '4':
+            raise ftplib.error_temp(reply)
+        if reply[:1] == '5':
+            raise ftplib.error_perm(reply)
+        raise ftplib.error_proto(reply)
+
+
+    async def _readline(self) -> str:
+        line = await self._reader.readline()
+        if not line:
+            raise EOFError("FTP connection closed by server")
+        return line.decode('utf-8', 'replace').rstrip('\r\n')
+
+
+    def __repr__(self):
+        return '<{0}({1}:{2})>'.format(self.__class__.__name__,
+                                       self.options['hostname'],
+                                       self.options['port'] or 21)
+
+
+
+
+def backup_fleet(target: str = None, devices: dict = None,
+                 incremental: bool = True, **options) -> list:
+    """
+    Backup all game slot files of many devices concurrently.
+
+    Each device in `devices`, a {name: ftp_options} dict, or all devices from
+    config if None, is backed up to a `name` directory in `target`. If not
+    `incremental`, transfer all files. Use 'fleet' options from `options`
+    or config file for limits, see module documentation.
+
+    Return a list of Result, one for each device, in `devices` order.
+    """
+    opts = settings.get_options()
+    opts.update(options.copy())
+
+    if devices is None:
+        devices = settings.get_devices()
+    if not devices:
+        raise u.FSException("No devices to backup, add [ftp:NAME] config"
+                            " sections for each one")
+
+    # Resolve all options now, as reading settings blocks the event loop
+    devices = {name: dict(opts['ftp'], **ftp_options)
+               for name, ftp_options in devices.items()}
+    ids = {name: backup.device_id(main={'platform': 'android'},
+                                  android={'method': 'ftp'}, ftp=ftp_options)
+           for name, ftp_options in devices.items()}
+
+    return asyncio.run(_backup_fleet(target or "", devices, ids, incremental,
+                                     **opts['fleet']))
+
+
+async def _backup_fleet(target, devices, ids, incremental, connections=2,
+                        timeout=0, jobs=0):
+    hosts = collections.defaultdict(lambda: asyncio.Semaphore(connections or 1))
+    jobs = asyncio.Semaphore(jobs or len(devices))
+
+    async def run(name, ftp_options):
+        async with jobs:
+            start = time.perf_counter()
+            files, changed = [], []
+            try:
+                await asyncio.wait_for(
+                    _backup_device(name, ftp_options, ids[name], target,
+                                   incremental, hosts[ftp_options['hostname']],
+                                   files, changed),
+                    timeout or None)
+            except asyncio.TimeoutError:
+                error = u.FSException("Timed out after %s seconds", timeout)
+            except (OSError, EOFError, ftplib.Error, u.FSException) as e:
+                error = e
+            except Exception as e:
+                # Such as ValueError on malformed replies. Still, a failed
+                # device must not affect the others
+                log.debug("%s: unexpected error", name, exc_info=True)
+                error = e
+            else:
+                error = None
+            result = Result(name, files, changed, error,
+                            time.perf_counter() - start)
+        if error:
+            log.error("%s: %s", name, error)
+        else:
+            log.info("%s: %d files, %d transferred in %.1f seconds", name,
+                     len(files), len(changed), result.seconds)
+        return result
+
+    return await asyncio.gather(*(run(name, ftp_options)
+                                  for name, ftp_options in devices.items()))
+
+
+async def _backup_device(name, ftp_options, device, target, incremental,
+                         limit, files, changed):
+    """
+    Backup a device with `device` ID, see backup.device_id(), adding local
+    paths to `files` and `changed` lists
+    """
+    path = os.path.join(target, name)
+    os.makedirs(path, exist_ok=True)
+    manifest = backup.Manifest(os.path.join(path, backup.MANIFEST))
+    queue = collections.deque()
+    started = set()
+
+    # Manifest hashes files and saves itself, so run it in a thread, not to
+    # block the event loop, and a single one, so it is never used concurrently
+    loop = asyncio.get_running_loop()
+    executor = concurrent.futures.ThreadPoolExecutor(1)
+
+    def blocking(func, *args):
+        return loop.run_in_executor(executor, func, *args)
+
+    async def drain(ftp):
+        while queue:
+            filename, facts = queue.popleft()
+            local = os.path.join(path, filename)
+            log.info("%s: downloading %s", name, filename)
+            await ftp.retrieve(filename, local)
+            await blocking(manifest.update, device, filename, facts, local)
+            changed.append(local)
+
+    async def worker():
+        async with limit:
+            if not queue:
+                return
+            started.add(asyncio.current_task())
+            ftp = AsyncFTP(**ftp_options)
+            try:
+                await ftp.connect()
+                await drain(ftp)
+            finally:
+                await ftp.close()
+
+    async with limit:
+        ftp = AsyncFTP(**ftp_options)
+        try:
+            await ftp.connect()
+            remote = await ftp.facts()
+            for slot in backup.SLOTS:
+                for bkp in (False, True):
+                    filename = u.savename(slot, bkp)
+                    if filename not in remote:
+                        continue
+                    local = os.path.join(path, filename)
+                    files.append(local)
+                    if incremental and await blocking(
+                            manifest.unchanged, device, filename,
+                            remote[filename], local):
+                        continue
+                    queue.append((filename, remote[filename]))
+
+            # This connection and up to `connections` - 1 more, if available.
+            # Workers still waiting for a connection when done are cancelled,
+            # as this one holds it.
+            workers = [asyncio.ensure_future(worker())
+                       for __ in range(len(queue) - 1)]
+            try:
+                await drain(ftp)
+                for task in workers:
+                    if task not in started:
+                        task.cancel()
+                await asyncio.gather(*(_ for _ in workers if _ in started))
+            finally:
+                for task in workers:
+                    task.cancel()
+                await asyncio.gather(*workers, return_exceptions=True)
+        finally:
+            await ftp.close()
+            try:
+                await blocking(manifest.save)
+            finally:
+                executor.shutdown(wait=False)
@@ -6,11 +6,12 @@
     Top level game classes
 """
 
-import json
+import os
 
 from . import orm
 from . import dwellers
 from . import savefile
+from . import instrument
 from . import util
 
 
@@ -39,42 +40,138 @@ class LunchBoxes(orm.EntityList):
 class Game(orm.RootEntity):
     """Root class for a game save"""
 
+    # Save data paths used by Game, always decoded on partial loading
+    SECTIONS = ('dwellers.dwellers', 'vault.LunchBoxesByType')
+
+    @classmethod
+    def from_save(cls, path: str, decrypted: bool = False, sections=None):
+        """
+        Load a game from an encrypted SAV file, or a decrypted JSON one.
+
+        If `sections` is not None, load partially: only SECTIONS and the given
+        dotted paths are decoded, everything else is kept as raw JSON and
+        written back unchanged on save. See savefile.decode()
+        """
+        with instrument.stage('game.from_save') as record:
+            game = cls._from_save(path, decrypted, sections)
+            if record:
+                record.bytes = os.path.getsize(path)
+            return game
+
+
     @classmethod
-    def from_save(cls, path: str, decrypted: bool = False):
-        with open(path, 'r') as fd:
-            data = fd.read()
+    def _from_save(cls, path: str, decrypted: bool, sections):
+        if sections is not None:
+            sections = cls.SECTIONS + tuple(sections)
+
+        with instrument.stage('game.read') as record:
+            with open(path, 'rb') as fd:
+                data = fd.read()
+            if record:
+                record.bytes = len(data)
 
         if decrypted:
             try:
-                return cls.from_data(savefile.decode(data))
-            except json.decoder.JSONDecodeError as e:
+                obj = savefile.decode(data, sections)
+            except ValueError as e:  # Also JSON and UnicodeDecodeError
                 raise util.FSException('Could not load Vault data,'
                    ' is it a decrypted JSON file? %s: %s', path, e)
+            data = plaintext = None
 
-        try:
-            return cls.from_data(savefile.decrypt(data))
-        except ValueError as e:
-            raise util.FSException('Could not load Vault data,'
-               ' is it an encrypted SAV file? %s: %s', path, e)
+        # Keep original save data and its plaintext for incremental saving.
+        # On a cache hit the plaintext is not available, decrypt on saving.
+        else:
+            try:
+                if savefile.CACHE is None:
+                    plaintext = savefile.decrypt_data(data)
+                    obj = savefile.decode(plaintext, sections)
+                else:
+                    plaintext = None
+                    obj = savefile.decrypt(data, sections)
+            except ValueError as e:
+                raise util.FSException('Could not load Vault data,'
+                   ' is it an encrypted SAV file? %s: %s', path, e)
+
+        with instrument.stage('game.orm'):
+            game = cls.from_data(obj)
+        game._savedata, game._plaintext = data, plaintext
+        return game
 
 
     def __init__(self, data: dict):
         super().__init__(data)
 
+        # Last loaded or saved encrypted data, see to_save()
+        self._savedata  = None
+        self._plaintext = None
+
         self.dwellers = dwellers.Dwellers(data['dwellers']['dwellers'], self)
         self.lunchboxes = LunchBoxes(data["vault"]["LunchBoxesByType"], self)
 
 
-    def to_save(self, path:str, decrypted=False, pretty=False, sort=False):
-        if decrypted:
-            data = savefile.encode(self.to_data(), pretty, sort)
-            with open(path, 'w') as fd:
+    def to_save(self, path:str, decrypted=False, pretty=False, sort=False,
+                stream=False, cached=False):
+        """
+        Save game to an encrypted SAV file, or a decrypted JSON one.
+
+        `path` is atomically replaced, so it is never left half-written. A game
+        loaded from a SAV file is re-encrypted incrementally, see
+        savefile.reencrypt(), unless `stream`. Otherwise, and for JSON, data is
+        streamed to file as it is encoded, see savefile.dump(), which uses far
+        less memory but is slower for large saves.
+
+        When re-encrypting, if `cached`, dwellers unchanged since the previous
+        cached save are not encoded again, see orm.RootEntity. Only use it if
+        all changes since then were made by entity setters or followed by
+        touch(), as other changes to cached dwellers would not be saved.
+        """
+        with instrument.stage('game.to_save') as record:
+            self._to_save(path, decrypted, pretty, sort, stream, cached)
+            if record:
+                record.bytes = os.path.getsize(path)
+
+
+    def _to_save(self, path:str, decrypted, pretty, sort, stream, cached):
+        if not cached:
+            self.clear_json()
+        if decrypted or stream or self._savedata is None:
+            with util.atomic_write(path) as fd:
+                savefile.dump(self.to_data(), fd, decrypted, pretty, sort)
+            if not decrypted:
+                # Only kept when needed for incremental saving
+                self._savedata = self._plaintext = None
+            return
+
+        # Re-encrypt only from the first changed block since last load or save
+        plaintext = savefile.encode(self._cached_data() if cached else
+                                    self._data).encode('ascii')
+        if self._plaintext is None:
+            self._plaintext = savefile.decrypt_data(self._savedata)
+        data = savefile.reencrypt(plaintext, self._plaintext, self._savedata)
+
+        with instrument.stage('game.write', len(data)):
+            with util.atomic_write(path) as fd:
                 fd.write(data)
-                return
 
-        data = savefile.encrypt(self.to_data())
-        with open(path, 'wb') as fd:
-            fd.write(data)
+        self._savedata, self._plaintext = data, plaintext
+
+
+    def _cached_data(self) -> dict:
+        """
+        Game data for compact encoding, with dwellers replaced by their JSON.
+
+        Dwellers JSON is joined from each one's cached JSON, see
+        orm.EntityList.to_json(), so only changed dwellers are encoded again.
+        Only data dicts on the path to dwellers are copied, shallowly.
+        """
+        data = self._data.copy()
+        data['dwellers'] = dict(data['dwellers'],
+                                dwellers=self.dwellers.to_json())
+        # Discard the cache of removed dwellers, which also keeps their data
+        current = set(map(id, self.dwellers.to_data()))
+        for key in [_ for _ in self._json if _ not in current]:
+            del self._json[key]
+        return data
 
 
     def update_lunchboxes(self):
@@ -0,0 +1,357 @@
+# This file is part of Foshelter, see <https://github.com/MestreLion/foshelter>
+# Copyright (C) 2018 Rodrigo Silva (MestreLion) <linux@rodrigosilva.com>
+# License: GPLv3 or later, at your choice. See <http://www.gnu.org/licenses/gpl>
+
+"""
+    SQLite index of vault history across archived save files
+
+Sources are save files, legacy zip archives of saves, as made by backup_all()
+before snapshot stores, and snapshot stores. Each distinct save found in them,
+by the SHA-256 of its data, is indexed once as a snapshot, with its dwellers
+and vault counters, so questions such as "when did dweller 123 reach level 50"
+are a single query:
+
+    SELECT time, level FROM snapshots JOIN dwellers ON snapshot = id
+    WHERE dweller = 123 AND level >= 50 ORDER BY time LIMIT 1
+
+Indexing is incremental: source files already indexed, by their SHA-256, are
+skipped unread, as are saves already indexed from any source. Store snapshots
+are skipped by the hashes in their manifests. Each source is indexed in a single
+transaction, so an interrupted run keeps all fully indexed ones. Invalid saves
+are logged as errors and counted as failed, never aborting their source.
+Queries run on a read-only connection, so they can not change the index.
+
+Tables:
+    sources   (sha256, path, kind, indexed)  kind is 'save', 'zip' or 'store'
+    snapshots (id, sha256, source, name, time, vault, dwellers)
+    dwellers  (snapshot, dweller, name, level, hp, gender, erating,
+               strength, perception, endurance, charisma, intelligence,
+               agility, luck)
+    counters  (snapshot, name, value)  numbers in vault, such as
+               'LunchBoxesCount', and its storage as 'resources.Food'
+"""
+
+import os
+import sqlite3
+import zipfile
+import hashlib
+import datetime
+import logging
+import urllib.request
+
+from . import dwellers as d
+from . import savefile
+from . import snapshot
+from . import util as u
+
+
+# Bump on any change in database schema, rebuilding it
+VERSION = 1
+
+# Save data sections needed for indexing, see savefile.decode()
+SECTIONS = ('dwellers.dwellers', 'vault')
+
+# Outcomes of indexing a save, see HistoryIndex._add()
+INDEXED, SKIPPED, FAILED = range(3)
+
+SPECIAL = ('strength', 'perception', 'endurance', 'charisma',
+           'intelligence', 'agility', 'luck')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sources (
+    sha256    TEXT PRIMARY KEY,
+    path      TEXT NOT NULL,
+    kind      TEXT NOT NULL,
+    indexed   TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS snapshots (
+    id        INTEGER PRIMARY KEY,
+    sha256    TEXT NOT NULL UNIQUE,
+    source    TEXT NOT NULL,
+    name      TEXT NOT NULL,
+    time      TEXT NOT NULL,
+    vault     TEXT,
+    dwellers  INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS dwellers (
+    snapshot  INTEGER NOT NULL REFERENCES snapshots(id),
+    dweller   INTEGER NOT NULL,
+    name      TEXT,
+    level     INTEGER,
+    hp        REAL,
+    gender    INTEGER,
+    erating   REAL,
+    {0},
+    PRIMARY KEY (snapshot, dweller)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS dwellers_dweller ON dwellers (dweller, snapshot);
+CREATE TABLE IF NOT EXISTS counters (
+    snapshot  INTEGER NOT NULL REFERENCES snapshots(id),
+    name      TEXT NOT NULL,
+    value     REAL,
+    PRIMARY KEY (snapshot, name)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS snapshots_time ON snapshots (time);
+""".format(',\n    '.join('{0:9} INTEGER'.format(_) for _ in SPECIAL))
+
+log = logging.getLogger(__name__)
+
+
+
+
+class HistoryIndex:
+    """SQLite history index database at `path`, created if needed"""
+    def __init__(self, path: str):
+        self.path = path
+        self._ro = None  # Read-only connection for queries, see query()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.db = sqlite3.connect(path)
+        version = self.db.execute('PRAGMA user_version').fetchone()[0]
+        if version not in (0, VERSION):
+            log.warning("Rebuilding history index %s, version %d is not %d",
+                        path, version, VERSION)
+            self.db.executescript('DROP TABLE IF EXISTS counters;'
+                                  ' DROP TABLE IF EXISTS dwellers;'
+                                  ' DROP TABLE IF EXISTS snapshots;'
+                                  ' DROP TABLE IF EXISTS sources;')
+        self.db.executescript(SCHEMA)
+        self.db.execute('PRAGMA user_version = %d' % VERSION)
+
+
+    def close(self) -> None:
+        if self._ro is not None:
+            self._ro.close()
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+    def ingest(self, paths) -> tuple:
+        """
+        Index all saves in `paths`: save files, zip archives, snapshot stores,
+        or directories searched for any of these. Each file or store is indexed
+        in a transaction. Return (indexed, skipped, failed) number of saves.
+        """
+        total = [0, 0, 0]
+        for path in paths:
+            for kind, source in _sources(path):
+                log.info("Indexing %s", source)
+                counts = getattr(self, '_ingest_' + kind)(source)
+                total = [a + b for a, b in zip(total, counts)]
+        log.info("Indexed %d saves, %d already indexed, %d failed", *total)
+        return tuple(total)
+
+
+    def query(self, sql: str, params=()) -> sqlite3.Cursor:
+        """
+        Run an SQL query, see module documentation for tables. It runs on a
+        read-only connection, so any statement changing the index fails.
+        """
+        try:
+            if self._ro is None:
+                self._ro = sqlite3.connect('file:{0}?mode=ro'.format(
+                    urllib.request.pathname2url(os.path.abspath(self.path))),
+                    uri=True)
+            return self._ro.execute(sql, params)
+        except sqlite3.Error as e:
+            raise u.FSException("Invalid history query: %s", e)
+
+
+    def _ingest_save(self, path: str) -> tuple:
+        with open(path, 'rb') as fd:
+            data = fd.read()
+        digest = hashlib.sha256(data).hexdigest()
+        counts = [0, 0, 0]
+        if self._indexed(digest):
+            counts[SKIPPED] += 1
+            return tuple(counts)
+        with self.db:
+            counts[self._add(digest, path, os.path.basename(path),
+                             os.path.getmtime(path), data)] += 1
+            self._add_source(digest, path, 'save')
+        return tuple(counts)
+
+
+    def _ingest_zip(self, path: str) -> tuple:
+        digest = _sha256(path)
+        counts = [0, 0, 0]
+        if self._indexed(digest):
+            return tuple(counts)
+        try:
+            zfd = zipfile.ZipFile(path)
+        except zipfile.BadZipFile as e:
+            log.error("Not indexing %s: %s", path, e)
+            return tuple(counts)
+        with self.db, zfd:
+            for info in zfd.infolist():
+                if not _is_save(info.filename):
+                    continue
+                data = zfd.read(info)
+                counts[self._add(hashlib.sha256(data).hexdigest(),
+                                 '{0}:{1}'.format(path, info.filename),
+                                 os.path.basename(info.filename),
+                                 datetime.datetime(*info.date_time).timestamp(),
+                                 data)] += 1
+            self._add_source(digest, path, 'zip')
+        return tuple(counts)
+
+
+    def _ingest_store(self, path: str) -> tuple:
+        # Stores are never indexed as a whole, as new snapshots may be added
+        store = snapshot.SnapshotStore(path)
+        counts = [0, 0, 0]
+        with self.db:
+            for snapid in store.snapshots():
+                for entry in store.manifest(snapid)['files']:
+                    if not _is_save(entry['name']):
+                        continue
+                    if self._exists(entry['sha256']):
+                        counts[SKIPPED] += 1
+                        continue
+                    counts[self._add(entry['sha256'],
+                                     '{0}:{1}'.format(path, snapid),
+                                     entry['name'], entry['mtime'] / 1e9,
+                                     store.content(entry),
+                                     decrypted=entry['format'] == 'save')] += 1
+        return tuple(counts)
+
+
+    def _indexed(self, digest: str) -> bool:
+        return self.db.execute('SELECT 1 FROM sources WHERE sha256 = ?',
+                               (digest,)).fetchone() is not None
+
+    def _exists(self, digest: str) -> bool:
+        return self.db.execute('SELECT 1 FROM snapshots WHERE sha256 = ?',
+                               (digest,)).fetchone() is not None
+
+
+    def _add_source(self, digest: str, path: str, kind: str) -> None:
+        self.db.execute('INSERT OR REPLACE INTO sources VALUES (?, ?, ?, ?)',
+                        (digest, os.path.abspath(path), kind,
+                         datetime.datetime.now().isoformat(' ', 'seconds')))
+
+
+    def _add(self, digest: str, source: str, name: str, mtime: float,
+             data: bytes, decrypted: bool = False) -> int:
+        """
+        Index a save, unless already indexed.
+        Return INDEXED, SKIPPED if already indexed or FAILED if invalid.
+        """
+        if self._exists(digest):
+            return SKIPPED
+        try:
+            if decrypted:
+                obj = savefile.decode(data, SECTIONS)
+            else:
+                obj = savefile.decrypt(data, SECTIONS)
+            vault = obj.get('vault', {})
+            dwellers = obj['dwellers']['dwellers']
+            rows = [_dweller_row(_) for _ in dwellers]
+            counters = list(_counters(vault))
+        except (ValueError, KeyError, TypeError, AttributeError,
+                u.FSException) as e:
+            # Also binascii.Error and json.JSONDecodeError
+            log.error("Not indexing %s: not a valid save: %s", source, e)
+            return FAILED
+        cursor = self.db.execute(
+            'INSERT INTO snapshots (sha256, source, name, time, vault, dwellers)'
+            ' VALUES (?, ?, ?, ?, ?, ?)',
+            (digest, source, name,
+             datetime.datetime.fromtimestamp(mtime).isoformat(' ', 'seconds'),
+             vault.get('VaultName'), len(dwellers)))
+        snapid = cursor.lastrowid
+
+        self.db.executemany(
+            'INSERT OR REPLACE INTO dwellers VALUES ({0})'.format(
+                ', '.join('?' * (7 + len(SPECIAL)))),
+            ((snapid,) + _ for _ in rows))
+        self.db.executemany('INSERT OR REPLACE INTO counters VALUES (?, ?, ?)',
+                            ((snapid, k, v) for k, v in counters))
+        log.debug("Indexed %s: %d dwellers", source, len(dwellers))
+        return INDEXED
+
+
+    def __repr__(self):
+        return '<{0}({1!r})>'.format(self.__class__.__name__, self.path)
+
+
+
+
+def default_path() -> str:
+    return os.path.join(
+        os.environ.get('XDG_DATA_HOME') or
+        os.path.join(os.path.expanduser('~'), '.local', 'share'),
+        __package__, 'history.sqlite'
+    )
+
+
+def _sources(path: str):
+    """Yield (kind, path) of each source in `path`, see HistoryIndex.ingest()"""
+    if os.path.isdir(path):
+        if snapshot.is_store(path):
+            yield 'store', path
+            return
+        for root, dirs, files in os.walk(path):
+            for name in sorted(dirs):
+                if snapshot.is_store(os.path.join(root, name)):
+                    dirs.remove(name)
+                    yield 'store', os.path.join(root, name)
+            dirs.sort()
+            for name in sorted(files):
+                kind = _kind(name)
+                if kind:
+                    yield kind, os.path.join(root, name)
+        return
+    kind = _kind(path)
+    if not kind:
+        raise u.FSException("Not a save file, zip archive or snapshot store: %s",
+                            path)
+    yield kind, path
+
+
+def _kind(path: str) -> str:
+    if path.lower().endswith('.zip'):
+        return 'zip'
+    if _is_save(path):
+        return 'save'
+    return ''
+
+
+def _is_save(path: str) -> bool:
+    return path.lower().endswith(('.sav', '.sav.bkp'))
+
+
+def _dweller_row(data: dict) -> tuple:
+    """Dweller columns of `data`. SPECIAL are the last 7 stats, see columns"""
+    dweller = d.Dweller(data)
+    try:
+        erating = dweller.erating
+    except (AssertionError, ArithmeticError):
+        erating = None
+    stats = data.get('stats', {}).get('stats', [])[-len(SPECIAL):]
+    stats = [_.get('value') for _ in stats]
+    return ((dweller.ID, dweller.name, dweller.level, dweller.hp,
+             data.get('gender'), erating) +
+            tuple(stats + [None] * (len(SPECIAL) - len(stats))))
+
+
+def _counters(vault: dict):
+    """Yield (name, value) of vault numbers and storage resources"""
+    for prefix, obj in (('', vault), ('resources.', vault.get('storage', {}).get(
+            'resources', {}))):
+        for k, v in obj.items():
+            if isinstance(v, (int, float)) and not isinstance(v, bool):
+                yield prefix + k, v
+
+
+def _sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as fd:
+        for block in iter(lambda: fd.read(2**20), b''):
+            digest.update(block)
+    return digest.hexdigest()
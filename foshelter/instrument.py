@@ -0,0 +1,165 @@
+# This file is part of Foshelter, see <https://github.com/MestreLion/foshelter>
+# Copyright (C) 2018 Rodrigo Silva (MestreLion) <linux@rodrigosilva.com>
+# License: GPLv3 or later, at your choice. See <http://www.gnu.org/licenses/gpl>
+
+"""
+    Optional timing and memory instrumentation of load, save and transfers
+
+Pipeline stages are wrapped in stage() blocks, which are no-ops unless enabled.
+When enabled, each stage run records wall time, bytes processed and, if memory
+tracking is on, peak Python allocations using tracemalloc. Records are
+aggregated in STATS and emitted as DEBUG log records with the same data as
+`extra` attributes: `stage`, `seconds`, `bytes` and `peak`.
+"""
+
+import time
+import logging
+import tracemalloc
+import contextlib
+import collections
+
+
+log = logging.getLogger(__name__)
+
+ENABLED = False
+MEMORY  = False
+
+_stack = []  # nested stages being run
+_null = contextlib.nullcontext()
+
+
+
+
+class Record:
+    """A single run of a stage. `bytes` may be set while the stage runs"""
+    __slots__ = ('stage', 'bytes', 'seconds', 'peak', '_start', '_base')
+
+    def __init__(self, stage: str, nbytes: int = 0):
+        self.stage   = stage
+        self.bytes   = nbytes
+        self.seconds = 0.0
+        self.peak    = 0
+
+    def __repr__(self):
+        return '<Record({0.stage}, {0.seconds:.6f}s, {0.bytes} bytes,' \
+               ' peak {0.peak})>'.format(self)
+
+
+class StageStats:
+    """Aggregated statistics of a stage"""
+    __slots__ = ('calls', 'seconds', 'bytes', 'peak')
+
+    def __init__(self):
+        self.calls   = 0
+        self.seconds = 0.0
+        self.bytes   = 0
+        self.peak    = 0
+
+    def add(self, record: Record):
+        self.calls   += 1
+        self.seconds += record.seconds
+        self.bytes   += record.bytes
+        self.peak     = max(self.peak, record.peak)
+
+    @property
+    def mb_s(self) -> float:
+        return self.bytes / self.seconds / 10**6 if self.seconds else 0.0
+
+
+class Stats:
+    """Collected records, aggregated by stage in order of first run"""
+    def __init__(self):
+        self.stages = collections.OrderedDict()
+        self.records = []
+
+    def add(self, record: Record):
+        self.records.append(record)
+        self.stages.setdefault(record.stage, StageStats()).add(record)
+
+    def clear(self):
+        self.stages.clear()
+        self.records.clear()
+
+    def as_dict(self) -> dict:
+        return collections.OrderedDict(
+            (name, dict(calls=s.calls, seconds=s.seconds, bytes=s.bytes,
+                        peak=s.peak, mb_s=s.mb_s))
+            for name, s in self.stages.items())
+
+    def report(self) -> str:
+        lines = ['{:24} {:>5} {:>10} {:>12} {:>9} {:>10}'.format(
+            'stage', 'calls', 'ms', 'bytes', 'MB/s', 'peak KiB')]
+        for name, s in self.stages.items():
+            lines.append('{:24} {:5d} {:10.2f} {:12d} {:9.2f} {:10.1f}'.format(
+                name, s.calls, 1000 * s.seconds, s.bytes, s.mb_s,
+                s.peak / 1024))
+        return '\n'.join(lines)
+
+
+STATS = Stats()
+
+
+
+
+def enable(memory: bool = True) -> Stats:
+    """Enable instrumentation, and memory tracking if `memory`. Return STATS"""
+    global ENABLED, MEMORY
+    ENABLED = True
+    MEMORY = memory
+    if memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    return STATS
+
+
+def disable() -> None:
+    global ENABLED, MEMORY
+    if MEMORY and tracemalloc.is_tracing():
+        tracemalloc.stop()
+    ENABLED = MEMORY = False
+
+
+def stage(name: str, nbytes: int = 0):
+    """
+    Context manager instrumenting a stage named `name`, processing `nbytes`.
+
+    Yield the Record when enabled, so `bytes` can be set when only known at
+    the end of the stage, or None otherwise. Stages can be nested, and an
+    outer stage peak memory includes the peak of its inner stages.
+    """
+    if not ENABLED:
+        return _null
+    return _stage(name, nbytes)
+
+
+@contextlib.contextmanager
+def _stage(name: str, nbytes: int = 0):
+    record = Record(name, nbytes)
+    memory = MEMORY and tracemalloc.is_tracing()
+
+    if memory:
+        current, peak = tracemalloc.get_traced_memory()
+        if _stack:
+            parent = _stack[-1]
+            parent.peak = max(parent.peak, peak - parent._base)
+        tracemalloc.reset_peak()
+        record._base = current
+    _stack.append(record)
+
+    start = time.perf_counter()
+    try:
+        yield record
+    finally:
+        record.seconds = time.perf_counter() - start
+        _stack.pop()
+        if memory:
+            peak = tracemalloc.get_traced_memory()[1]
+            record.peak = max(record.peak, peak - record._base)
+            if _stack:
+                parent = _stack[-1]
+                parent.peak = max(parent.peak, peak - parent._base)
+
+        STATS.add(record)
+        log.debug("%s: %.3f ms, %d bytes, peak %d bytes", name,
+                  1000 * record.seconds, record.bytes, record.peak,
+                  extra=dict(stage=name, seconds=record.seconds,
+                             bytes=record.bytes, peak=record.peak))
@@ -8,8 +8,14 @@
 
 import collections.abc
 
+from . import savefile
+
 
 class Base:
+    # Subclasses with many instances, such as entities, SHOULD also declare
+    # __slots__, holding only what can not be derived from data
+    __slots__ = ('_data', '_root')
+
     @classmethod
     def from_data(cls, data, root=None):
         return cls(data, root)
@@ -22,18 +28,61 @@ class Base:
     def to_data(self):
         return self._data
 
+    def to_json(self) -> savefile.RawJSON:
+        """
+        Return data encoded as compact game JSON, cached in root until changed.
+
+        Cache is keyed by data, so it is shared by all entities with the same
+        data, such as the ones in container copies. Setters and other methods
+        that change data MUST call touch(), and so must any code changing data
+        directly, or data will be saved as it was when first encoded. See
+        RootEntity for when the cache is used.
+        """
+        return _to_json(self._data, self._root)
+
+    def touch(self) -> None:
+        """Mark data as changed, discarding its cached JSON"""
+        if self._root is not None:
+            self._root._json.pop(id(self._data), None)
+
+    def _attrs(self):
+        """Yield (name, value) of instance attributes, slotted or not"""
+        for cls in reversed(type(self).__mro__):
+            slots = cls.__dict__.get('__slots__', ())
+            for name in ((slots,) if isinstance(slots, str) else slots):
+                if name not in ('__dict__', '__weakref__') and hasattr(self, name):
+                    yield name, getattr(self, name)
+        yield from getattr(self, '__dict__', {}).items()
+
 
 class Entity(Base):
+    __slots__ = ()
+
     def __str__(self):
         return '\n'.join('{0}: {1}'.format(k.capitalize(), v)
-                         for k, v in vars(self).items())
+                         for k, v in self._attrs())
 
 
 class RootEntity(Entity):
+    """
+    Root of an entity tree, holding the to_json() cache of its entities.
+
+    Cache is opt-in, for callers that make all changes through entities and
+    touch(): other code MUST ignore it, encoding data instead, and call
+    clear_json() when done, as cached JSON may no longer match data.
+    """
     @classmethod
     def from_data(cls, data):
         return cls(data)
 
+    def __init__(self, data):
+        super().__init__(data)
+        self._json = {}  # {id(data): (data, JSON)}, see to_json()
+
+    def clear_json(self) -> None:
+        """Discard the cached JSON of all entities, see to_json()"""
+        self._json.clear()
+
 
 class EntityList(Base, collections.abc.MutableSequence):
     """Base class for containers. Subclasses SHOULD override EntityClass"""
@@ -45,46 +94,157 @@ class EntityList(Base, collections.abc.MutableSequence):
 
     def __init__(self, data: list, root=None):
         super().__init__(data, root)
-        self._list = [self.EntityClass(d, root)
-                      if issubclass(self.EntityClass, Base)
-                      else self.EntityClass(d)
-                      for d in self._data]
+        # Entities are created on first access, see _entity()
+        self._list = [None] * len(self._data)
+        self._indexes = {}  # {attr: {value: [entities]}}, see _index()
 
-    def get(self, ID: int, default):
-        for e in self._list:
-            if getattr(e, 'ID', None) == ID:
-                return e
-        return default
+    def get(self, ID: int, default=None):
+        """Return the (first) entity with `ID`, or `default`. See find()"""
+        entities = self._index('ID').get(ID)
+        return entities[0] if entities else default
+
+    def find(self, attr: str, value) -> list:
+        """
+        Return the entities whose `attr` attribute equals `value`, in order.
+
+        Lookups use an index of `attr`, built on first use and kept up to date
+        when entities are added, replaced or removed. Values must be hashable.
+        Indexes do not track changes to the attributes of contained entities,
+        call reindex() after such changes.
+        """
+        return list(self._index(attr).get(value, ()))
+
+    def reindex(self, attr: str = None) -> None:
+        """Discard the index of `attr`, or all, to be rebuilt on next lookup"""
+        if attr is None:
+            self._indexes.clear()
+        else:
+            self._indexes.pop(attr, None)
+
+    def _index(self, attr: str) -> dict:
+        index = self._indexes.get(attr)
+        if index is None:
+            index = self._indexes[attr] = {}
+            for e in self:
+                index.setdefault(getattr(e, attr, None), []).append(e)
+        return index
+
+    def _index_add(self, obj, append: bool) -> None:
+        """Add `obj` to indexes, discarding those where its order is unknown"""
+        for attr, index in list(self._indexes.items()):
+            entities = index.setdefault(getattr(obj, attr, None), [])
+            if entities and not append:
+                del self._indexes[attr]
+            else:
+                entities.append(obj)
+
+    def _index_remove(self, obj) -> None:
+        for attr, index in self._indexes.items():
+            key = getattr(obj, attr, None)
+            entities = [_ for _ in index.get(key, ()) if _ is not obj]
+            if entities:
+                index[key] = entities
+            else:
+                index.pop(key, None)
+
+    def _entity(self, idx: int):
+        """Return the entity at `idx`, creating it from its data if needed"""
+        e = self._list[idx]
+        if e is None:
+            data = self._data[idx]
+            e = self._list[idx] = (self.EntityClass(data, self._root)
+                                   if issubclass(self.EntityClass, Base)
+                                   else self.EntityClass(data))
+        return e
 
     def __str__(self):
-        return str(self._list)
+        return str(list(self))
 
     def __repr__(self):
-        return repr(self._list)
+        return repr(list(self))
 
     # MutableSequence boilerplate
 
+    def __iter__(self):
+        for idx in range(len(self._list)):
+            yield self._entity(idx)
+
+    def copy(self, idx: slice = slice(None)) -> 'EntityList':
+        """
+        Return a new container with the entities in `idx` slice, or all.
+
+        Its data list is a shallow copy, with the same item data, and its
+        entities are new. See EntityListView for a copy-free alternative.
+        """
+        return self.__class__(self._data[idx], self._root)
+
     def __getitem__(self, idx: int or slice):
         if isinstance(idx, int):
-            return self._list[idx]
+            return self._entity(idx)
         elif isinstance(idx, slice):
-            return  self.__class__(iter(self._data[idx]), self._root)
-            #return self.__class__((__.to_data() for __ in self._list[idx]), root=self._root)
-        raise TypeError("%s indices must be integers or slices, not %s".
-                        format(self.__class__.__name__, type(idx)))
+            return self._view_class()(self, idx)
+        raise TypeError("%s indices must be integers or slices, not %s" %
+                        (self.__class__.__name__, type(idx).__name__))
+
+    @classmethod
+    def _view_class(cls) -> type:
+        """
+        Return the view class of this container class, created on first use.
+        It is a subclass of both, so views are also instances of the container
+        class and have its methods, see EntityListView.
+        """
+        view = cls.__dict__.get('_View')
+        if view is None:
+            view = type(cls.__name__ + 'View', (EntityListView, cls), {})
+            cls._View = view
+        return view
+
+    def to_json(self) -> savefile.RawJSON:
+        """
+        Return data encoded as compact game JSON, joining the cached JSON of
+        each item data, so only changed entities are encoded again. Entities
+        are not created. Cache of items no longer in the container is kept
+        until RootEntity.clear_json()
+        """
+        if not issubclass(self.EntityClass, Base):
+            return _to_json(self._data)
+        return savefile.RawJSON('[' + ','.join(_to_json(_, self._root)
+                                               for _ in self._data) + ']')
+
+    def touch(self, idx: int = None) -> None:
+        """
+        Mark the data of the item at `idx`, or all, as changed, discarding
+        its cached JSON, without creating entities. See Base.to_json()
+        """
+        for i in (range(len(self._list)) if idx is None else (idx,)):
+            e = self._list[i]
+            if e is not None:
+                e.touch()
+            elif self._root is not None:
+                self._root._json.pop(id(self._data[i]), None)
 
     def __setitem__(self, idx: int or slice, obj: Entity or 'EntityList'):
         if not isinstance(idx, (int, slice)):
-            raise TypeError("%s indices must be integers or slices, not %s".
-                            format(self.__class__.__name__, type(idx)))
-        assert isinstance(obj, (self.EntityClass, self.__class__))
+            raise TypeError("%s indices must be integers or slices, not %s" %
+                            (self.__class__.__name__, type(idx).__name__))
+        assert isinstance(obj, (self.EntityClass, self.__class__,
+                                EntityListView))
+        if isinstance(idx, slice):
+            self.reindex()
+        elif self._indexes:
+            self._index_remove(self._entity(idx))
+            self._index_add(obj, append=False)
         self._list[idx] = obj
         self._data[idx] = self._item_data(obj)
 
     def __delitem__(self, idx: int or slice):
         if not isinstance(idx, (int, slice)):
-            raise TypeError("%s indices must be integers or slices, not %s".
-                            format(self.__class__.__name__, type(idx)))
+            raise TypeError("%s indices must be integers or slices, not %s" %
+                            (self.__class__.__name__, type(idx).__name__))
+        if isinstance(idx, slice):
+            self.reindex()
+        elif self._indexes:
+            self._index_remove(self._entity(idx))
         del self._list[idx]
         del self._data[idx]
 
@@ -94,5 +254,121 @@ class EntityList(Base, collections.abc.MutableSequence):
 
     def insert(self, idx: int, obj: Entity):
         assert isinstance(obj, self.EntityClass)
+        self._index_add(obj, append=idx >= len(self._list))
         self._list.insert(idx, obj)
         self._data.insert(idx, self._item_data(obj))
+
+
+
+class EntityListView(collections.abc.MutableSequence):
+    """
+    Slice of an EntityList, sharing its entities and data with no copying.
+
+    Items are the parent's items at the positions selected by `idx` slice when
+    the view was created, so assigning to an item also replaces it on the
+    parent and its data. Views have a fixed size: items can not be inserted or
+    deleted, and the parent should not be resized while the view is in use.
+    Use copy() for an independent container.
+
+    Views of a container are also instances of its class, see
+    EntityList._view_class(), so methods of container subclasses work on the
+    viewed items, as long as they only use the container methods overridden
+    here, delegating to the parent.
+    """
+    def __init__(self, parent: EntityList, idx: slice):
+        self._parent = parent
+        self._root = parent._root
+        self._range = range(len(parent))[idx]
+
+    def copy(self) -> EntityList:
+        """Return a new container with the viewed entities, see EntityList.copy()"""
+        parent = self._parent
+        return parent.__class__([parent._data[_] for _ in self._range],
+                                parent._root)
+
+    def to_data(self) -> list:
+        return [self._parent._data[_] for _ in self._range]
+
+    def to_json(self) -> savefile.RawJSON:
+        parent = self._parent
+        if not issubclass(parent.EntityClass, Base):
+            return _to_json(self.to_data())
+        return savefile.RawJSON('[' + ','.join(_to_json(parent._data[_],
+                                                        parent._root)
+                                               for _ in self._range) + ']')
+
+    def touch(self, idx: int = None) -> None:
+        """Mark viewed item at `idx`, or all, as changed, see EntityList.touch()"""
+        for pos in (self._range if idx is None else (self._range[idx],)):
+            self._parent.touch(pos)
+
+    def reindex(self, attr: str = None) -> None:
+        """Discard the parent index of `attr`, or all, see EntityList.reindex()"""
+        self._parent.reindex(attr)
+
+    def get(self, ID: int, default=None):
+        for e in self:
+            if getattr(e, 'ID', None) == ID:
+                return e
+        return default
+
+    def find(self, attr: str, value) -> list:
+        return [e for e in self if getattr(e, attr, None) == value]
+
+    def __str__(self):
+        return str(list(self))
+
+    def __repr__(self):
+        return repr(list(self))
+
+    def __iter__(self):
+        for idx in self._range:
+            yield self._parent._entity(idx)
+
+    def __getitem__(self, idx: int or slice):
+        if isinstance(idx, int):
+            return self._parent._entity(self._range[idx])
+        elif isinstance(idx, slice):
+            view = self.__class__(self._parent, slice(0))
+            view._range = self._range[idx]
+            return view
+        raise TypeError("%s indices must be integers or slices, not %s" %
+                        (self.__class__.__name__, type(idx).__name__))
+
+    def __setitem__(self, idx: int or slice, obj: Entity):
+        if isinstance(idx, slice):
+            objs = list(obj)
+            positions = self._range[idx]
+            if len(objs) != len(positions):
+                raise ValueError("Can not resize a %s" % self.__class__.__name__)
+            for pos, item in zip(positions, objs):
+                self._parent[pos] = item
+            return
+        self._parent[self._range[idx]] = obj
+
+    def __delitem__(self, idx: int or slice):
+        raise TypeError("Can not resize a %s, use copy()" %
+                        self.__class__.__name__)
+
+    def __len__(self):
+        return len(self._range)
+
+    def insert(self, idx: int, obj: Entity):
+        raise TypeError("Can not resize a %s, use copy()" %
+                        self.__class__.__name__)
+
+
+
+
+def _to_json(data, root: RootEntity = None) -> savefile.RawJSON:
+    """Return `data` as compact game JSON, using `root` cache, if any"""
+    if root is not None:
+        cached = root._json.get(id(data))
+        # Data is kept in cache, so its id() is not reused while there
+        if cached is not None and cached[0] is data:
+            return cached[1]
+    json = savefile.RawJSON(savefile.get_codec().encode(
+        data, separators=(',', ':')))
+    if root is not None:
+        root._json[id(data)] = (data, json)
+    return json
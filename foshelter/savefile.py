@@ -20,18 +20,40 @@ Examples:
     python3 savefile.py    < Vault1.sav  > Vault1.json  # Decrypt by default
     python3 savefile.py -e < Vault1.json > Vault1.sav
 
+In raw mode data is streamed in fixed-size chunks, keeping memory usage flat
+regardless of save size, at the cost of no JSON (re-)formatting. On encryption
+input must then be the compact, game-formatted JSON for identical save data:
+    python3 savefile.py -r    < Vault1.sav  > Vault1.json
+    python3 savefile.py -r -e < Vault1.json > Vault1.sav
+
+Batch mode converts many files, globs or directories in parallel processes,
+writing each VaultX.sav to VaultX.json, or vice-versa, in the same directory
+as the source or in an output directory:
+    python3 savefile.py -j 4 -o json/ archive/*.sav backups/
+
 Constants taken from disassembled game source code:
 https://androidrepublic.org/threads/6181
 """
 
 
+import os
 import sys
+import mmap
+import time
 import base64
+import binascii
 import json
+import json.scanner
 import collections
+import re
+import itertools
+import logging
+import concurrent.futures
 
 import Crypto.Cipher.AES as AES  # PyPI: pip install pycryptodome
 
+from . import instrument
+
 
 # IV is used as both PBKDF2 key salt and AES IV.
 # Its value was very likely chosen copying from an old StackOverflow answer:
@@ -46,48 +68,697 @@ KEY = b'A7CA9F3366D892C2F0BEF417341CA971B69AE9F7BACCCFFCF43C62D1D7D021F9'
 
 CIPHER = (base64.b16decode(KEY), AES.MODE_CBC, IV)
 
+# Read size for streaming functions. Any size works, but a multiple of both
+# AES block size (16) and base64 quantum (4 chars for 3 bytes) avoids re-slicing
+CHUNK_SIZE = 2**16  # 64KiB
+
+# Decrypted save data cache, used by decrypt(). See cache.enable()
+CACHE = None
+
+# Non-base64 bytes, discarded on decoding just like base64.b64decode() does
+_B64_JUNK = bytes(set(range(256)) - set(
+    b'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/='))
+
+
+class RawJSON(str):
+    """
+    Serialized JSON value, as kept by partial decoding for non-selected sections
+
+    It is emitted unchanged by encode(), so data round-trips bitwise identical
+    without ever being deserialized. See decode() and its `sections` argument.
+    """
+    __slots__ = ()
+
+
+def _floatstr(o: float) -> str:
+    """Game float format, always with 2 decimal places"""
+    return '{0:.02f}'.format(o)
+
+
+def _strenc(s: str) -> str:
+    """ASCII JSON string encoder that emits RawJSON verbatim"""
+    if s.__class__ is RawJSON:
+        return s
+    return json.encoder.encode_basestring_ascii(s)
+
 
 class _FSJSONEnc(json.JSONEncoder):
     """Stripped-down JSONEncoder to format floats with trailing zeroes"""
     def iterencode(self, o, _one_shot=False):
-        def floatstr(o):
-            return '{0:.02f}'.format(o)
-
         _iterencode = json.encoder._make_iterencode(
-            None, self.default, json.encoder.encode_basestring_ascii,
-            self.indent, floatstr, self.key_separator, self.item_separator,
+            None, self.default, _strenc,
+            self.indent, _floatstr, self.key_separator, self.item_separator,
             self.sort_keys, self.skipkeys, _one_shot)
 
         return _iterencode(o, 0)
 
 
-def decrypt(savedata: bytes) -> collections.OrderedDict:
-    """Decrypt a Fallout Shelter save game data to a Dictionary."""
+class PyCodec:
+    """
+    Pure-Python JSON codec, the reference for game formatting.
 
-    # Decode and decrypt the save data
-    data = AES.new(*CIPHER).decrypt(base64.b64decode(savedata))  # also accepts ASCII str
+    Codecs encode and decode save game JSON, and are selected by set_codec().
+    encode() takes json.dumps() formatting arguments, decode() must preserve
+    key order. Both must be bitwise compatible with this one, see check_codec()
+    """
+    name = 'python'
 
-    # Remove tailing padding, if any
-    # PKCS#7 padding is N bytes of value N, unpadded data is data[:-data[-1]]
-    if data[-1] != b'}':
-        data = data.rstrip(data[-1:])
+    def encode(self, obj, **kwargs) -> str:
+        return json.dumps(obj, cls=_FSJSONEnc, **kwargs)
+
+    def decode(self, data: str):
+        return json.loads(data, object_pairs_hook=collections.OrderedDict)
+
+
+class CCodec(PyCodec):
+    """
+    Codec using the json C accelerator, decoding to plain (ordered) dicts.
+
+    Decoding is about 2.5x faster than PyCodec, but encoding only about 2x, as
+    most of its time is not spent in C. The C encoder always formats floats
+    using repr(), with no hook to change it, so its output is then fixed in a
+    regex pass: runs of strings, ints and other non-float tokens are skipped
+    whole, and floats re-formatted, which is lossless as repr() round-trips.
+    That pass takes about 60% of the encoding time, and a Python callback runs
+    for each string, to handle RawJSON. RawJSON values, already game formatted,
+    are left out of the regex pass and spliced back verbatim, as the reference
+    encoder does, so cached JSON adds no encoding cost. Indented output is not
+    supported by the C encoder, and falls back to PyCodec.
+    """
+    name = 'c'
+
+    _floats = re.compile(r'((?:[^"\d-]+|"[^"\\]*(?:\\.[^"\\]*)*"|-?\d+(?![\d.eE]))*)'
+                         r'(-?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?)?')
+
+    def __init__(self):
+        self._c_make_encoder = json.encoder.c_make_encoder
+        if not self._c_make_encoder:
+            raise ImportError("json C accelerator module is not available")
+
+    @staticmethod
+    def _fixfloat(m):
+        if m.group(2) is None:
+            return m.group(1)
+        return m.group(1) + _floatstr(float(m.group(2)))
+
+    def encode(self, obj, **kwargs) -> str:
+        if kwargs.get('indent') is not None:
+            return super().encode(obj, **kwargs)
+        item_separator, key_separator = kwargs.get('separators', (', ', ': '))
+        raw = []
+
+        # NUL is always escaped by the ASCII encoder, so it is a safe placeholder
+        def strenc(s):
+            if s.__class__ is RawJSON:
+                raw.append(s)
+                return '\0'
+            return json.encoder.encode_basestring_ascii(s)
+
+        encoder = self._c_make_encoder(
+            None, json.JSONEncoder().default, strenc, None,
+            key_separator, item_separator, kwargs.get('sort_keys', False),
+            False, True)
+        data = self._floats.sub(self._fixfloat, ''.join(encoder(obj, 0)))
+        if not raw:
+            return data
+        parts = data.split('\0')
+        return ''.join(itertools.chain.from_iterable(zip(parts, raw))) + parts[-1]
+
+    def decode(self, data: str):
+        return json.loads(data)
+
+
+class OrjsonCodec(CCodec):
+    """
+    Codec using orjson for decoding, about 6x faster than PyCodec. Encoding is
+    CCodec's, as orjson output is not ASCII-safe
+    """
+    name = 'orjson'
+
+    def __init__(self):
+        super().__init__()
+        import orjson  # PyPI: pip install orjson
+        self._loads = orjson.loads
+
+    def decode(self, data: str):
+        return self._loads(data)
+
+
+# Codec classes by preference, first one available and passing check is used
+CODECS = (OrjsonCodec, CCodec, PyCodec)
+
+# Game-formatted JSON with tricky values, used by check_codec()
+_CHECKDATA = ('{"f":[0.00,1.50,-3.25,1234567.89,100000000000000000000.00,'
+              '-0.00,0.01],"i":[0,-1,12345678901234567890],"s":["a\\"b\\\\c",'
+              '"\\u00e9\\u4e2d\\ud83d\\ude00","\\n\\t\\u007f","12.5","-1e5"],'
+              '"e":{},"l":[],"c":[true,false,null],"n":{"z":{"y":[{"x":1.10}]}}}')
+
+_codec = None
+
+log = logging.getLogger(__name__)
+
+
+def check_codec(codec, data: str = _CHECKDATA) -> bool:
+    """
+    Round-trip self-check for a codec against game-formatted JSON `data`.
+
+    Return True if decoding and re-encoding `data` is bitwise identical, and
+    if encoding the reference PyCodec decoding of it yields the same as well.
+    """
+    compact = dict(separators=(',', ':'))
+    try:
+        return (codec.encode(codec.decode(data), **compact) == data and
+                codec.encode(PyCodec().decode(data), **compact) == data)
+    except Exception as e:
+        log.debug("%s codec check failed: %s", codec.name, e)
+        return False
+
+
+def check_roundtrip(savedata: bytes) -> bool:
+    """Return True if save data re-encrypts bitwise identical, using codec"""
+    return encrypt(decrypt(savedata)) == bytes(savedata).strip()
+
+
+def set_codec(name: str = None):
+    """
+    Select the JSON codec used by encode() and decode(), by its name.
+
+    If `name` is blank, select the first available codec from CODECS that
+    passes check_codec(). Return the selected codec.
+    """
+    global _codec
+    for cls in CODECS:
+        if name and cls.name != name:
+            continue
+        try:
+            codec = cls()
+        except ImportError:
+            if name:
+                raise
+            continue
+        if not (name or check_codec(codec)):
+            continue
+        _codec = codec
+        log.debug("Using %s JSON codec", codec.name)
+        return codec
+    raise ValueError("Invalid JSON codec: %r" % name)
+
+
+def get_codec():
+    """Return the current JSON codec, selecting the best one if not set"""
+    return _codec or set_codec()
+
+
+
+
+class PyCryptodomeCrypto:
+    """
+    AES-CBC using pycryptodome, the reference crypto backend.
+
+    Crypto backends are selected by set_crypto(). new() returns a stateful
+    cipher for streaming, with encrypt() and decrypt() methods raising
+    ValueError on data not aligned to AES blocks. encrypt_into() and
+    decrypt_into() work in place on a writable buffer, and must release the
+    GIL, so segments of the same buffer can be decrypted by parallel threads.
+    """
+    name = 'pycryptodome'
+
+    def __init__(self):
+        self._key, self._mode = CIPHER[:2]
+
+    def new(self, iv: bytes = IV):
+        return AES.new(self._key, self._mode, iv)
+
+    def encrypt_into(self, data, iv: bytes = IV) -> None:
+        self.new(iv).encrypt(data, output=data)
+
+    def decrypt_into(self, data, iv: bytes = IV) -> None:
+        self.new(iv).decrypt(data, output=data)
+
+
+class OpenSSLCrypto(PyCryptodomeCrypto):
+    """Backend using OpenSSL, via the cryptography package"""
+    name = 'openssl'
+
+    class _Cipher:
+        """Stateful cipher with the same interface as pycryptodome's"""
+        def __init__(self, cipher):
+            self._cipher = cipher
+            self._ctx = None
+
+        def _update(self, data, ctx):
+            if len(data) % 16:
+                raise ValueError("Data must be aligned to block boundary")
+            if self._ctx is None:
+                self._ctx = ctx()
+            return self._ctx.update(data)
+
+        def encrypt(self, data) -> bytes:
+            return self._update(data, self._cipher.encryptor)
+
+        def decrypt(self, data) -> bytes:
+            return self._update(data, self._cipher.decryptor)
+
+    def __init__(self):
+        super().__init__()
+        # PyPI: pip install cryptography
+        from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+        self._algorithm = algorithms.AES(self._key)
+        self._mode = modes.CBC
+        self._new = Cipher
+
+    def new(self, iv: bytes = IV):
+        return self._Cipher(self._new(self._algorithm, self._mode(iv)))
+
+    def encrypt_into(self, data, iv: bytes = IV) -> None:
+        data[:] = self.new(iv).encrypt(data)
+
+    def decrypt_into(self, data, iv: bytes = IV) -> None:
+        data[:] = self.new(iv).decrypt(data)
+
+
+# Crypto backend classes. If not set by name, the fastest one passing check is used
+CRYPTOS = (OpenSSLCrypto, PyCryptodomeCrypto)
+
+# Known-answer test for check_crypto()
+_CHECKCRYPTO = (b'Fallout Shelter save data check!' * 2, base64.b64decode(
+    b'mZOnDhz7n9y2+G6wTg3E3piWP2t2Pj9aP0s7R5Gjci2YgzNPq5jhHdOSEmJT'
+    b'gpITTgCjwMeQ9/jjsSpZ2eLwWg=='))
+
+# Threads used by decrypt_data(), 0 for CPU count, and their minimum share
+THREADS = 0
+THREAD_MIN_SIZE = 2**20  # 1MiB
+
+_crypto = None
+
+
+def check_crypto(crypto) -> bool:
+    """Return True if a crypto backend passes a known-answer test"""
+    plain, cipher = _CHECKCRYPTO
+    try:
+        data = bytearray(plain)
+        crypto.encrypt_into(data)
+        if data != cipher:
+            return False
+        crypto.decrypt_into(data)
+        return (data == plain and
+                crypto.new().decrypt(cipher[:16]) + crypto.new(cipher[:16]
+                ).decrypt(cipher[16:]) == plain)
+    except Exception as e:
+        log.debug("%s crypto check failed: %s", crypto.name, e)
+        return False
+
+
+def bench_crypto(crypto, size: int = 2**20, repeat: int = 3) -> float:
+    """Return best time in seconds to decrypt `size` bytes, in place"""
+    data = bytearray(size)
+    best = float('inf')
+    for __ in range(repeat):
+        start = time.perf_counter()
+        crypto.decrypt_into(data)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def set_crypto(name: str = None):
+    """
+    Select the crypto backend used for AES, by its name.
+
+    If `name` is blank, run a quick benchmark of all available backends from
+    CRYPTOS that pass check_crypto() and select the fastest one. Return the
+    selected backend.
+    """
+    global _crypto
+    candidates = []
+    for cls in CRYPTOS:
+        if name and cls.name != name:
+            continue
+        try:
+            crypto = cls()
+        except ImportError:
+            if name:
+                raise
+            continue
+        if name:
+            candidates.append((0, crypto))
+        elif check_crypto(crypto):
+            candidates.append((bench_crypto(crypto), crypto))
+    if not candidates:
+        raise ValueError("Invalid crypto backend: %r" % name)
+    _crypto = min(candidates, key=lambda _: _[0])[1]
+    log.debug("Using %s crypto backend", _crypto.name)
+    return _crypto
+
+
+def get_crypto():
+    """Return the current crypto backend, selecting the best one if not set"""
+    return _crypto or set_crypto()
+
+
+def _decrypt_into(data: bytearray, threads: int = None) -> None:
+    """
+    Decrypt `data` in place, splitting it in segments among worker threads.
+
+    Unlike encryption, CBC decryption of a block only needs the previous
+    ciphertext block, so each segment is decrypted independently, using the
+    last block of the segment before it as IV. As those blocks are overwritten
+    in place, all IVs are copied upfront. Segments are at least
+    THREAD_MIN_SIZE, so small data is decrypted in the current thread.
+    """
+    crypto = get_crypto()
+    size = len(data)
+    if threads is None:
+        threads = THREADS or os.cpu_count() or 1
+    threads = min(threads, size // THREAD_MIN_SIZE)
+    if threads <= 1 or size % 16:
+        crypto.decrypt_into(data)
+        return
+
+    step = -(-size // threads // 16) * 16
+    view = memoryview(data)
+    segments = [view[_:_ + step] for _ in range(0, size, step)]
+    try:
+        ivs = [IV] + [bytes(view[_ - 16:_]) for _ in range(step, size, step)]
+        with concurrent.futures.ThreadPoolExecutor(len(segments)) as executor:
+            for __ in executor.map(crypto.decrypt_into, segments, ivs):
+                pass
+    finally:
+        for segment in segments:
+            segment.release()
+        view.release()
+
+
+def _unpad(data: bytes) -> bytes:
+    """
+    Remove PKCS#7 padding, if any: N bytes of value N, N in [1, 16]
+    A bytearray is unpadded in place, with no copy.
+    """
+    pad = data[-1] if data else 0
+    if 0 < pad <= 16 and data[-pad:] == pad * bytes((pad,)):
+        if isinstance(data, bytearray):
+            del data[-pad:]
+            return data
+        return data[:-pad]
+    return data
 
-    # Deserialize JSON string to Python dict object
-    return decode(data.decode('ascii'))
+
+def _pad(data: bytes) -> bytes:
+    """Add PKCS#7 padding to a full 16-byte AES block"""
+    pad = 16 - len(data) % 16
+    return data + pad * bytes((pad,))
+
+
+def _read_chunks(fd, size: int = CHUNK_SIZE):
+    """Iterate on a binary file object, yielding chunks of up to `size` bytes"""
+    return iter(lambda: fd.read(size), b'')
+
+
+def decrypt(savedata: bytes, sections=None) -> collections.OrderedDict:
+    """
+    Decrypt a Fallout Shelter save game data to a Dictionary.
+
+    See decode() for `sections`, used for partial loading. If CACHE is enabled,
+    data is looked up there first, and fully decoded data is stored in it.
+    """
+    with instrument.stage('savefile.decrypt', len(savedata)):
+        cache = CACHE
+        if cache is not None:
+            key = cache.key(savedata)
+            obj = cache.get(key)
+            if obj is not None:
+                return obj
+
+        # Deserialize JSON bytes to Python dict object
+        obj = decode(decrypt_data(savedata), sections)
+
+        if cache is not None and sections is None:
+            cache.put(key, obj)
+
+        return obj
 
 
 def encrypt(obj: dict) -> bytes:
     """Encrypt a Dictionary to Fallout Shelter save game data."""
 
-    # Serialize to a one-line JSON byte string
-    data = encode(obj).encode('ascii')
+    with instrument.stage('savefile.encrypt') as record:
+        # Serialize to a one-line JSON byte string, in a buffer for _encrypt()
+        data = _encrypt(bytearray(encode(obj), 'ascii'))
+        if record:
+            record.bytes = len(data)
+        return data
+
+
+def load(path: str, sections=None) -> collections.OrderedDict:
+    """
+    Load and decrypt a Fallout Shelter save game file to a Dictionary.
+
+    File is memory-mapped and decrypted with decrypt(), so save data is never
+    copied as a whole. See decrypt() for `sections` and caching.
+    """
+    with open(path, 'rb') as fd:
+        with mmap.mmap(fd.fileno(), 0, access=mmap.ACCESS_READ) as savedata:
+            return decrypt(savedata, sections)
+
+
+def decrypt_data(savedata: bytes) -> bytearray:
+    """
+    Decrypt save game data to (unpadded) JSON bytes, with no decoding.
+
+    `savedata` can be any bytes-like object, such as an mmap or a memoryview.
+    It is decoded in chunks to a preallocated buffer, then decrypted and
+    unpadded in place, so the returned buffer is the only full-size copy.
+    """
+    if isinstance(savedata, str):
+        savedata = savedata.encode('ascii')
+
+    # Decode and decrypt the save data
+    with instrument.stage('savefile.b64decode', len(savedata)):
+        data = _b64decode(savedata)
+    with instrument.stage('savefile.aes_decrypt', len(data)):
+        _decrypt_into(data)
+
+    # Remove tailing padding, if any
+    return _unpad(data)
+
+
+def _b64decode(savedata, chunk_size: int = CHUNK_SIZE) -> bytearray:
+    """
+    Decode base64 in chunks into a preallocated buffer.
+
+    Fall back to decoding at once if data has non-base64 characters other
+    than trailing whitespace, such as line breaks, as its decoded size is then
+    unknown beforehand, and chunks may not end at 4-character boundaries.
+    Only C functions get views of `savedata`, so none are left in tracebacks,
+    which would prevent an mmap from being closed.
+    """
+    view = memoryview(savedata)
+    try:
+        end = len(view)
+        while end and view[end-1] in b' \t\r\n':
+            end -= 1
+
+        padding = (end > 0 and view[end-1] == 61) + (end > 1 and view[end-2] == 61)  # '='
+        size = 3 * (end // 4) - padding
+
+        if end % 4 == 0:
+            data = bytearray(size)
+            pos = 0
+            try:
+                for start in range(0, end, chunk_size):
+                    chunk = binascii.a2b_base64(view[start:min(start+chunk_size,
+                                                               end)])
+                    data[pos:pos+len(chunk)] = chunk
+                    pos += len(chunk)
+                    if pos > size:
+                        break
+            except binascii.Error:
+                pos = -1  # misaligned by non-base64 characters
+            if pos == size:
+                return data
+
+        return bytearray(binascii.a2b_base64(view[:end]))
+    finally:
+        view.release()
+
+
+def encrypt_data(data: bytes) -> bytes:
+    """Encrypt JSON bytes to save game data, with no encoding."""
+    return _encrypt(bytearray(data))
+
+
+def _encrypt(data: bytearray) -> bytes:
+    """Pad and encrypt `data` in place, then encode to save game data."""
 
     # Add PKCS#7 padding
     pad = 16 - len(data) % 16
-    data += pad * bytes((pad,))
+    data.extend(pad * bytes((pad,)))
 
     # Encrypt and encode
-    return base64.b64encode(AES.new(*CIPHER).encrypt(data))
+    with instrument.stage('savefile.aes_encrypt', len(data)):
+        get_crypto().encrypt_into(data)
+    with instrument.stage('savefile.b64encode', len(data)):
+        return base64.b64encode(data)
+
+
+def reencrypt(data: bytes, olddata: bytes, oldsavedata: bytes) -> bytes:
+    """
+    Encrypt JSON bytes reusing the save data of a previous version of it.
+
+    In AES-CBC each ciphertext block depends only on its plaintext block and
+    the previous ciphertext block, so blocks before the first one that differs
+    between `data` and `olddata` are the same as in `oldsavedata`. Only the
+    remaining blocks are encrypted, chained from the last unchanged one, and
+    the unchanged base64 prefix is also reused. Output is bitwise identical to
+    encrypt_data(data), and its cost scales with the changed suffix size.
+
+    `oldsavedata` must be the encryption of `olddata`, such as the pair loaded
+    by Game.from_save(). If its base64 is not canonical, such as with line
+    breaks, fall back to a full encryption.
+    """
+    with instrument.stage('savefile.reencrypt', len(data)):
+        return _reencrypt(data, olddata, oldsavedata)
+
+
+def _reencrypt(data: bytes, olddata: bytes, oldsavedata: bytes) -> bytes:
+    if isinstance(oldsavedata, str):
+        oldsavedata = oldsavedata.encode('ascii')
+    oldsavedata = oldsavedata.strip()
+
+    # Canonical base64 length of the padded ciphertext
+    if len(oldsavedata) != 4 * -(-(len(olddata) // 16 + 1) * 16 // 3):
+        return encrypt_data(data)
+
+    offset = _common_prefix(data, olddata) // 16 * 16  # reused ciphertext
+    quanta = offset // 3  # base64 quanta fully within reused ciphertext
+    if not offset:
+        return encrypt_data(data)
+
+    # Decode from the start of the quantum holding the chaining block
+    start = (offset - 16) // 3
+    window = base64.b64decode(oldsavedata[4 * start:4 * -(-offset // 3)])
+    window = window[:offset - 3 * start]
+
+    cipher = get_crypto().new(window[-16:])
+    return (oldsavedata[:4 * quanta] +
+            base64.b64encode(window[3 * (quanta - start):] +
+                             cipher.encrypt(_pad(data[offset:]))))
+
+
+def _common_prefix(a: bytes, b: bytes, chunk_size: int = CHUNK_SIZE) -> int:
+    """Return the length of the common prefix of `a` and `b`"""
+    size = min(len(a), len(b))
+    start = 0
+    while start < size:
+        end = min(start + chunk_size, size)
+        if a[start:end] != b[start:end]:
+            break
+        start = end
+    else:
+        return size
+
+    # Bisect the first differing chunk, comparing slices with memcmp speed
+    lo, hi = start, end
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if a[start:mid+1] == b[start:mid+1]:
+            lo = mid + 1
+        else:
+            hi = mid
+    return lo
+
+
+def decrypt_iter(chunks):
+    """
+    Decode and decrypt an iterable of save game data chunks.
+
+    Yield decrypted JSON bytes chunks, with padding removed. Chunks can have any
+    size, buffering is limited to re-aligning them to base64 and AES boundaries
+    and holding back the last block until its padding can be removed.
+    """
+    cipher = get_crypto().new()
+    b64buf = b''  # base64 chars not yet decoded, less than a 4-char quantum
+    ctbuf  = b''  # ciphertext not yet decrypted, less than a 16-byte block
+    last   = b''  # last decrypted block, held back for unpadding
+
+    for chunk in chunks:
+        b64buf += chunk.translate(None, _B64_JUNK)
+        cut = len(b64buf) - len(b64buf) % 4
+        ctbuf += base64.b64decode(b64buf[:cut])
+        b64buf = b64buf[cut:]
+
+        cut = len(ctbuf) - len(ctbuf) % 16
+        if not cut:
+            continue
+        data = cipher.decrypt(ctbuf[:cut])
+        ctbuf = ctbuf[cut:]
+
+        if last:
+            yield last
+        yield data[:-16]
+        last = data[-16:]
+
+    # Leftovers are truncated data, let base64 and AES raise ValueError
+    if b64buf:
+        base64.b64decode(b64buf)
+    if ctbuf or not last:
+        cipher.decrypt(ctbuf or b'?')
+
+    yield _unpad(last)
+
+
+def encrypt_iter(chunks):
+    """
+    Encrypt and encode an iterable of JSON bytes chunks.
+
+    Yield save game data (base64 ASCII bytes) chunks. Chunks are re-aligned to
+    AES and base64 boundaries, and PKCS#7 padding is added to the last block.
+    Output is bitwise identical to encrypting the joined chunks at once.
+    """
+    cipher = get_crypto().new()
+    buf = b''  # plaintext not yet encrypted, less than a 16-byte block
+    ct  = b''  # ciphertext not yet encoded, less than a 3-byte base64 quantum
+
+    for chunk in chunks:
+        buf += chunk
+        cut = len(buf) - len(buf) % 16
+        if not cut:
+            continue
+        ct += cipher.encrypt(buf[:cut])
+        buf = buf[cut:]
+
+        cut = len(ct) - len(ct) % 3
+        yield base64.b64encode(ct[:cut])
+        ct = ct[cut:]
+
+    yield base64.b64encode(ct + cipher.encrypt(_pad(buf)))
+
+
+def decrypt_stream(src, dst, chunk_size: int = CHUNK_SIZE) -> int:
+    """
+    Decrypt save game data from `src` binary file object to JSON in `dst`.
+
+    Data is read and written in chunks of about `chunk_size` bytes, so memory
+    usage does not depend on save size. JSON is written as-is, in the compact
+    game format. Return the number of bytes written.
+    """
+    size = 0
+    for chunk in decrypt_iter(_read_chunks(src, chunk_size)):
+        size += dst.write(chunk)
+    return size
+
+
+def encrypt_stream(src, dst, chunk_size: int = CHUNK_SIZE) -> int:
+    """
+    Encrypt JSON from `src` binary file object to save game data in `dst`.
+
+    Like decrypt_stream(), JSON is not parsed or re-formatted, so `src` should
+    be in the compact game format for bitwise identical save data.
+    Return the number of bytes written.
+    """
+    size = 0
+    for chunk in encrypt_iter(_read_chunks(src, chunk_size)):
+        size += dst.write(chunk)
+    return size
 
 
 def encode(obj: dict, pretty: bool = False, sort: bool = False) -> str:
@@ -95,23 +766,187 @@ def encode(obj: dict, pretty: bool = False, sort: bool = False) -> str:
     Encode (dump) game dictionary to serialized JSON with game formatting.
     By default use custom float encoder and adjusted separators to allow bitwise
     identical save game reconstruction after encryption
+
+    Values decoded as RawJSON are emitted verbatim, unless pretty printing or
+    sorting keys, when they are decoded again so output is the same as for
+    fully decoded data. See _decode_raw()
+    """
+    kwargs, newline = _encode_args(pretty, sort)
+    if pretty or sort:
+        obj = _decode_raw(obj)
+
+    with instrument.stage('savefile.encode') as record:
+        data = get_codec().encode(obj, **kwargs) + newline
+        if record:
+            record.bytes = len(data)
+        return data
+
+
+def encode_iter(obj: dict, pretty: bool = False, sort: bool = False,
+                chunk_size: int = CHUNK_SIZE):
+    """
+    Encode game dictionary to JSON like encode(), yielding ASCII bytes chunks.
+
+    Chunks are about `chunk_size` bytes, so the serialized JSON is never whole
+    in memory. Output is the same as encode(), but always from the pure-Python
+    encoder, as C ones can not stream.
+    """
+    kwargs, newline = _encode_args(pretty, sort)
+    if pretty or sort:
+        obj = _decode_raw(obj)
+    buf, size = [], 0
+    for s in _FSJSONEnc(**kwargs).iterencode(obj):
+        buf.append(s)
+        size += len(s)
+        if size >= chunk_size:
+            yield ''.join(buf).encode('ascii')
+            buf, size = [], 0
+    buf.append(newline)
+    yield ''.join(buf).encode('ascii')
+
+
+def dump(obj: dict, fp, decrypted: bool = False, pretty: bool = False,
+         sort: bool = False) -> int:
     """
+    Encode and encrypt game dictionary to `fp` binary file object, streaming.
+
+    If `decrypted`, write JSON only. Save data is written in chunks as it is
+    encoded and encrypted, see encode_iter() and encrypt_iter(), so memory
+    usage does not depend on save size. Return the number of bytes written.
+    """
+    chunks = encode_iter(obj, pretty, sort)
+    if not decrypted:
+        chunks = encrypt_iter(chunks)
+    with instrument.stage('savefile.dump') as record:
+        size = 0
+        for chunk in chunks:
+            size += fp.write(chunk)
+        if record:
+            record.bytes = size
+    return size
+
+
+def _encode_args(pretty: bool, sort: bool) -> tuple:
+    """Return json.dumps() arguments and trailing newline for encode()"""
     if pretty:
-        kwargs= dict(sort_keys=sort, indent=4)
-        newline = '\n'
-    else:
-        kwargs = dict(separators=(',',':'))
-        newline = ''
+        return dict(sort_keys=sort, indent=4), '\n'
+    return dict(separators=(',',':')), ''
 
-    return json.dumps(obj, cls=_FSJSONEnc, **kwargs) + newline
 
+def _decode_raw(obj):
+    """
+    Return `obj` with all RawJSON values decoded.
 
-def decode(data: str) -> collections.OrderedDict:
+    Partial decoding only leaves RawJSON as values of the objects along the
+    selected paths, so only dicts are searched, and only those holding RawJSON
+    somewhere are copied. Return `obj` itself if it has none.
+    """
+    if obj.__class__ is RawJSON:
+        return get_codec().decode(str(obj))  # some codecs reject subclasses
+    if not isinstance(obj, dict):
+        return obj
+    items = [(k, _decode_raw(v)) for k, v in obj.items()]
+    if all(v is obj[k] for k, v in items):
+        return obj
+    return obj.__class__(items)
+
+
+def decode(data: str, sections=None) -> collections.OrderedDict:
     """
     Decode (load) decrypted JSON Fallout Shelter save game data to dictionary.
     Preserve key order to allow bitwise identical save reconstruction.
+
+    If `sections` is not None, decode only the given subtrees, an iterable of
+    dotted key paths such as ('dwellers.dwellers', 'vault.LunchBoxesByType').
+    Objects along each path are decoded only as needed to reach it, and all
+    other values are kept as RawJSON strings, copied through unchanged by
+    encode() unless pretty printing or sorting keys. An empty `sections` keeps
+    all top-level values raw.
     """
-    return  json.loads(data, object_pairs_hook=collections.OrderedDict)
+    with instrument.stage('savefile.decode', len(data)):
+        if sections is None:
+            return get_codec().decode(data)
+        return _decode_sections(data, sections)
+
+
+def _decode_sections(data: str, sections) -> collections.OrderedDict:
+    if isinstance(data, (bytes, bytearray)):
+        data = data.decode('ascii')
+
+    # Selection tree: nested dicts of keys along paths, True for selected ones
+    tree = {}
+    for section in sections:
+        node = tree
+        *parents, leaf = section.split('.')
+        for key in parents:
+            node = node.setdefault(key, {})
+            if node is True:  # a parent path is already fully selected
+                break
+        else:
+            node[leaf] = True
+
+    obj, idx = _decode_partial(data, _skipws(data, 0), tree)
+    idx = _skipws(data, idx)
+    if idx != len(data):
+        raise json.JSONDecodeError("Extra data", data, idx)
+    return obj
+
+
+# Partial decoding parser. Walks objects along the selected paths key by key,
+# delegating keys, selected values and skipped values to the C scanner.
+# Skipped values are still scanned for validation and to find their end, but
+# the temporary objects are discarded and only their raw JSON text is kept.
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+_scan_full = json.scanner.make_scanner(
+    json.JSONDecoder(object_pairs_hook=collections.OrderedDict))
+_scan_skip = json.scanner.make_scanner(json.JSONDecoder())
+
+
+def _skipws(s: str, idx: int) -> int:
+    return _WHITESPACE.match(s, idx).end()
+
+
+def _scan(scanner, s: str, idx: int):
+    try:
+        return scanner(s, idx)
+    except StopIteration as e:
+        raise json.JSONDecodeError("Expecting value", s, e.value) from None
+
+
+def _decode_partial(s: str, idx: int, tree):
+    """Decode JSON value at s[idx] according to selection tree, return end"""
+    if tree is None:
+        end = _scan(_scan_skip, s, idx)[1]
+        return RawJSON(s[idx:end]), end
+
+    if tree is True or s[idx:idx+1] != '{':
+        return _scan(_scan_full, s, idx)
+
+    obj = collections.OrderedDict()
+    idx = _skipws(s, idx + 1)
+    if s[idx:idx+1] == '}':
+        return obj, idx + 1
+
+    while True:
+        if s[idx:idx+1] != '"':
+            raise json.JSONDecodeError("Expecting property name enclosed in"
+                                       " double quotes", s, idx)
+        key, idx = json.decoder.scanstring(s, idx + 1)
+
+        idx = _skipws(s, idx)
+        if s[idx:idx+1] != ':':
+            raise json.JSONDecodeError("Expecting ':' delimiter", s, idx)
+        idx = _skipws(s, idx + 1)
+
+        obj[key], idx = _decode_partial(s, idx, tree.get(key))
+
+        idx = _skipws(s, idx)
+        delim = s[idx:idx+1]
+        if delim == '}':
+            return obj, idx + 1
+        if delim != ',':
+            raise json.JSONDecodeError("Expecting ',' delimiter", s, idx)
+        idx = _skipws(s, idx + 1)
 
 
 def _main(argv=None):
@@ -124,15 +959,58 @@ def _main(argv=None):
                        help="Encrypt JSON to save data.")
     parser.add_argument("-s", "--sort-keys", action="store_true", dest="sort",
                         help="Sort JSON keys on decryption.")
+    parser.add_argument("-r", "--raw", action="store_true",
+                        help="Stream data as-is in chunks, without JSON"
+                             " formatting. Flat memory usage for large saves.")
+    parser.add_argument("-c", "--codec", choices=[_.name for _ in CODECS],
+                        help="JSON codec. [Default: best available]")
+    parser.add_argument("--crypto", choices=[_.name for _ in CRYPTOS],
+                        help="AES backend. [Default: fastest available]")
+    parser.add_argument("--check", action="store_true",
+                        help="Only check if save data re-encrypts bitwise"
+                             " identical. Exit status is 1 if not.")
+    parser.add_argument("-o", "--output", metavar="DIR",
+                        help="Batch mode output directory."
+                             " [Default: same as each source file]")
+    parser.add_argument("-j", "--jobs", type=int, default=0,
+                        help="Batch mode worker processes. [Default: CPU count]")
+    parser.add_argument("files", nargs="*", metavar="FILE",
+                        help="Batch mode files, globs or directories."
+                             " If none, read stdin and write to stdout.")
     args = parser.parse_args(argv)
 
-    data = sys.stdin.read()
+    set_codec(args.codec)
+    set_crypto(args.crypto)
+
+    if args.files:
+        from . import batch
+        util.setup_logging(args.loglevel)
+        results = batch.convert_files(args.files, args.decrypt, args.output,
+                                      args.jobs, pretty=True, sort=args.sort,
+                                      codec=args.codec, crypto=args.crypto)
+        return int(any(error for __, __, error in results))
+
+    src, dst = sys.stdin.buffer, sys.stdout.buffer
+
+    if args.check:
+        return int(not check_roundtrip(src.read()))
+
+    if args.raw:
+        if args.decrypt:
+            decrypt_stream(src, dst)
+        else:
+            encrypt_stream(src, dst)
+        dst.flush()
+        return
+
+    data = src.read()
     if args.decrypt:
-        out = encode(decrypt(data), pretty=True, sort=args.sort)
+        out = encode(decrypt(data), pretty=True, sort=args.sort).encode('ascii')
     else:
-        out = encrypt(decode(data)).decode('ascii')
+        out = encrypt(decode(data))
 
-    sys.stdout.write(out)
+    dst.write(out)
+    dst.flush()
 
 
 
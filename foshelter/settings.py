@@ -39,10 +39,26 @@ FACTORY = {
         'port'    : 0,   # 0 for default FTP port (21)
         'debug'   : False,
     },
+    'backup': {
+        'store'   : '',   # Blank for 'snapshots' in backup directory
+        'history' : '',   # Blank for default, see history.default_path()
+    },
+    'fleet': {
+        'connections': 2,    # Per device hostname
+        'timeout'    : 300,  # Seconds per device, 0 for no timeout
+        'jobs'       : 0,    # Devices at once, 0 for all
+    },
+    'cache': {
+        'enabled' : False,
+        'path'    : '',   # Blank for default, ~/.cache/foshelter
+        'maxsize' : 256,  # MiB
+    },
 }
 
 OPTIONS = {}
 
+BASENAME = 'config.ini'
+
 log = logging.getLogger(__name__)
 
 
@@ -58,6 +74,40 @@ def get_options() -> dict:
     options = OPTIONS
     options.update(FACTORY)
 
+    cp, config = _read_config()
+    if not config:
+        return options.copy()
+
+    # .keys() to avoid 'RuntimeError: dictionary changed size during iteration'
+    for section in options.keys():
+        if not cp.has_section(section):
+            log.warning("Section [%s] not found in %s", section, config)
+            continue
+        _read_section(cp, section, options[section], config)
+
+    return options.copy()
+
+
+def get_devices() -> dict:
+    """
+    Return FTP options of each device for fleet backup, by device name.
+
+    Devices are config sections named [ftp:NAME], with the same options as
+    [ftp], which are also the defaults for missing ones.
+    """
+    cp, config = _read_config()
+    devices = {}
+    for section in cp.sections():
+        prefix, sep, name = section.partition(':')
+        if prefix.strip() == 'ftp' and sep and name.strip():
+            options = dict(get_options()['ftp'])
+            devices[name.strip()] = _read_section(cp, section, options, config,
+                                                  missing=False)
+    return devices
+
+
+def _read_config() -> tuple:
+    """Return a (ConfigParser, path) tuple of the config file read, if any"""
     configdir = os.path.join(
         os.environ.get('APPDATA') or
         os.environ.get('XDG_CONFIG_HOME') or
@@ -65,9 +115,7 @@ def get_options() -> dict:
         __package__
     )
 
-    basename = 'config.ini'
-
-    paths = tuple(os.path.realpath(os.path.join(path, basename)) for path in
+    paths = tuple(os.path.realpath(os.path.join(path, BASENAME)) for path in
                   (os.path.join(os.path.dirname(__file__), '..'), configdir))
 
     cp = configparser.ConfigParser(inline_comment_prefixes='#')
@@ -75,41 +123,44 @@ def get_options() -> dict:
 
     if not config:
         log.warning("Use factory default settings, config not found in %s", paths)
-        return options.copy()
-    config = config[-1]  # for logging purposes we consider only the last file
+        return cp, None
+
+    return cp, config[-1]  # for logging purposes we consider only the last file
 
+
+def _read_section(cp, section: str, options: dict, config: str,
+                  missing: bool = True) -> dict:
+    """
+    Read `section` into `options`, typed as their current values, and return it
+    If `missing`, warn about options not in config file.
+    """
     def getlist(s, o):
         return map(str.strip, cp.get(s, o).split(','))
 
-    # .keys() to avoid 'RuntimeError: dictionary changed size during iteration'
-    for section in options.keys():
-        if not cp.has_section(section):
-            log.warning("Section [%s] not found in %s", section, config)
-            continue
+    for opt in options:
+        if   isinstance(options[opt], bool ): get = cp.getboolean
+        elif isinstance(options[opt], int  ): get = cp.getint
+        elif isinstance(options[opt], float): get = cp.getfloat
+        elif isinstance(options[opt], list ): get = getlist
+        else                                : get = cp.get
 
-        for opt in options[section]:
-            if   isinstance(options[section][opt], bool ): get = cp.getboolean
-            elif isinstance(options[section][opt], int  ): get = cp.getint
-            elif isinstance(options[section][opt], float): get = cp.getfloat
-            elif isinstance(options[section][opt], list ): get = getlist
-            else                                         : get = cp.get
-
-            try:
-                options[section][opt] = get(section, opt)
+        try:
+            options[opt] = get(section, opt)
 
-            except configparser.NoOptionError as e:
+        except configparser.NoOptionError as e:
+            if missing:
                 log.warning("%s in %s", e, config)
 
-            except configparser.InterpolationSyntaxError as e:
-                raise util.FSException(
-                    "Syntax error on %s, remember to use %%%% for literals! %s",
-                    basename, str(e).split(':', 2)[-1].strip()
-                )
+        except configparser.InterpolationSyntaxError as e:
+            raise util.FSException(
+                "Syntax error on %s, remember to use %%%% for literals! %s",
+                BASENAME, str(e).split(':', 2)[-1].strip()
+            )
 
-            except ValueError as e:
-                log.warning("%s in '%s' option of %s", e, opt, config)
+        except ValueError as e:
+            log.warning("%s in '%s' option of %s", e, opt, config)
 
-    return options.copy()
+    return options
 
 
 def savepath(**options) -> str:
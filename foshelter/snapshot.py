@@ -0,0 +1,332 @@
+# This file is part of Foshelter, see <https://github.com/MestreLion/foshelter>
+# Copyright (C) 2018 Rodrigo Silva (MestreLion) <linux@rodrigosilva.com>
+# License: GPLv3 or later, at your choice. See <http://www.gnu.org/licenses/gpl>
+
+"""
+    Deduplicating snapshot store for save game backups
+
+A store is a directory of content-addressed chunks and snapshot manifests:
+
+    objects/ab/abcdef...    zlib-compressed chunk, named by its SHA-256
+    snapshots/<ID>.json     manifest listing each file and its chunks
+
+Save files are stored as their decrypted JSON, which compresses far better than
+encrypted data. It is split at content-defined boundaries, so consecutive
+snapshots of a vault only store the chunks around what has changed. Restored
+saves are re-encrypted bitwise identical to the original file, which is checked
+on commit: other files, or saves that do not round-trip, are stored as-is.
+
+Chunks and manifests are written atomically and never modified, and chunks are
+flushed to disk before the manifest, so an aborted commit leaves at most some
+unreferenced chunks.
+"""
+
+import os
+import re
+import mmap
+import json
+import zlib
+import hashlib
+import datetime
+import logging
+import concurrent.futures
+
+from . import savefile
+from . import util as u
+
+
+# Bump on any change in manifest format
+VERSION = 1
+
+# Content-defined chunking: chunks end after a '},' (end of a JSON object in
+# a list or dict) whose preceding CHUNK_WINDOW bytes have a CRC multiple of
+# CHUNK_DIVISOR, which averages about 10KiB chunks on save data. Boundaries
+# depend only on nearby content, so they are not shifted by changes elsewhere.
+CHUNK_MIN = 2**11  # 2KiB
+CHUNK_MAX = 2**16  # 64KiB
+CHUNK_DIVISOR = 128
+CHUNK_WINDOW = 32
+
+_ANCHOR = re.compile(rb'\},')
+
+log = logging.getLogger(__name__)
+
+
+
+
+class SnapshotStore:
+    """Snapshot store at `path`, created if needed"""
+    def __init__(self, path: str, level: int = 6):
+        self.path = path
+        self.level = level  # zlib compression level
+        os.makedirs(os.path.join(path, 'objects'), exist_ok=True)
+        os.makedirs(os.path.join(path, 'snapshots'), exist_ok=True)
+
+
+    def commit(self, paths, jobs: int = 0, **meta) -> str:
+        """
+        Store files as a new snapshot, with optional `meta` data. Return its ID
+
+        Files are read in parallel by up to `jobs` threads, CPU count if 0.
+        File names are stored without their directory, so they must be unique.
+        """
+        paths = list(paths)
+        names = [os.path.basename(_) for _ in paths]
+        if len(set(names)) < len(names):
+            raise u.FSException("Duplicated file names in snapshot: %s", names)
+
+        written = []
+        with _executor(jobs) as executor:
+            files = list(executor.map(lambda _: self._ingest(_, written), paths))
+            # Chunks must be on disk before a manifest references them
+            list(executor.map(_fsync, written))
+        for path in sorted(set(os.path.dirname(_) for _ in written)) + (
+                [os.path.join(self.path, 'objects')] if written else []):
+            _fsync(path, directory=True)
+
+        now = datetime.datetime.now()
+        manifest = dict(version=VERSION, time=now.isoformat(timespec='seconds'),
+                        meta=meta, files=files)
+        data = json.dumps(manifest, indent=1).encode('utf-8')
+        snapid = base = now.strftime('%Y-%m-%d_%H%M%S')
+        count = 0
+        while True:
+            # Exclusive, as concurrent commits may pick the same ID
+            try:
+                with u.atomic_write(self._snapshot(snapid), exclusive=True) as fp:
+                    fp.write(data)
+                break
+            except FileExistsError:
+                count += 1
+                snapid = '{0}.{1}'.format(base, count)
+
+        log.info("Snapshot %s: %s", snapid, ', '.join(names))
+        return snapid
+
+
+    def snapshots(self) -> list:
+        """Return snapshot IDs, oldest first"""
+        path = os.path.join(self.path, 'snapshots')
+        return sorted(_[:-5] for _ in os.listdir(path) if _.endswith('.json'))
+
+
+    def manifest(self, snapid: str = None) -> dict:
+        """Return the manifest of a snapshot, the latest if `snapid` is blank"""
+        if not snapid:
+            snapshots = self.snapshots()
+            if not snapshots:
+                raise u.FSException("No snapshots in %s", self.path)
+            snapid = snapshots[-1]
+        try:
+            with open(self._snapshot(snapid), 'rb') as fd:
+                manifest = json.loads(fd.read().decode('utf-8'))
+        except FileNotFoundError:
+            raise u.FSException("Snapshot not found in %s: %s", self.path, snapid)
+        manifest['id'] = snapid
+        return manifest
+
+
+    def restore(self, snapid: str = None, target: str = None, names=None,
+                jobs: int = 0) -> list:
+        """
+        Restore files of a snapshot, the latest if blank, to `target` directory.
+
+        Restore only files in `names`, if any. Files are replaced atomically and
+        get their original modification time, and content is checked against
+        the original hash. Return the restored file paths.
+        """
+        files = [_ for _ in self.manifest(snapid)['files']
+                 if not names or _['name'] in names]
+        if names and len(files) < len(set(names)):
+            raise u.FSException("Files not found in snapshot: %s", ', '.join(
+                sorted(set(names) - set(_['name'] for _ in files))))
+
+        def restore(entry):
+            path = os.path.join(target or "", entry['name'])
+            data = self._rebuild(entry)
+            with u.atomic_write(path) as fp:
+                fp.write(data)
+            os.utime(path, ns=(entry['mtime'], entry['mtime']))
+            return path
+
+        with _executor(jobs) as executor:
+            return list(executor.map(restore, files))
+
+
+    def verify(self, snapids=None, full: bool = False, jobs: int = 0) -> list:
+        """
+        Check the integrity of snapshots in `snapids`, or all, in parallel.
+
+        Every chunk they reference is decompressed and its hash checked. If
+        `full`, every file is also rebuilt and checked against its original
+        hash. Return a list of error messages, empty if all is well.
+        """
+        manifests = [self.manifest(_) for _ in (snapids or self.snapshots())]
+        objects = set(h for m in manifests for f in m['files'] for h in f['chunks'])
+
+        def check_object(objid):
+            try:
+                self._load(objid)
+            except (OSError, u.FSException) as e:
+                return str(e)
+
+        def check_file(args):
+            snapid, entry = args
+            try:
+                self._rebuild(entry)
+            except (OSError, ValueError, u.FSException) as e:
+                return "Snapshot {0}, {1}: {2}".format(snapid, entry['name'], e)
+
+        with _executor(jobs) as executor:
+            errors = list(executor.map(check_object, sorted(objects)))
+            if full:
+                errors.extend(executor.map(check_file, (
+                    (m['id'], f) for m in manifests for f in m['files'])))
+
+        errors = [_ for _ in errors if _]
+        for error in errors:
+            log.error(error)
+        log.info("Verified %d snapshots, %d objects: %d errors",
+                 len(manifests), len(objects), len(errors))
+        return errors
+
+
+    def _ingest(self, path: str, written: list) -> dict:
+        """
+        Store a file's chunks, appending paths of new ones to `written`.
+        Return its manifest entry
+        """
+        with open(path, 'rb') as fd:
+            st = os.fstat(fd.fileno())
+            if not st.st_size:
+                data = b''
+            else:
+                data = mmap.mmap(fd.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                digest = hashlib.sha256(data).hexdigest()
+                content, fmt = _plaintext(data, digest), 'save'
+                if content is None:
+                    content, fmt = data, 'raw'
+                cuts = cutpoints(content)
+                chunks = [self._store(content[a:b], written)
+                          for a, b in zip([0] + cuts, cuts)]
+            finally:
+                if data:
+                    data.close()
+
+        return dict(name=os.path.basename(path), format=fmt, size=st.st_size,
+                    mtime=st.st_mtime_ns, sha256=digest, chunks=chunks)
+
+
+    def content(self, entry: dict) -> bytes:
+        """
+        Return the stored content of a file from its manifest entry: decrypted
+        JSON for 'save' format, original data otherwise. Chunks are checked,
+        but not the file hash, see verify()
+        """
+        return b''.join(self._load(_) for _ in entry['chunks'])
+
+
+    def _rebuild(self, entry: dict) -> bytes:
+        """Return the original content of a file from its manifest entry"""
+        data = self.content(entry)
+        if entry['format'] == 'save':
+            data = savefile.encrypt_data(data)
+        if hashlib.sha256(data).hexdigest() != entry['sha256']:
+            raise u.FSException("Rebuilt %s does not match original hash",
+                                entry['name'])
+        return data
+
+
+    def _store(self, chunk: bytes, written: list) -> str:
+        """
+        Store a chunk, unless already present, appending its path to `written`.
+        Return its ID. It is not flushed to disk, see commit()
+        """
+        objid = hashlib.sha256(chunk).hexdigest()
+        path = self._object(objid)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with u.atomic_write(path, sync=False) as fp:
+                fp.write(zlib.compress(chunk, self.level))
+            written.append(path)
+        return objid
+
+
+    def _load(self, objid: str) -> bytes:
+        with open(self._object(objid), 'rb') as fd:
+            data = fd.read()
+        try:
+            chunk = zlib.decompress(data)
+        except zlib.error as e:
+            raise u.FSException("Corrupted object %s: %s", objid, e)
+        if hashlib.sha256(chunk).hexdigest() != objid:
+            raise u.FSException("Corrupted object %s: hash mismatch", objid)
+        return chunk
+
+
+    def _object(self, objid: str) -> str:
+        return os.path.join(self.path, 'objects', objid[:2], objid)
+
+
+    def _snapshot(self, snapid: str) -> str:
+        return os.path.join(self.path, 'snapshots', snapid + '.json')
+
+
+    def __repr__(self):
+        return '<{0}({1!r})>'.format(self.__class__.__name__, self.path)
+
+
+
+
+def is_store(path: str) -> bool:
+    """Return True if `path` is an existing snapshot store directory"""
+    return (os.path.isdir(os.path.join(path, 'snapshots')) and
+            os.path.isdir(os.path.join(path, 'objects')))
+
+
+def cutpoints(data) -> list:
+    """Return the end offsets of content-defined chunks of `data`"""
+    cuts = []
+    last = 0
+    for m in _ANCHOR.finditer(data):
+        pos = m.end()
+        while pos - last > CHUNK_MAX:
+            last += CHUNK_MAX
+            cuts.append(last)
+        if (pos - last >= CHUNK_MIN and
+                not zlib.crc32(data[pos - CHUNK_WINDOW:pos]) % CHUNK_DIVISOR):
+            cuts.append(pos)
+            last = pos
+    while len(data) - last > CHUNK_MAX:
+        last += CHUNK_MAX
+        cuts.append(last)
+    if len(data) > last:
+        cuts.append(len(data))
+    return cuts
+
+
+def _plaintext(data, digest: str) -> bytes:
+    """Return decrypted save data, or None if not re-encrypted identical"""
+    try:
+        plaintext = savefile.decrypt_data(data)
+    except ValueError:
+        return None
+    if hashlib.sha256(savefile.encrypt_data(plaintext)).hexdigest() != digest:
+        return None
+    return plaintext
+
+
+def _fsync(path: str, directory: bool = False) -> None:
+    """Flush a file, or a directory entries, to disk"""
+    if directory and os.name != 'posix':
+        return  # Directories can not be opened on Windows
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _executor(jobs: int = 0):
+    return concurrent.futures.ThreadPoolExecutor(jobs or os.cpu_count() or 1)
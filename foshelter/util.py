@@ -9,10 +9,17 @@ Assorted helper and wrapper functions
 import os.path
 import logging
 import shutil
+import tempfile
+import contextlib
 import argparse
 import enum
 import re
 
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
 
 COPYRIGHT="""
 Copyright (C) 2018 Rodrigo Silva (MestreLion) <linux@rodrigosilva.com>
@@ -22,6 +29,9 @@ License: GPLv3 or later, at your choice. See <http://www.gnu.org/licenses/gpl>
 # https://stackoverflow.com/a/9283563/624066
 _sepcamel = re.compile(r'((?<=[a-z])[A-Z]|(?<!\A)[A-Z](?=[a-z]))')
 
+# Linux ioctl for reflink (copy-on-write) file cloning, from <linux/fs.h>
+_FICLONE = 0x40049409
+
 
 
 
@@ -36,6 +46,10 @@ class FSException(Exception):
         super().__init__(msg % args)
         self.errno = errno
 
+    def __reduce__(self):
+        # Pickle support, as the default would re-apply %-formatting
+        return self.__class__, ('%s', str(self)), {'errno': self.errno}
+
 
 class FSEnum(enum.Enum):
     """Enum with custom str(): MyNEWClass.FOO_BAR -> 'My NEW Class: Foo Bar'"""
@@ -59,29 +73,120 @@ def setup_logging(level:int=logging.DEBUG):
     logging.basicConfig(level=level, format='%(levelname)s: %(message)s')
 
 
-def savename(slot: int) -> str:
-    """Return a save game file name"""
-    return 'Vault{0}.sav'.format(slot)
+def savename(slot: int, bkp: bool = False) -> str:
+    """
+    Return a save game file name, or its game-made backup name if `bkp`,
+    such as 'Vault1.sav.bkp'
+    """
+    return 'Vault{0}.sav{1}'.format(slot, '.bkp' if bkp else '')
 
 
-def localpath(slot: int, path: str = None) -> str:
+def localpath(slot: int, path: str = None, bkp: bool = False) -> str:
     """
     Return the (local) full path for a save game file.
 
     If `path` is blank or a directory, join it with the default game save file
-    name determined by `slot`, such as 'Vault1.sav'. Else use it as full file
-    and path name. As such, a blank `path` effectively means current directory
+    name determined by `slot` and `bkp`, such as 'Vault1.sav'. Else use it as
+    full file and path name. As such, a blank `path` effectively means current
+    directory
     """
     if not path or os.path.isdir(path):
-        return os.path.join(path or "", savename(slot))
+        return os.path.join(path or "", savename(slot, bkp))
 
     return path
 
 
 def copy_file(source: str, target: str) -> str:
-    """Consistency wrapper for local file copy operations"""
-    #TODO: preserve timestamp (mtime) ONLY, not permissions/owner/group
-    return shutil.copy2(source, target)
+    """
+    Consistency wrapper for local file copy operations. Return target path
+
+    If `target` is a directory, copy to it using `source` file name. Copy
+    only content and timestamps, not permissions or owner. Content is copied
+    in-kernel if possible: as a copy-on-write reflink clone on filesystems that
+    support it, such as Btrfs and XFS, otherwise by copy_file_range().
+    """
+    if os.path.isdir(target):
+        target = os.path.join(target, os.path.basename(source))
+    with open(source, 'rb') as src, open(target, 'wb') as dst:
+        if not (_reflink(src, dst) or _copy_range(src, dst)):
+            shutil.copyfileobj(src, dst)
+    st = os.stat(source)
+    os.utime(target, ns=(st.st_atime_ns, st.st_mtime_ns))
+    return target
+
+
+@contextlib.contextmanager
+def atomic_write(path: str, sync: bool = True, exclusive: bool = False):
+    """
+    Context manager for a binary file object that atomically replaces `path`.
+
+    Data is written to a temporary file in the same directory, which is
+    renamed to `path` on success, after flushing it to disk if `sync`, or
+    removed on error. So `path` is either untouched or fully written. The
+    file keeps the permissions of `path`, or gets the default ones if new.
+    If `exclusive`, raise FileExistsError instead of replacing `path`.
+    """
+    try:
+        mode = os.stat(path).st_mode & 0o7777
+    except FileNotFoundError:
+        mode = 0o666 & ~_umask()
+    fd, tmppath = tempfile.mkstemp(dir=os.path.dirname(path) or '.',
+                                   prefix='.' + os.path.basename(path) + '.',
+                                   suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as fp:
+            yield fp
+            if sync:
+                fp.flush()
+                os.fsync(fp.fileno())
+        # mkstemp() creates files readable only by their owner
+        os.chmod(tmppath, mode)
+        if exclusive:
+            # Unlike rename, link fails if path exists
+            os.link(tmppath, path)
+            os.remove(tmppath)
+        else:
+            os.replace(tmppath, path)
+    except BaseException:
+        try:
+            os.remove(tmppath)
+        except FileNotFoundError:
+            pass
+        raise
+
+
+def _umask() -> int:
+    """Current process umask, which can only be read by setting it"""
+    umask = os.umask(0o022)
+    os.umask(umask)
+    return umask
+
+
+def _reflink(src, dst) -> bool:
+    """Clone `src` to `dst` file objects with the Linux FICLONE ioctl"""
+    if not fcntl:
+        return False
+    try:
+        fcntl.ioctl(dst.fileno(), _FICLONE, src.fileno())
+    except OSError:
+        return False
+    return True
+
+
+def _copy_range(src, dst) -> bool:
+    """Copy `src` to `dst` file objects with copy_file_range(), if possible"""
+    if not hasattr(os, 'copy_file_range'):
+        return False
+    try:
+        while os.copy_file_range(src.fileno(), dst.fileno(), 2**30):
+            pass
+    except OSError:
+        # Such as EXDEV on kernels before 5.3. Rewind for a regular copy
+        src.seek(0)
+        dst.seek(0)
+        dst.truncate()
+        return False
+    return True
 
 
 class ArgumentParser(argparse.ArgumentParser):
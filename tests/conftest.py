@@ -0,0 +1,117 @@
+# This file is part of Foshelter, see <https://github.com/MestreLion/foshelter>
+# Copyright (C) 2018 Rodrigo Silva (MestreLion) <linux@rodrigosilva.com>
+# License: GPLv3 or later, at your choice. See <http://www.gnu.org/licenses/gpl>
+
+"""
+    Shared test fixtures. Run tests with `python3 -m pytest` from the top dir
+"""
+
+import os
+import copy
+import threading
+import warnings
+
+import pytest
+
+import foshelter as fs
+from foshelter import savefile
+from foshelter import settings
+
+from benchmarks import vaultgen
+
+
+@pytest.fixture
+def vault():
+    """A small synthetic game dictionary"""
+    return vaultgen.vault(20, 5)
+
+
+@pytest.fixture
+def savepath(tmp_path, vault):
+    """Path of a save file of `vault`"""
+    path = tmp_path / 'Vault1.sav'
+    path.write_bytes(fs.encrypt(vault))
+    return str(path)
+
+
+@pytest.fixture(autouse=True)
+def no_cache():
+    """Keep tests off any save data cache enabled by config"""
+    fs.cache.disable()
+    yield
+    fs.cache.disable()
+
+
+@pytest.fixture(params=[_.name for _ in savefile.CODECS])
+def codec(request):
+    """Each available JSON codec, selected while the test runs"""
+    previous = savefile.get_codec()
+    try:
+        yield savefile.set_codec(request.param)
+    except ImportError as e:
+        pytest.skip(str(e))
+    finally:
+        savefile.set_codec(previous.name)
+
+
+@pytest.fixture(params=[_.name for _ in savefile.CRYPTOS])
+def crypto(request):
+    """Each available crypto backend, selected while the test runs"""
+    previous = savefile.get_crypto()
+    try:
+        yield savefile.set_crypto(request.param)
+    except ImportError as e:
+        pytest.skip(str(e))
+    finally:
+        savefile.set_crypto(previous.name)
+
+
+@pytest.fixture
+def umask():
+    """Process umask set to 022 while the test runs"""
+    previous = os.umask(0o022)
+    yield 0o022
+    os.umask(previous)
+
+
+@pytest.fixture
+def options(monkeypatch):
+    """Factory settings, ignoring any config file, changeable by the test"""
+    options = copy.deepcopy(settings.FACTORY)
+    monkeypatch.setattr(settings, 'OPTIONS', options)
+    return options
+
+
+@pytest.fixture
+def ftp_handler():
+    """FTP handler class of `ftpd`, override to customize the server"""
+    handlers = pytest.importorskip('pyftpdlib.handlers')
+    return type('Handler', (handlers.FTPHandler,), {})
+
+
+@pytest.fixture
+def ftpd(tmp_path, ftp_handler):
+    """Local FTP server of the `ftp` temporary directory. Yield ftp_options"""
+    from pyftpdlib.authorizers import DummyAuthorizer
+    from pyftpdlib.servers import FTPServer
+
+    root = tmp_path / 'ftp'
+    root.mkdir()
+    ftp_handler.authorizer = DummyAuthorizer()
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)  # anonymous write
+        ftp_handler.authorizer.add_anonymous(str(root), perm='elradfmwMT')
+    server = FTPServer(('127.0.0.1', 0), ftp_handler)
+    stop = threading.Event()
+
+    def serve():
+        while not stop.is_set():
+            server.serve_forever(timeout=0.05, blocking=False)
+        server.close_all()
+
+    thread = threading.Thread(target=serve, daemon=True)
+    thread.start()
+    yield dict(hostname='127.0.0.1', port=server.address[1], username='',
+               password='', savepath='/')
+    stop.set()
+    thread.join()
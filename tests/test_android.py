@@ -0,0 +1,179 @@
+# This file is part of Foshelter, see <https://github.com/MestreLion/foshelter>
+# Copyright (C) 2018 Rodrigo Silva (MestreLion) <linux@rodrigosilva.com>
+# License: GPLv3 or later, at your choice. See <http://www.gnu.org/licenses/gpl>
+
+import os
+import hashlib
+import types
+import posixpath
+
+import pytest
+
+import foshelter as fs
+from foshelter import android
+from foshelter import settings
+
+
+def test_ftp_options_keep_settings(options):
+    try:
+        session = android.ftp_session(hostname='device', port=2121)
+        assert session is android.ftp_session(hostname='device', port=2121)
+        assert session is not android.ftp_session(hostname='other')
+        assert android.FTPSession(hostname='device').options['port'] == 0
+        assert settings.get_options()['ftp'] == settings.FACTORY['ftp']
+    finally:
+        android.ftp_close()
+
+
+class FakeADBDevice:
+    """In-memory device for a fake adb package, see `fake_adb`"""
+    def __init__(self, fake):
+        self.fake = fake
+
+    def ConnectDevice(self, serial=None, rsa_keys=None):
+        self.fake.connections += 1
+
+    def Close(self):
+        pass
+
+    def _check(self):
+        if self.fake.drop:
+            self.fake.drop = False
+            raise self.fake.usb_exceptions.CommonUsbError("dropped")
+
+    def List(self, path):
+        self._check()
+        self.fake.lists += 1
+        return [types.SimpleNamespace(filename=posixpath.basename(k).encode(),
+                                      size=len(v), mtime=1, mode=0o100644)
+                for k, v in self.fake.files.items()]
+
+    def Pull(self, path):
+        self._check()
+        return self.fake.files[path]
+
+    def Push(self, fd, path, mtime=0):
+        self._check()
+        self.fake.files[path] = fd.read()[:self.fake.limit]
+
+    def Stat(self, path):
+        return 0o100644, len(self.fake.files[path]), 1
+
+
+@pytest.fixture
+def fake_adb(monkeypatch):
+    """Fake adb package, with a single in-memory device"""
+    fake = types.SimpleNamespace(files={}, connections=0, lists=0, drop=False,
+                                 limit=None)
+    fake.usb_exceptions = types.SimpleNamespace(
+        CommonUsbError=type('CommonUsbError', (Exception,), {}),
+        AdbCommandFailureException=type('AdbCommandFailure', (Exception,), {}))
+    fake.adb_commands = types.SimpleNamespace(
+        AdbCommands=lambda: FakeADBDevice(fake))
+    fake.sign_pycryptodome = types.SimpleNamespace(
+        PycryptodomeAuthSigner=lambda path: None)
+    monkeypatch.setattr(android, 'adb', fake)
+    yield fake
+    android.adb_close()
+
+
+def test_adb_session(fake_adb, tmp_path):
+    source = tmp_path / 'Vault1.sav'
+    source.write_bytes(b'data')
+    assert android.adb_push_all(str(source)) == [
+        posixpath.join(android.ADB_SAVEPATH, 'Vault1.sav')]
+    assert android.adb_facts() == {'Vault1.sav': dict(size=4, modify='1')}
+    assert android.adb_facts() is android.adb_facts()
+
+    fake_adb.drop = True
+    target = tmp_path / 'backup'
+    target.mkdir()
+    paths = android.adb_pull_all(str(target))
+    assert [os.path.basename(_) for _ in paths] == ['Vault1.sav']
+    assert (target / 'Vault1.sav').read_bytes() == b'data'
+    assert fake_adb.connections == 2
+    assert fake_adb.lists == 1
+
+    fake_adb.limit = 2
+    with pytest.raises(fs.FSException):
+        android.adb_write(2, b'data')
+    with pytest.raises(fs.FSException):
+        android.adb_push_all(str(tmp_path / 'other.sav'))
+
+
+@pytest.fixture
+def ftp_handler(ftp_handler):
+    """FTP handler that drops `drops` downloads, supporting `hashes` in FEAT"""
+    class DTPHandler(ftp_handler.dtp_handler):
+        ac_out_buffer_size = 2**13
+
+        def send(self, data):
+            sent = super().send(data)
+            if self.cmd_channel.drops and self.tot_bytes_sent > 2**18:
+                type(self.cmd_channel).drops -= 1
+                self.cmd_channel.close()
+            return sent
+
+    class Handler(ftp_handler):
+        drops = 0
+        hashes = ''
+        stored = 0
+        use_sendfile = False
+        dtp_handler = DTPHandler
+        proto_cmds = dict(ftp_handler.proto_cmds,
+                          HASH=dict(perm='r', auth=True, arg=True, help=''))
+
+        def ftp_FEAT(self, line):
+            features = ['MFMT', 'MLST type*;size*;modify*;', 'REST STREAM',
+                        'SIZE'] + (['HASH ' + self.hashes] if self.hashes else [])
+            self.push('211-Features:\r\n' + ''.join(' %s\r\n' % _ for _ in
+                                                    features) + '211 End\r\n')
+
+        def ftp_HASH(self, path):
+            with open(path, 'rb') as fd:
+                data = fd.read()
+            self.respond('213 SHA-256 0-%d %s %s' % (
+                len(data), hashlib.sha256(data).hexdigest(),
+                os.path.basename(path)))
+
+        def ftp_STOR(self, file, mode='w'):
+            type(self).stored += 1
+            return super().ftp_STOR(file, mode)
+
+    return Handler
+
+
+def test_ftp_resume(ftpd, ftp_handler, tmp_path, options):
+    data = os.urandom(2**20)
+    (tmp_path / 'ftp' / 'Vault1.sav').write_bytes(data)
+    ftp_handler.drops = 2
+    try:
+        path = android.ftp_get(1, str(tmp_path / 'local.sav'), **ftpd)
+    finally:
+        android.ftp_close()
+    assert ftp_handler.drops == 0
+    assert open(path, 'rb').read() == data
+
+
+@pytest.mark.parametrize('hashes', ['', 'SHA-1;SHA-256*'])
+def test_ftp_put_skips_identical(ftpd, ftp_handler, tmp_path, options, hashes):
+    ftp_handler.hashes = hashes
+    source = tmp_path / 'Vault2.sav'
+    source.write_bytes(b'data')
+    os.utime(source, (1e9, 1e9))
+    try:
+        for __ in range(2):
+            android.ftp_put(2, str(source), **ftpd)
+        assert ftp_handler.stored == 1
+
+        # Same size and time, so only a hash can tell it changed
+        source.write_bytes(b'DATA')
+        os.utime(source, (1e9, 1e9))
+        android.ftp_put(2, str(source), **ftpd)
+        assert ftp_handler.stored == (2 if hashes else 1)
+
+        android.ftp_put(2, str(source), force=True, **ftpd)
+        assert ftp_handler.stored == (3 if hashes else 2)
+    finally:
+        android.ftp_close()
+    assert (tmp_path / 'ftp' / 'Vault2.sav').read_bytes() == b'DATA'
@@ -0,0 +1,84 @@
+# This file is part of Foshelter, see <https://github.com/MestreLion/foshelter>
+# Copyright (C) 2018 Rodrigo Silva (MestreLion) <linux@rodrigosilva.com>
+# License: GPLv3 or later, at your choice. See <http://www.gnu.org/licenses/gpl>
+
+import os
+
+import pytest
+
+from foshelter import backup
+
+
+def test_manifest_save_error_keeps_original(tmp_path):
+    path = str(tmp_path / backup.MANIFEST)
+    manifest = backup.Manifest(path)
+    manifest.devices['dev'] = {'Vault1.sav': {}}
+    manifest.save()
+    manifest.devices['dev'] = {'Vault1.sav': {'bad': object()}}
+    with pytest.raises(TypeError):
+        manifest.save()
+    assert backup.Manifest(path).devices == {'dev': {'Vault1.sav': {}}}
+    assert os.listdir(str(tmp_path)) == [backup.MANIFEST]
+
+
+@pytest.fixture
+def device(tmp_path, options):
+    """Local save directory with some save files, as the configured device"""
+    path = tmp_path / 'device'
+    path.mkdir()
+    for name in ('Vault1.sav', 'Vault1.sav.bkp', 'Vault2.sav'):
+        (path / name).write_bytes(name.encode('ascii'))
+    options['main']['platform'] = 'wine'
+    options['wine']['savepath'] = str(path)
+    return path
+
+
+def test_backup_all_incremental(device, tmp_path):
+    target = tmp_path / 'backup'
+    target.mkdir()
+
+    def names(paths):
+        return sorted(os.path.basename(_) for _ in paths)
+
+    files, changed = backup.backup_all(str(target))
+    assert names(files) == names(changed) == ['Vault1.sav', 'Vault1.sav.bkp',
+                                              'Vault2.sav']
+    assert (target / 'Vault2.sav').read_bytes() == b'Vault2.sav'
+
+    files, changed = backup.backup_all(str(target))
+    assert len(files) == 3 and changed == []
+
+    # Changed on device, by its facts, and changed locally, by its hash
+    os.utime(device / 'Vault1.sav', ns=(0, 0))
+    (target / 'Vault2.sav').write_bytes(b'changed')
+    files, changed = backup.backup_all(str(target))
+    assert names(changed) == ['Vault1.sav', 'Vault2.sav']
+    assert (target / 'Vault2.sav').read_bytes() == b'Vault2.sav'
+
+    files, changed = backup.backup_all(str(target), incremental=False)
+    assert len(changed) == 3
+
+
+def test_manifest_unchanged(tmp_path):
+    path = tmp_path / 'Vault1.sav'
+    path.write_bytes(b'data')
+    facts = dict(size=4, modify='20180101000000')
+    manifest = backup.Manifest(str(tmp_path / backup.MANIFEST))
+    assert not manifest.unchanged('dev', 'Vault1.sav', facts, str(path))
+    manifest.update('dev', 'Vault1.sav', facts, str(path))
+    manifest.save()
+
+    manifest = backup.Manifest(manifest.path)
+    assert manifest.unchanged('dev', 'Vault1.sav', facts, str(path))
+    assert not manifest.unchanged('other', 'Vault1.sav', facts, str(path))
+    assert not manifest.unchanged('dev', 'Vault1.sav',
+                                  dict(facts, size=5), str(path))
+    assert not manifest.unchanged('dev', 'Vault1.sav', {}, str(path))
+    path.unlink()
+    assert not manifest.unchanged('dev', 'Vault1.sav', facts, str(path))
+
+
+def test_manifest_invalid(tmp_path):
+    path = tmp_path / backup.MANIFEST
+    path.write_bytes(b'not json')
+    assert backup.Manifest(str(path)).devices == {}
@@ -0,0 +1,41 @@
+# This file is part of Foshelter, see <https://github.com/MestreLion/foshelter>
+# Copyright (C) 2018 Rodrigo Silva (MestreLion) <linux@rodrigosilva.com>
+# License: GPLv3 or later, at your choice. See <http://www.gnu.org/licenses/gpl>
+
+import os
+
+import pytest
+
+import foshelter as fs
+from foshelter import batch
+
+from benchmarks import vaultgen
+
+
+@pytest.mark.parametrize('jobs', [1, 2])
+def test_convert_files_roundtrip(tmp_path, jobs):
+    saves = [vaultgen.write_save(str(tmp_path / 'Vault{0}.sav'.format(_)), 5,
+                                 seed=_) for _ in (1, 2, 3)]
+    (tmp_path / 'Vault4.sav').write_bytes(b'not a save')
+    json_dir, sav_dir = tmp_path / 'json', tmp_path / 'sav'
+    json_dir.mkdir()
+    sav_dir.mkdir()
+
+    results = fs.convert_files([str(tmp_path)], True, str(json_dir), jobs)
+    assert [os.path.basename(_[0]) for _ in results] == [
+        'Vault1.sav', 'Vault2.sav', 'Vault3.sav', 'Vault4.sav']
+    assert [_[2] is None for _ in results] == [True, True, True, False]
+
+    results = fs.convert_files([str(json_dir / '*.json')], False, str(sav_dir),
+                               jobs)
+    assert not any(_[2] for _ in results)
+    for path in saves:
+        with open(path, 'rb') as a, open(str(sav_dir / os.path.basename(path)),
+                                         'rb') as b:
+            assert a.read() == b.read()
+
+
+def test_imap_ordered_with_errors():
+    results = list(batch.imap(divmod, [(7, 2), (1, 0), (9, 3)], jobs=2))
+    assert [_[1] for _ in results] == [(3, 1), None, (3, 0)]
+    assert isinstance(results[1][2], ZeroDivisionError)
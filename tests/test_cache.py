@@ -0,0 +1,61 @@
+# This file is part of Foshelter, see <https://github.com/MestreLion/foshelter>
+# Copyright (C) 2018 Rodrigo Silva (MestreLion) <linux@rodrigosilva.com>
+# License: GPLv3 or later, at your choice. See <http://www.gnu.org/licenses/gpl>
+
+import os
+import pickle
+
+import pytest
+
+import foshelter as fs
+from foshelter import cache
+from foshelter import savefile
+
+
+def test_load_from_cache(tmp_path, savepath):
+    store = cache.enable(str(tmp_path / 'cache'))
+    first = fs.Game.from_save(savepath).to_data()
+    second = fs.Game.from_save(savepath).to_data()
+    assert first == second
+    assert store.stats == dict(hits=1, misses=1, stores=1, evictions=0)
+
+
+def test_key_depends_on_codec(codec):
+    key = cache.SaveCache.key(b'data')
+    savefile.set_codec('python')
+    assert (key == cache.SaveCache.key(b'data')) == (codec.name == 'python')
+
+
+def test_evict_lru(tmp_path):
+    store = cache.SaveCache(str(tmp_path), maxsize=2**20)
+    for i in range(3):
+        store.put(str(i), b'x' * 400 * 2**10)
+        os.utime(store._entry(str(i)), (i, i))
+    assert store.evictions == 1
+    assert store.get('0') is None
+    assert store.get('2') == b'x' * 400 * 2**10
+
+
+def test_evict_skips_removed_entries(tmp_path, monkeypatch):
+    store = cache.SaveCache(str(tmp_path), maxsize=2**20)
+    for i in range(3):
+        store.put(str(i), b'x' * 2**10)
+
+    scandir = os.scandir
+
+    def racing_scandir(path):
+        entries = list(scandir(path))
+        os.remove(store._entry('1'))  # removed by another process
+        return iter(entries)
+
+    monkeypatch.setattr(os, 'scandir', racing_scandir)
+    assert store.clear() == 2
+    assert not os.listdir(str(tmp_path))
+
+
+def test_put_error_keeps_no_temp_files(tmp_path):
+    store = cache.SaveCache(str(tmp_path / 'cache'))
+    with pytest.raises((AttributeError, TypeError, pickle.PicklingError)):
+        store.put('key', lambda: None)  # not picklable
+    assert not os.listdir(store.path)
+    assert os.stat(store.path).st_mode & 0o777 == 0o700
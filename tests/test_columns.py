@@ -0,0 +1,83 @@
+# This file is part of Foshelter, see <https://github.com/MestreLion/foshelter>
+# Copyright (C) 2018 Rodrigo Silva (MestreLion) <linux@rodrigosilva.com>
+# License: GPLv3 or later, at your choice. See <http://www.gnu.org/licenses/gpl>
+
+import pytest
+
+import foshelter as fs
+
+np = pytest.importorskip('numpy')
+
+
+@pytest.fixture
+def game(vault):
+    return fs.Game(vault)
+
+
+@pytest.fixture
+def cols(game):
+    return game.dwellers.to_columns()
+
+
+def test_columns_match_dwellers(game, cols):
+    assert len(cols) == len(game.dwellers)
+    assert cols['ID'].tolist() == [_.ID for _ in game.dwellers]
+    assert cols['level'].tolist() == [_.level for _ in game.dwellers]
+    assert cols['hp'].tolist() == [_.hp for _ in game.dwellers]
+    assert np.allclose(cols['erating'], [_.erating for _ in game.dwellers])
+    assert cols['luck'].tolist() == [
+        _.to_data()['stats']['stats'][-1]['value'] for _ in game.dwellers]
+
+
+def test_select_sort_top(game, cols):
+    high = cols[cols['level'] >= 30]
+    assert high.dwellers() == [_ for _ in game.dwellers if _.level >= 30]
+    levels = cols.sort('level')['level'].tolist()
+    assert levels == sorted(levels)
+    top = cols.top('hp', 3)
+    assert top['hp'].tolist() == sorted(cols['hp'].tolist(), reverse=True)[:3]
+    assert cols.top('hp', 100, reverse=True)['hp'].tolist() == sorted(
+        cols['hp'].tolist())
+
+
+def test_groupby_histogram(cols):
+    assert sum(cols.groupby('gender').values()) == len(cols)
+    maxima = cols.groupby('gender', 'level', 'max')
+    for gender, level in maxima.items():
+        assert level == cols['level'][cols['gender'] == gender].max()
+    counts, edges = cols.histogram('level', bins=5, range=(0, 50))
+    assert counts.sum() == len(cols) and len(edges) == 6
+    with pytest.raises(ValueError):
+        cols.groupby('gender', 'level', 'median')
+
+
+def test_write(game, cols):
+    dweller = game.dwellers[0]
+    game.dwellers.find('level', dweller.level)  # index to be updated
+    selected = cols[cols['ID'] == dweller.ID]
+    selected.write(level=50, luck=10)
+    assert dweller.level == 50 and type(dweller.level) is int
+    assert dweller in game.dwellers.find('level', 50)
+    assert dweller.to_data()['stats']['stats'][-1]['value'] == 10
+    assert selected['level'].tolist() == [50]
+    assert np.allclose(selected['erating'], [dweller.erating])
+    with pytest.raises(fs.FSException):
+        cols.write(ID=1)
+    with pytest.raises(fs.FSException):
+        cols.write(unknown=1)
+
+
+def test_write_reindexes_erating(game):
+    dweller = game.dwellers[0]
+    game.dwellers.find('erating', dweller.erating)
+    cols = game.dwellers.to_columns()
+    cols[:1].write(hp=dweller.hp + 5)
+    assert game.dwellers.find('erating', dweller.erating) == [dweller]
+
+
+def test_missing_stats(game):
+    del game.dwellers.to_data()[0]['stats']
+    game.dwellers.to_data()[1]['stats']['stats'][:] = []
+    cols = game.dwellers.to_columns()
+    assert cols['luck'][:2].tolist() == [0, 0]
+    assert cols['level'][0] == game.dwellers[0].level
@@ -0,0 +1,83 @@
+# This file is part of Foshelter, see <https://github.com/MestreLion/foshelter>
+# Copyright (C) 2018 Rodrigo Silva (MestreLion) <linux@rodrigosilva.com>
+# License: GPLv3 or later, at your choice. See <http://www.gnu.org/licenses/gpl>
+
+import os
+import asyncio
+import threading
+
+import pytest
+
+from foshelter import backup
+from foshelter import fleet
+from foshelter import settings
+
+
+def test_backup_fleet(options, ftpd, tmp_path, monkeypatch):
+    for device in ('phone', 'tablet'):
+        os.mkdir(str(tmp_path / 'ftp' / device))
+        for name in ('Vault1.sav', 'Vault2.sav.bkp'):
+            (tmp_path / 'ftp' / device / name).write_bytes(
+                (device + name).encode('ascii'))
+    devices = {_: dict(ftpd, savepath='/' + _) for _ in ('phone', 'tablet')}
+    target = tmp_path / 'backup'
+
+    # Manifest file I/O must not block the event loop
+    threads = []
+    for method in ('unchanged', 'update', 'save'):
+        def wrapper(*args, _method=getattr(backup.Manifest, method)):
+            threads.append(threading.current_thread())
+            return _method(*args)
+        monkeypatch.setattr(backup.Manifest, method, wrapper)
+
+    results = fleet.backup_fleet(str(target), devices)
+    assert [_.device for _ in results] == ['phone', 'tablet']
+    for result in results:
+        assert result.error is None
+        assert len(result.files) == len(result.changed) == 2
+        assert (target / result.device / 'Vault2.sav.bkp').read_bytes() == (
+            result.device + 'Vault2.sav.bkp').encode('ascii')
+
+    results = fleet.backup_fleet(str(target), devices)
+    assert [len(_.changed) for _ in results] == [0, 0]
+    assert threads and threading.main_thread() not in threads
+    assert settings.get_options()['ftp'] == settings.FACTORY['ftp']
+
+
+def test_backup_fleet_error(options, ftpd, tmp_path):
+    results = fleet.backup_fleet(str(tmp_path), {
+        'good': ftpd, 'bad': dict(ftpd, savepath='/missing')})
+    assert results[0].error is None
+    assert results[1].error is not None
+
+
+def test_backup_fleet_unexpected_error(options, ftpd, tmp_path, monkeypatch):
+    facts = fleet.AsyncFTP.facts
+
+    async def malformed(self):
+        if self.options['savepath'] == '/bad':
+            raise ValueError("malformed facts")
+        return await facts(self)
+
+    monkeypatch.setattr(fleet.AsyncFTP, 'facts', malformed)
+    (tmp_path / 'ftp' / 'bad').mkdir()
+    (tmp_path / 'ftp' / 'Vault1.sav').write_bytes(b'data')
+    results = fleet.backup_fleet(str(tmp_path / 'backup'), {
+        'bad': dict(ftpd, savepath='/bad'), 'good': ftpd})
+    assert isinstance(results[0].error, ValueError)
+    assert results[1].error is None and len(results[1].changed) == 1
+
+
+def test_backup_fleet_reads_settings_before_loop(options, ftpd, tmp_path,
+                                                 monkeypatch):
+    get_options = settings.get_options
+
+    def not_in_loop():
+        with pytest.raises(RuntimeError):
+            asyncio.get_running_loop()
+        return get_options()
+
+    monkeypatch.setattr(settings, 'get_options', not_in_loop)
+    results = fleet.backup_fleet(str(tmp_path), {'phone': dict(
+        hostname=ftpd['hostname'], port=ftpd['port'], savepath='/')})
+    assert results[0].error is None
@@ -0,0 +1,82 @@
+# This file is part of Foshelter, see <https://github.com/MestreLion/foshelter>
+# Copyright (C) 2018 Rodrigo Silva (MestreLion) <linux@rodrigosilva.com>
+# License: GPLv3 or later, at your choice. See <http://www.gnu.org/licenses/gpl>
+
+import os
+import stat
+
+import pytest
+
+import foshelter as fs
+
+
+@pytest.mark.parametrize('stream, decrypted', [(False, False), (True, False),
+                                               (False, True)])
+def test_save_keeps_mode(savepath, tmp_path, umask, stream, decrypted):
+    game = fs.Game.from_save(savepath)
+    os.chmod(savepath, 0o644)
+    game.to_save(savepath, decrypted, stream=stream)
+    assert stat.S_IMODE(os.stat(savepath).st_mode) == 0o644
+
+    path = str(tmp_path / 'new.sav')
+    game.to_save(path, decrypted, stream=stream)
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o666 & ~umask
+
+
+def _edit(game):
+    """Rename a dweller through a container copy, and one through its data"""
+    copy = game.dwellers.copy()
+    copy[0].name = 'Copied Dweller'
+    game.dwellers.to_data()[1]['name'] = 'Direct'
+    return copy
+
+
+@pytest.mark.parametrize('cached', [False, True])
+def test_save_after_edits(savepath, tmp_path, cached):
+    game = fs.Game.from_save(savepath)
+    path = str(tmp_path / 'out.sav')
+    game.to_save(path, cached=cached)
+    game.dwellers[2].name  # entities created before changes
+    _edit(game)
+    if cached:
+        game.dwellers.touch(1)
+    game.to_save(path, cached=cached)
+    assert open(path, 'rb').read() == fs.encrypt(game.to_data())
+    names = [_.name for _ in fs.Game.from_save(path).dwellers[:2]]
+    assert names == ['Copied Dweller', 'Direct ' + game.to_data()[
+        'dwellers']['dwellers'][1]['lastName']]
+
+
+def test_cached_save_tracks_container_changes(savepath, tmp_path):
+    game = fs.Game.from_save(savepath)
+    path = str(tmp_path / 'out.sav')
+    game.to_save(path, cached=True)
+    dweller = game.dwellers.pop(3)
+    game.dwellers.insert(0, dweller)
+    game.dwellers[5] = game.dwellers[6]
+    game.dwellers[-1].name = 'Last One'
+    game.to_save(path, cached=True)
+    assert open(path, 'rb').read() == fs.encrypt(game.to_data())
+    assert len(game._json) == len(set(map(id, game.dwellers.to_data())))
+
+
+def test_columns_write_cached_save(savepath, tmp_path):
+    pytest.importorskip('numpy')
+    game = fs.Game.from_save(savepath)
+    path = str(tmp_path / 'out.sav')
+    game.to_save(path, cached=True)
+    game.dwellers[0].name  # only some entities created
+    cols = game.dwellers.to_columns()
+    cols[cols['level'] > 10].write(luck=10)
+    game.to_save(path, cached=True)
+    assert open(path, 'rb').read() == fs.encrypt(game.to_data())
+
+
+def test_invalid_decrypted_save(tmp_path):
+    path = tmp_path / 'Vault1.json'
+    path.write_bytes(b'\xff\xfe not utf-8')
+    with pytest.raises(fs.FSException):
+        fs.Game.from_save(str(path), decrypted=True)
+    path.write_bytes(b'{"vault": ')
+    with pytest.raises(fs.FSException):
+        fs.Game.from_save(str(path), decrypted=True)
@@ -0,0 +1,115 @@
+# This file is part of Foshelter, see <https://github.com/MestreLion/foshelter>
+# Copyright (C) 2018 Rodrigo Silva (MestreLion) <linux@rodrigosilva.com>
+# License: GPLv3 or later, at your choice. See <http://www.gnu.org/licenses/gpl>
+
+import os
+import zipfile
+import importlib.util
+import importlib.machinery
+
+import pytest
+
+import foshelter as fs
+from foshelter import history
+
+from benchmarks import vaultgen
+
+
+@pytest.fixture
+def index(tmp_path):
+    with fs.HistoryIndex(str(tmp_path / 'history.sqlite')) as index:
+        yield index
+
+
+@pytest.fixture
+def saves(tmp_path):
+    """Paths of 3 saves of a vault, its dwellers levelling up in each one"""
+    vault = vaultgen.vault(10, 5)
+    paths = []
+    for i in range(3):
+        for data in vault['dwellers']['dwellers']:
+            data['experience']['currentLevel'] = 10 * (i + 1)
+        path = tmp_path / 'saves' / str(i) / 'Vault1.sav'
+        path.parent.mkdir(parents=True)
+        path.write_bytes(fs.encrypt(vault))
+        os.utime(path, (1e9 + i * 3600,) * 2)
+        paths.append(str(path))
+    return paths
+
+
+def test_ingest_sources(index, saves, tmp_path):
+    archive = str(tmp_path / 'old.zip')
+    with zipfile.ZipFile(archive, 'w') as zfd:
+        zfd.write(saves[0], 'Vault1.sav')
+        zfd.writestr('notes.txt', 'not a save')
+    store = fs.SnapshotStore(str(tmp_path / 'store'))
+    store.commit(saves[1:2])
+    store.commit(saves[2:])
+
+    assert index.ingest([archive, store.path]) == (3, 0, 0)
+    assert index.ingest([archive, store.path, saves[0]]) == (0, 3, 0)
+    assert index.ingest([str(tmp_path)]) == (0, 5, 0)
+
+    rows = index.query('SELECT time, level FROM snapshots JOIN dwellers'
+                       ' ON snapshot = id WHERE dweller = 1 AND level >= 20'
+                       ' ORDER BY time').fetchall()
+    assert [_[1] for _ in rows] == [20, 30]
+    assert index.query('SELECT count(*) FROM counters WHERE name = ?',
+                       ('LunchBoxesCount',)).fetchone()[0] == 3
+    with pytest.raises(fs.FSException):
+        index.query('SELECT nothing FROM nowhere')
+    with pytest.raises(fs.FSException):
+        index.query('DELETE FROM snapshots')
+    assert index.query('SELECT count(*) FROM snapshots').fetchone()[0] == 3
+
+
+def test_store_indexed_in_one_transaction(index, saves, tmp_path):
+    store = fs.SnapshotStore(str(tmp_path / 'store'))
+    for path in saves:
+        store.commit([path])
+    statements = []
+    index.db.set_trace_callback(statements.append)
+    assert index.ingest([store.path]) == (3, 0, 0)
+    assert statements.count('COMMIT') == 1
+
+
+def test_invalid_saves_failed(index, saves, tmp_path):
+    path = tmp_path / 'Vault2.sav'
+    path.write_bytes(b'not a save')
+    assert index.ingest([str(path)]) == (0, 0, 1)
+
+    vault = vaultgen.vault(2, 1)
+    del vault['dwellers']['dwellers'][0]['serializeId']
+    archive = str(tmp_path / 'old.zip')
+    with zipfile.ZipFile(archive, 'w') as zfd:
+        zfd.writestr('Vault3.sav', fs.encrypt(vault))
+        zfd.write(saves[0], 'Vault1.sav')
+    assert index.ingest([archive]) == (1, 0, 1)
+    with pytest.raises(fs.FSException):
+        list(history._sources(str(tmp_path / 'notes.txt')))
+
+
+@pytest.fixture
+def main(options, tmp_path, monkeypatch):
+    """The command line script as a module, run from an empty directory"""
+    pytest.importorskip('argh')
+    path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'main')
+    monkeypatch.chdir(tmp_path)
+    loader = importlib.machinery.SourceFileLoader('main', path)
+    module = importlib.util.module_from_spec(
+        importlib.util.spec_from_loader('main', loader))
+    loader.exec_module(module)
+    return module
+
+
+def test_index_history_default_store(main, saves, tmp_path):
+    db = str(tmp_path / 'history.sqlite')
+    with pytest.raises(fs.FSException):
+        main.index_history(db=db)
+    assert not os.path.exists('snapshots')
+
+    for path in saves:
+        main._store().commit([path])
+    main.index_history(db=db)
+    with fs.HistoryIndex(db) as index:
+        assert index.query('SELECT count(*) FROM snapshots').fetchone()[0] == 3
@@ -0,0 +1,44 @@
+# This file is part of Foshelter, see <https://github.com/MestreLion/foshelter>
+# Copyright (C) 2018 Rodrigo Silva (MestreLion) <linux@rodrigosilva.com>
+# License: GPLv3 or later, at your choice. See <http://www.gnu.org/licenses/gpl>
+
+import pytest
+
+import foshelter as fs
+from foshelter import instrument
+
+
+@pytest.fixture
+def stats():
+    instrument.STATS.clear()
+    yield instrument.enable()
+    instrument.disable()
+    instrument.STATS.clear()
+
+
+def test_disabled_is_noop():
+    with instrument.stage('test') as record:
+        assert record is None
+
+
+def test_load_save_stages(savepath, tmp_path, stats):
+    game = fs.Game.from_save(savepath)
+    game.to_save(str(tmp_path / 'out.sav'))
+    stages = stats.as_dict()
+    for name in ('game.from_save', 'game.read', 'savefile.decode',
+                 'game.to_save', 'savefile.encode'):
+        assert stages[name]['calls'] == 1
+    assert stages['game.read']['bytes'] == len(open(savepath, 'rb').read())
+
+
+def test_nested_peak(stats):
+    with instrument.stage('outer'):
+        with instrument.stage('inner') as record:
+            data = bytearray(2**20)
+            record.bytes = len(data)
+        del data
+    stages = stats.as_dict()
+    assert stages['inner']['bytes'] == 2**20
+    assert stages['inner']['peak'] >= 2**20
+    assert stages['outer']['peak'] >= stages['inner']['peak']
+    assert 'inner' in stats.report()
@@ -0,0 +1,154 @@
+# This file is part of Foshelter, see <https://github.com/MestreLion/foshelter>
+# Copyright (C) 2018 Rodrigo Silva (MestreLion) <linux@rodrigosilva.com>
+# License: GPLv3 or later, at your choice. See <http://www.gnu.org/licenses/gpl>
+
+import pytest
+
+import foshelter as fs
+from foshelter import orm
+
+
+@pytest.fixture
+def dwellers(vault):
+    return fs.Game(vault).dwellers
+
+
+def test_get_and_find(dwellers):
+    for dweller in dwellers:
+        assert dwellers.get(dweller.ID) is dweller
+        assert dweller in dwellers.find('level', dweller.level)
+    assert dwellers.get(-1) is None
+    assert dwellers.find('level', -1) == []
+    assert (dwellers.find('level', dwellers[0].level) ==
+            [_ for _ in dwellers if _.level == dwellers[0].level])
+
+
+def test_index_follows_container_changes(dwellers):
+    first, last = dwellers[0], dwellers[-1]
+    dwellers.get(0)
+    dwellers.find('level', 0)
+    del dwellers[0]
+    assert dwellers.get(first.ID) is None
+    dwellers.insert(0, first)
+    assert dwellers.get(first.ID) is first
+    dwellers[-1] = first
+    assert dwellers.get(last.ID) is None
+    assert dwellers.find('ID', first.ID) == [first, first]
+    dwellers.append(last)
+    assert dwellers.get(last.ID) is last
+    dwellers[:2] = dwellers.copy(slice(2))
+    assert dwellers.get(dwellers[0].ID) is dwellers[0]
+
+
+def test_reindex(dwellers):
+    dweller = dwellers[0]
+    level = dweller.level
+    dwellers.find('level', level)
+    dweller.to_data()['experience']['currentLevel'] = level + 100
+    assert dweller in dwellers.find('level', level)
+    dwellers.reindex('level')
+    assert dwellers.find('level', level + 100) == [dweller]
+
+
+def test_entities_created_on_access(dwellers):
+    assert len(dwellers) == 20
+    assert all(_ is None for _ in dwellers._list)
+    dweller = dwellers[3]
+    assert dwellers[3] is dweller
+    assert dweller.to_data() is dwellers.to_data()[3]
+    assert sum(_ is not None for _ in dwellers._list) == 1
+    assert list(dwellers)[3] is dweller
+    assert all(_ is not None for _ in dwellers._list)
+
+
+def test_lazy_insert_and_delete(dwellers):
+    data = dwellers.to_data()
+    new = fs.Dweller(dict(data[0]))
+    dwellers.insert(5, new)
+    del dwellers[0]
+    assert dwellers[4] is new
+    assert data[4] is new.to_data()
+    assert [_.to_data() for _ in dwellers] == data
+
+
+def test_view_shares_entities(dwellers):
+    view = dwellers[2:10:2]
+    assert isinstance(view, orm.EntityListView)
+    assert len(view) == 4
+    assert view[0] is dwellers[2]
+    assert view[-1] is dwellers[8]
+    assert list(view[1:3]) == [dwellers[4], dwellers[6]]
+    assert view.to_data() == dwellers.to_data()[2:10:2]
+    assert view.get(dwellers[4].ID) is dwellers[4]
+    assert view.get(dwellers[3].ID) is None
+    assert view.find('ID', dwellers[6].ID) == [dwellers[6]]
+
+
+def test_view_assignment_replaces_in_parent(dwellers):
+    view = dwellers[:4]
+    first, last = dwellers[0], dwellers[-1]
+    view[0] = last
+    assert dwellers[0] is last
+    assert dwellers.to_data()[0] is last.to_data()
+    view[1:3] = [first, first]
+    assert dwellers[1] is dwellers[2] is first
+    with pytest.raises(ValueError):
+        view[:2] = [first]
+    with pytest.raises(TypeError):
+        del view[0]
+    with pytest.raises(TypeError):
+        view.append(first)
+
+
+def test_view_copy_is_independent(dwellers):
+    copy = dwellers[:4].copy()
+    assert isinstance(copy, fs.Dwellers)
+    del copy[0]
+    assert len(copy) == 3
+    assert len(dwellers) == 20
+    assert copy.to_data()[0] is dwellers.to_data()[1]
+
+
+def test_entities_have_slots(dwellers):
+    dweller = dwellers[0]
+    assert not hasattr(dweller, '__dict__')
+    with pytest.raises(AttributeError):
+        dweller.extra = None
+    attrs = dict(dweller._attrs())
+    assert attrs['_data'] is dweller.to_data()
+    assert attrs['_erating'] is None
+    erating = dweller.erating
+    assert dict(dweller._attrs())['_erating'] == erating
+
+
+def test_invalid_index_type(dwellers):
+    for container in (dwellers, dwellers[:5]):
+        with pytest.raises(TypeError, match='slices, not str'):
+            container['a']
+
+
+def test_view_has_container_interface(dwellers, codec):
+    view = dwellers[5:10]
+    assert isinstance(view, fs.Dwellers)
+    assert type(dwellers[:2]) is type(view[1:])
+    assert view.to_json() == codec.encode(view.to_data(),
+                                          separators=(',', ':'))
+    view.reindex()
+    dwellers.to_json()
+    view.to_data()[0]['name'] = 'Touched'
+    view.touch(0)
+    assert '"Touched"' in dwellers.to_json()
+    lunchboxes = fs.Game(dwellers._root.to_data()).lunchboxes
+    with pytest.raises(TypeError):
+        del lunchboxes[:2][0]
+
+
+def test_view_columns(dwellers):
+    pytest.importorskip('numpy')
+    view = dwellers[5:10]
+    dwellers.find('level', 50)
+    cols = view.to_columns()
+    assert cols['ID'].tolist() == [_.ID for _ in view]
+    cols.write(level=50)
+    assert [_.level for _ in dwellers[5:10]] == [50] * 5
+    assert all(_ in dwellers.find('level', 50) for _ in view)
@@ -0,0 +1,137 @@
+# This file is part of Foshelter, see <https://github.com/MestreLion/foshelter>
+# Copyright (C) 2018 Rodrigo Silva (MestreLion) <linux@rodrigosilva.com>
+# License: GPLv3 or later, at your choice. See <http://www.gnu.org/licenses/gpl>
+
+import io
+import base64
+
+import pytest
+
+import foshelter as fs
+from foshelter import savefile
+
+
+@pytest.mark.parametrize('pretty, sort', [(True, False), (True, True),
+                                          (False, True)])
+def test_partial_encode_formatted_as_full(codec, vault, pretty, sort):
+    data = fs.encode(vault).encode('ascii')
+    for sections in ((), ('vault.LunchBoxesByType',)):
+        partial = savefile.decode(data, sections)
+        assert (savefile.encode(partial, pretty, sort) ==
+                savefile.encode(vault, pretty, sort))
+        assert (b''.join(savefile.encode_iter(partial, pretty, sort)) ==
+                savefile.encode(vault, pretty, sort).encode('ascii'))
+
+
+def test_partial_game_saves_formatted_as_full(savepath, tmp_path):
+    full, partial = (str(tmp_path / _) for _ in ('full.json', 'partial.json'))
+    fs.Game.from_save(savepath).to_save(full, True, True, True)
+    fs.Game.from_save(savepath, sections=()).to_save(partial, True, True, True)
+    assert open(full, 'rb').read() == open(partial, 'rb').read()
+
+
+def test_partial_roundtrip(savepath, tmp_path):
+    out = str(tmp_path / 'out.sav')
+    fs.Game.from_save(savepath, sections=()).to_save(out)
+    assert open(out, 'rb').read() == open(savepath, 'rb').read()
+
+
+@pytest.mark.parametrize('chunk_size', [1, 7, 4096])
+def test_stream_roundtrip(vault, chunk_size):
+    plaintext = fs.encode(vault).encode('ascii')
+    savedata = fs.encrypt(vault)
+
+    dst = io.BytesIO()
+    savefile.decrypt_stream(io.BytesIO(savedata), dst, chunk_size)
+    assert dst.getvalue() == plaintext
+
+    dst = io.BytesIO()
+    savefile.encrypt_stream(io.BytesIO(plaintext), dst, chunk_size)
+    assert dst.getvalue() == savedata
+
+
+def test_decrypt_iter_truncated(vault):
+    savedata = fs.encrypt(vault)
+    with pytest.raises(ValueError):
+        b''.join(savefile.decrypt_iter([savedata[:-5]]))
+
+
+def test_codec_check(codec):
+    assert savefile.check_codec(codec)
+
+
+def test_codec_matches_reference(codec, vault):
+    compact = dict(separators=(',', ':'))
+    data = savefile.PyCodec().encode(vault, **compact)
+    assert codec.encode(codec.decode(data), **compact) == data
+
+
+def test_codec_raw_json_verbatim(codec):
+    obj = {'a': savefile.RawJSON('[1.5,{"b":"x"}]'), 'c': 2.5,
+           'd': [savefile.RawJSON('"1.0"'), 'e\x00']}
+    assert (codec.encode(obj, separators=(',', ':')) ==
+            '{"a":[1.5,{"b":"x"}],"c":2.50,"d":["1.0","e\\u0000"]}')
+
+
+@pytest.mark.parametrize('offset', [0, 15, 16, 1000, -17, -1])
+def test_reencrypt_matches_full_encrypt(vault, offset):
+    olddata = fs.encode(vault).encode('ascii')
+    oldsavedata = savefile.encrypt_data(olddata)
+    offset %= len(olddata)
+    for data in (olddata[:offset] + b'X' + olddata[offset+1:],  # changed
+                 olddata[:offset] + b'XY' + olddata[offset:],   # grown
+                 olddata[:offset] + olddata[offset+1:],         # shrunk
+                 olddata):
+        assert (savefile.reencrypt(data, olddata, oldsavedata) ==
+                savefile.encrypt_data(data))
+
+
+def test_game_incremental_save(savepath, tmp_path):
+    out = str(tmp_path / 'out.sav')
+    game = fs.Game.from_save(savepath)
+    game.dwellers[-1].name = 'Changed Name'
+    game.to_save(out)
+    assert open(out, 'rb').read() == fs.encrypt(game.to_data())
+
+
+@pytest.mark.parametrize('linelength', [76, 64, 1000])
+def test_decrypt_line_broken_base64(vault, linelength):
+    savedata = fs.encrypt(vault)
+    assert len(savedata) > 4 * linelength
+    broken = b'\r\n'.join(savedata[i:i+linelength]
+                          for i in range(0, len(savedata), linelength))
+    plaintext = fs.encode(vault).encode('ascii')
+    for chunk_size in (savefile.CHUNK_SIZE, 1024, 4 * linelength):
+        assert savefile._b64decode(broken, chunk_size) == \
+            savefile._b64decode(savedata, chunk_size)
+    assert savefile.decrypt_data(broken) == plaintext
+    assert savefile.decrypt_data(broken + b'\n') == plaintext
+
+
+def test_decrypt_line_broken_base64_large():
+    from benchmarks import vaultgen
+    savedata = base64.encodebytes(base64.b64decode(vaultgen.savedata(300)))
+    assert len(savedata) > 2 * savefile.CHUNK_SIZE
+    assert savefile.decrypt_data(savedata) == savefile.decrypt_data(
+        savedata.replace(b'\n', b''))
+
+
+def test_check_crypto(crypto):
+    assert savefile.check_crypto(crypto)
+
+
+def test_crypto_roundtrip(crypto, vault):
+    savedata = fs.encrypt(vault)
+    assert fs.decrypt(savedata) == vault
+    assert savefile.encrypt(savefile.decrypt(savedata)) == savedata
+
+
+@pytest.mark.parametrize('threads', [2, 3, 8])
+def test_threaded_decrypt(crypto, monkeypatch, threads):
+    data = bytes(range(256)) * 1000
+    expected = bytearray(data)
+    crypto.decrypt_into(expected)
+    monkeypatch.setattr(savefile, 'THREAD_MIN_SIZE', 4096)
+    result = bytearray(data)
+    savefile._decrypt_into(result, threads)
+    assert result == expected
@@ -0,0 +1,81 @@
+# This file is part of Foshelter, see <https://github.com/MestreLion/foshelter>
+# Copyright (C) 2018 Rodrigo Silva (MestreLion) <linux@rodrigosilva.com>
+# License: GPLv3 or later, at your choice. See <http://www.gnu.org/licenses/gpl>
+
+import os
+import datetime
+
+import pytest
+
+from foshelter import snapshot
+from foshelter import util
+
+
+@pytest.fixture
+def files(savepath, tmp_path):
+    """A save file and a raw file to commit"""
+    raw = tmp_path / 'notes.txt'
+    raw.write_bytes(b'not a save\n' * 1000)
+    return [savepath, str(raw)]
+
+
+def test_commit_restore(files, tmp_path):
+    store = snapshot.SnapshotStore(str(tmp_path / 'store'))
+    snapid = store.commit(files, note='test')
+    manifest = store.manifest()
+    assert manifest['id'] == snapid
+    assert manifest['meta'] == dict(note='test')
+    assert [_['format'] for _ in manifest['files']] == ['save', 'raw']
+
+    target = tmp_path / 'restored'
+    target.mkdir()
+    for path in store.restore(target=str(target)):
+        original = os.path.join(os.path.dirname(files[0]),
+                                os.path.basename(path))
+        assert open(path, 'rb').read() == open(original, 'rb').read()
+        assert os.stat(path).st_mtime_ns == os.stat(original).st_mtime_ns
+    assert store.verify(full=True) == []
+
+
+def test_verify_corrupted(files, tmp_path):
+    store = snapshot.SnapshotStore(str(tmp_path / 'store'))
+    store.commit(files)
+    objid = store.manifest()['files'][0]['chunks'][0]
+    with open(store._object(objid), 'wb') as fd:
+        fd.write(b'corrupted')
+    assert len(store.verify()) == 1
+
+
+def test_objects_synced_before_manifest(files, tmp_path, monkeypatch):
+    store = snapshot.SnapshotStore(str(tmp_path / 'store'))
+    synced = []
+    atomic_write = util.atomic_write
+
+    def manifest_write(path, *args, **kwargs):
+        if path.endswith('.json'):
+            objects = set()
+            for root, __, names in os.walk(os.path.join(store.path, 'objects')):
+                objects.update(os.path.join(root, _) for _ in names)
+            assert objects and objects <= set(synced)
+        return atomic_write(path, *args, **kwargs)
+
+    monkeypatch.setattr(snapshot, '_fsync',
+                        lambda path, directory=False: synced.append(path))
+    monkeypatch.setattr(util, 'atomic_write', manifest_write)
+    store.commit(files)
+    assert store.snapshots()
+
+
+def test_same_time_commits_get_unique_ids(files, tmp_path, monkeypatch):
+    class FixedDateTime(datetime.datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return cls(2018, 1, 1)
+
+    monkeypatch.setattr(snapshot.datetime, 'datetime', FixedDateTime)
+    store = snapshot.SnapshotStore(str(tmp_path / 'store'))
+    ids = [store.commit(files[:1]) for __ in range(3)]
+    assert ids == ['2018-01-01_000000', '2018-01-01_000000.1',
+                   '2018-01-01_000000.2']
+    assert store.snapshots() == ids
+    assert len(os.listdir(os.path.join(store.path, 'snapshots'))) == 3
@@ -0,0 +1,54 @@
+# This file is part of Foshelter, see <https://github.com/MestreLion/foshelter>
+# Copyright (C) 2018 Rodrigo Silva (MestreLion) <linux@rodrigosilva.com>
+# License: GPLv3 or later, at your choice. See <http://www.gnu.org/licenses/gpl>
+
+import os
+import stat
+
+import pytest
+
+from foshelter import util
+
+
+def _mode(path) -> int:
+    return stat.S_IMODE(os.stat(path).st_mode)
+
+
+@pytest.mark.parametrize('sync', [True, False])
+def test_atomic_write_new_file_mode(tmp_path, umask, sync):
+    path = str(tmp_path / 'new')
+    with util.atomic_write(path, sync) as fp:
+        fp.write(b'data')
+    assert open(path, 'rb').read() == b'data'
+    assert _mode(path) == 0o666 & ~umask
+
+
+def test_atomic_write_keeps_mode(tmp_path, umask):
+    path = tmp_path / 'old'
+    path.write_bytes(b'old')
+    os.chmod(path, 0o640)
+    with util.atomic_write(str(path)) as fp:
+        fp.write(b'new')
+    assert path.read_bytes() == b'new'
+    assert _mode(path) == 0o640
+
+
+def test_atomic_write_error(tmp_path):
+    path = tmp_path / 'old'
+    path.write_bytes(b'old')
+    with pytest.raises(RuntimeError):
+        with util.atomic_write(str(path)) as fp:
+            fp.write(b'new')
+            raise RuntimeError
+    assert path.read_bytes() == b'old'
+    assert os.listdir(tmp_path) == ['old']
+
+
+def test_atomic_write_exclusive(tmp_path):
+    path = tmp_path / 'old'
+    path.write_bytes(b'old')
+    with pytest.raises(FileExistsError):
+        with util.atomic_write(str(path), exclusive=True) as fp:
+            fp.write(b'new')
+    assert path.read_bytes() == b'old'
+    assert os.listdir(tmp_path) == ['old']
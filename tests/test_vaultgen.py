@@ -0,0 +1,22 @@
+# This file is part of Foshelter, see <https://github.com/MestreLion/foshelter>
+# Copyright (C) 2018 Rodrigo Silva (MestreLion) <linux@rodrigosilva.com>
+# License: GPLv3 or later, at your choice. See <http://www.gnu.org/licenses/gpl>
+
+import foshelter as fs
+
+from benchmarks import vaultgen
+
+
+def test_deterministic():
+    assert vaultgen.savedata(10, 2, seed=7) == vaultgen.savedata(10, 2, seed=7)
+    assert vaultgen.savedata(10, 2, seed=7) != vaultgen.savedata(10, 2, seed=8)
+
+
+def test_valid_game(tmp_path):
+    path = vaultgen.write_save(str(tmp_path / 'Vault1.sav'), 30, 4)
+    game = fs.Game.from_save(path)
+    assert len(game.dwellers) == 30
+    assert len(game.lunchboxes) == 4
+    for dweller in game.dwellers:
+        assert dweller.erating is not None  # passes HP consistency checks
+    assert fs.encrypt(game.to_data()) == open(path, 'rb').read()